@@ -6,6 +6,8 @@ __doc__ = """Snake friction case from X. Zhang et. al. Nat. Comm. 2021"""
 
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
 sys.path.append("../../")
@@ -21,6 +23,7 @@ from examples.ContinuumSnakeCase.continuum_snake_postprocessing import (
     compute_projected_velocity,
     plot_curvature,
 )
+from examples.analysis_functions import KinematicsAnalysis
 
 
 class SnakeSimulator(BaseSystemCollection, Constraints, Forcing, CallBacks):
@@ -35,7 +38,23 @@ def run_snake(
     SAVE_RESULTS=True,
     VISUALIZE=False,
     SAVE_VISUALIZATION=False,
+    SEARCH=False,
 ):
+    """Runs the continuum snake with the given spline coefficients and wave length
+
+    With SEARCH set, only the time, center of mass and average velocity needed for the
+    optimization objective are recorded, and nothing is saved, plotted or visualized.
+    This keeps the memory of each run small when many are evaluated in parallel.
+
+    Returns:
+        (float, float, dict): Average forward and lateral velocity, and the callback
+        history of the snake
+    """
+
+    if SEARCH:
+        PLOT_FIGURE = SAVE_FIGURE = SAVE_VIDEO = SAVE_RESULTS = False
+        VISUALIZE = SAVE_VISUALIZATION = False
+
     # Initialize the simulation class
     snake_sim = SnakeSimulator()
 
@@ -123,16 +142,29 @@ def run_snake(
         Call back function for continuum snake
         """
 
-        def __init__(self, step_skip: int, callback_params: dict):
+        def __init__(self, step_skip: int, callback_params: dict, search=False):
             CallBackBaseClass.__init__(self)
             self.every = step_skip
             self.callback_params = callback_params
+            self.search = search
 
         def make_callback(self, system, time, current_step: int):
 
             if current_step % self.every == 0:
 
                 self.callback_params["time"].append(time)
+
+                # Only the quantities used by the optimization objective are recorded
+                # while searching
+                if self.search:
+                    self.callback_params["avg_velocity"].append(
+                        system.compute_velocity_center_of_mass()
+                    )
+                    self.callback_params["center_of_mass"].append(
+                        system.compute_position_center_of_mass()
+                    )
+                    return
+
                 self.callback_params["step"].append(current_step)
                 self.callback_params["position"].append(
                     system.position_collection.copy()
@@ -153,16 +185,20 @@ def run_snake(
 
     pp_list = defaultdict(list)
     snake_sim.collect_diagnostics(shearable_rod).using(
-        ContinuumSnakeCallBack, step_skip=step_skip, callback_params=pp_list
+        ContinuumSnakeCallBack,
+        step_skip=step_skip,
+        callback_params=pp_list,
+        search=SEARCH,
     )
 
     # Postprocessing dict for visualization
     postprocessing_dict = {"shearable_rod": defaultdict(list)}
-    snake_sim.collect_diagnostics(shearable_rod).using(
-        VisualizerDictCallBack,
-        step_skip=step_skip,
-        callback_params=postprocessing_dict["shearable_rod"],
-    )
+    if not SEARCH:
+        snake_sim.collect_diagnostics(shearable_rod).using(
+            VisualizerDictCallBack,
+            step_skip=step_skip,
+            callback_params=postprocessing_dict["shearable_rod"],
+        )
 
     snake_sim.finalize()
 
@@ -194,10 +230,13 @@ def run_snake(
 
     ###########################################################################
 
+    # Kinematics are computed once per run and shared by the plots and the optimization
+    analysis = KinematicsAnalysis(pp_list, period)
+
     if PLOT_FIGURE:
         filename_plot = "examples/ContinuumSnakeCase/continuum_snake_velocity.png"
-        plot_snake_velocity(pp_list, period, filename_plot, SAVE_FIGURE)
-        plot_curvature(pp_list, shearable_rod.rest_lengths, period, SAVE_FIGURE)
+        plot_snake_velocity(analysis, period, filename_plot, SAVE_FIGURE)
+        plot_curvature(analysis, shearable_rod.rest_lengths, period, SAVE_FIGURE)
 
         if SAVE_VIDEO:
             filename_video = "examples/ContinuumSnakeCase/continuum_snake.mp4"
@@ -210,11 +249,82 @@ def run_snake(
             )
 
     # Compute the average forward velocity. These will be used for optimization.
-    [_, _, avg_forward, avg_lateral] = compute_projected_velocity(pp_list, period)
+    [_, _, avg_forward, avg_lateral] = compute_projected_velocity(analysis, period)
 
     return avg_forward, avg_lateral, pp_list
 
 
+def evaluate_snake(b_coeff):
+    """Average forward and lateral velocity of a snake, run in a worker process"""
+
+    avg_forward, avg_lateral, _ = run_snake(b_coeff, SEARCH=True)
+    return avg_forward, avg_lateral
+
+
+class SnakeBatchEvaluator:
+    """Evaluates whole populations of spline coefficients in parallel worker processes
+
+    Results are memoized by the coefficients rounded to a number of decimals, so
+    coefficients repeated within or across populations are only simulated once.
+
+    Attributes
+    ----------
+
+    num_workers: int
+        Number of worker processes, defaults to the number of CPUs.
+    decimals: int
+        Number of decimals the coefficients are rounded to for memoization.
+    results: dict
+        Memoized (avg_forward, avg_lateral) of each rounded coefficient vector.
+    """
+
+    def __init__(self, num_workers=None, decimals=8) -> None:
+
+        self.num_workers = num_workers
+        self.decimals = decimals
+        self.results = {}
+        self.executor = ProcessPoolExecutor(max_workers=num_workers)
+
+    def key(self, b_coeff):
+        return tuple(np.round(np.asarray(b_coeff, dtype=np.float64), self.decimals))
+
+    def evaluate(self, population):
+        """Returns (avg_forward, avg_lateral) for each coefficients vector of a population
+
+        Args:
+            population (list numpy.ndarray): Spline coefficients followed by the wave
+            length, eg. as given by CMAEvolutionStrategy.ask()
+
+        Returns:
+            list: (avg_forward, avg_lateral) in the same order as the population
+        """
+
+        keys = [self.key(b_coeff) for b_coeff in population]
+
+        # Each missing coefficient vector is only submitted once
+        futures = {}
+        for key, b_coeff in zip(keys, population):
+            if key not in self.results and key not in futures:
+                futures[key] = self.executor.submit(evaluate_snake, np.asarray(b_coeff))
+
+        for key, future in futures.items():
+            self.results[key] = future.result()
+
+        num_memoized = len(population) - len(futures)
+        print(f"Evaluated {len(futures)} snakes, {num_memoized} memoized")
+
+        return [self.results[key] for key in keys]
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
 if __name__ == "__main__":
 
     # Options
@@ -227,31 +337,31 @@ if __name__ == "__main__":
     CMA_OPTION = False
 
     if CMA_OPTION:
-        # import cma
-
-        # SAVE_OPTIMIZED_COEFFICIENTS = False
-
-        # def optimize_snake(spline_coefficient):
-        #     [avg_forward, _, _] = run_snake(
-        #         spline_coefficient,
-        #         PLOT_FIGURE=False,
-        #         SAVE_FIGURE=False,
-        #         SAVE_VIDEO=False,
-        #         SAVE_RESULTS=True,
-        #     )
-        #     return -avg_forward
-
-        # # Optimize snake for forward velocity. In cma.fmin first input is function
-        # # to be optimized, second input is initial guess for coefficients you are optimizing
-        # # for and third input is standard deviation you initially set.
-        # optimized_spline_coefficients = cma.fmin(optimize_snake, 7 * [0], 0.5)
-
-        # # Save the optimized coefficients to a file
-        # filename_data = "optimized_coefficients.txt"
-        # if SAVE_OPTIMIZED_COEFFICIENTS:
-        #     assert filename_data != "", "provide a file name for coefficients"
-        #     np.savetxt(filename_data, optimized_spline_coefficients, delimiter=",")
-        pass
+        import cma
+
+        SAVE_OPTIMIZED_COEFFICIENTS = False
+
+        # Optimize snake for forward velocity. The first input of
+        # CMAEvolutionStrategy is the initial guess for the coefficients and the
+        # second is the initial standard deviation. Each population is evaluated in
+        # parallel, with visualization and saving disabled inside the workers.
+        es = cma.CMAEvolutionStrategy(7 * [0], 0.5)
+
+        with SnakeBatchEvaluator() as evaluator:
+            while not es.stop():
+                spline_coefficients = es.ask()
+                results = evaluator.evaluate(spline_coefficients)
+                objectives = [-avg_forward for avg_forward, _ in results]
+                es.tell(spline_coefficients, objectives)
+                es.disp()
+
+        optimized_spline_coefficients = es.result.xbest
+
+        # Save the optimized coefficients to a file
+        filename_data = "optimized_coefficients.txt"
+        if SAVE_OPTIMIZED_COEFFICIENTS:
+            assert filename_data != "", "provide a file name for coefficients"
+            np.savetxt(filename_data, optimized_spline_coefficients, delimiter=",")
 
     else:
         # Add muscle forces on the rod
@@ -3,6 +3,8 @@ from matplotlib import pyplot as plt
 from matplotlib.colors import to_rgb
 from tqdm import tqdm
 
+from examples.analysis_functions import as_kinematics_analysis
+
 
 def plot_snake_velocity(
     plot_params: dict,
@@ -10,8 +12,9 @@ def plot_snake_velocity(
     filename="slithering_snake_velocity.png",
     SAVE_FIGURE=False,
 ):
-    time_per_period = np.array(plot_params["time"]) / period
-    avg_velocity = np.array(plot_params["avg_velocity"])
+    plot_params = as_kinematics_analysis(plot_params, period)
+    time_per_period = plot_params.time_per_period
+    avg_velocity = plot_params.average_velocity()
 
     [
         velocity_in_direction_of_rod,
@@ -85,55 +88,22 @@ def plot_video(
     plt.close(plt.gcf())
 
 
-def compute_projected_velocity(plot_params: dict, period):
-
-    time_per_period = np.array(plot_params["time"]) / period
-    avg_velocity = np.array(plot_params["avg_velocity"])
-    center_of_mass = np.array(plot_params["center_of_mass"])
-
-    # Compute rod velocity in rod direction. We need to compute that because,
-    # after snake starts to move it chooses an arbitrary direction, which does not
-    # have to be initial tangent direction of the rod. Thus we need to project the
-    # snake velocity with respect to its new tangent and roll direction, after that
-    # we will get the correct forward and lateral speed. After this projection
-    # lateral velocity of the snake has to be oscillating between + and - values with
-    # zero mean.
-
-    # Number of steps in one period.
-    period_step = int(1.0 / (time_per_period[-1] - time_per_period[-2]))
-    number_of_period = int(time_per_period[-1])
-
-    # Center of mass position averaged in one period
-    center_of_mass_averaged_over_one_period = np.zeros((number_of_period - 2, 3))
-    for i in range(1, number_of_period - 1):
-        # position of center of mass averaged over one period
-        center_of_mass_averaged_over_one_period[i - 1] = np.mean(
-            center_of_mass[(i + 1) * period_step : (i + 2) * period_step]
-            - center_of_mass[(i + 0) * period_step : (i + 1) * period_step],
-            axis=0,
-        )
-    # Average the rod directions over multiple periods and get the direction of the rod.
-    direction_of_rod = np.mean(center_of_mass_averaged_over_one_period, axis=0)
-    direction_of_rod /= np.linalg.norm(direction_of_rod, ord=2)
-
-    # Compute the projected rod velocity in the direction of the rod
-    velocity_mag_in_direction_of_rod = np.einsum(
-        "ji,i->j", avg_velocity, direction_of_rod
-    )
-    velocity_in_direction_of_rod = np.einsum(
-        "j,i->ji", velocity_mag_in_direction_of_rod, direction_of_rod
-    )
+def compute_projected_velocity(plot_params, period):
+    """Computes the forward and lateral velocity of the snake
 
-    # Get the lateral or roll velocity of the rod after subtracting its projected
-    # velocity in the direction of rod
-    velocity_in_rod_roll_dir = avg_velocity - velocity_in_direction_of_rod
+    Args:
+        plot_params (dict or KinematicsAnalysis): Callback history of the snake. Passing a
+        KinematicsAnalysis reuses results already computed for the run.
+        period (float): Period of the snake actuation.
+    """
 
-    # Compute the average velocity over the simulation, this can be used for optimizing snake
-    # for fastest forward velocity. We start after first period, because of the ramping up happens
-    # in first period.
-    average_velocity_over_simulation = np.mean(
-        velocity_in_direction_of_rod[period_step * 2 :], axis=0
-    )
+    analysis = as_kinematics_analysis(plot_params, period)
+
+    (
+        velocity_in_direction_of_rod,
+        velocity_in_rod_roll_dir,
+        average_velocity_over_simulation,
+    ) = analysis.projected_velocity()
 
     return (
         velocity_in_direction_of_rod,
@@ -155,8 +125,9 @@ def plot_curvature(
     s = s / L0
     s = s[:-1].copy()
     x = np.linspace(0, 1, 100)
-    curvature = np.array(plot_params["curvature"])
-    time = np.array(plot_params["time"])
+    plot_params = as_kinematics_analysis(plot_params, period)
+    curvature = plot_params.curvature()
+    time = plot_params["time"]
     peak_time = period * 0.125
     dt = time[1] - time[0]
     peak_idx = int(peak_time / (dt))
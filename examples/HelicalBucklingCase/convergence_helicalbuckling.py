@@ -12,7 +12,8 @@ from examples.HelicalBucklingCase.helicalbuckling_postprocessing import (
     envelope,
     plot_helicalbuckling,
 )
-from examples.convergence_functions import plot_convergence, calculate_error_norm
+from examples.convergence_functions import calculate_error_norm
+from examples.sweep_functions import ConvergencePlot, run_parameter_sweep
 
 
 class HelicalBucklingSimulator(BaseSystemCollection, Constraints, Forcing):
@@ -107,18 +108,28 @@ def simulate_helicalbucklin_beam_with(
 
 
 if __name__ == "__main__":
-    import multiprocessing as mp
-
     convergence_elements = list([100, 200, 400, 800])
 
     # Convergence study
-    # for n_elem in [5, 6, 7, 8, 9, 10]
-    with mp.Pool(mp.cpu_count()) as pool:
-        results = pool.map(simulate_helicalbucklin_beam_with, convergence_elements)
+    # Each result is saved as soon as its simulation finishes, so rerunning the study
+    # only runs the simulations that are not cached yet
+    convergence_plot = None
+    if PLOT_FIGURE:
+        convergence_plot = ConvergencePlot("Helical buckling convergence")
+
+    results = run_parameter_sweep(
+        simulate_helicalbucklin_beam_with,
+        [{"elements": n_elem} for n_elem in convergence_elements],
+        cache_dir="HelicalBuckling_convergence_results",
+        on_result=convergence_plot.add_result if PLOT_FIGURE else None,
+    )
 
     if PLOT_FIGURE:
         filename = "HelicalBuckling_convergence_test.png"
-        plot_convergence(results, SAVE_FIGURE, filename)
+        if SAVE_FIGURE:
+            convergence_plot.save(filename)
+        convergence_plot.plt.ioff()
+        convergence_plot.plt.show()
 
     if SAVE_RESULTS:
         import pickle
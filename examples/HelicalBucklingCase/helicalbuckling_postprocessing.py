@@ -2,37 +2,10 @@ import numpy as np
 from matplotlib import pyplot as plt
 from mpl_toolkits import mplot3d
 from matplotlib.colors import to_rgb
-from scipy.linalg import norm
 
-
-def envelope(arg_pos):
-    """
-    Given points, computes the arc length and envelope of the curve
-    """
-
-    # Computes the direction in which the rod points
-    # in our cases it should be the z-axis
-    rod_direction = arg_pos[:, -1] - arg_pos[:, 0]
-    rod_direction /= norm(rod_direction, ord=2, axis=0)
-
-    # Compute local tangent directions
-    tangent_s = np.diff(arg_pos, n=1, axis=-1)  # x_(i+1)-x(i)
-    length_s = norm(tangent_s, ord=2, axis=0)
-    tangent_s /= length_s
-
-    # Dot product with direction is cos_phi, see RSOS
-    cos_phi_s = np.einsum("ij,i->j", tangent_s, rod_direction)
-
-    # Compute phi-max now
-    phi = np.arccos(cos_phi_s)
-    cos_phi_max = np.cos(np.max(phi))
-
-    # Return envelope and arclength
-    envelope = (cos_phi_s - cos_phi_max) / (1.0 - cos_phi_max)
-    # -0.5 * length accounts for the element/node business
-    arclength = np.cumsum(length_s) - 0.5 * length_s[0]
-
-    return arclength, envelope
+# The envelope is shared with the other analysis functions, and is also vectorized
+# over whole position histories
+from examples.analysis_functions import envelope
 
 
 def analytical_solution(L, n_elem=10000):
@@ -10,6 +10,9 @@ from tqdm import tqdm
 
 from typing import Dict, Sequence
 
+from examples.analysis_functions import as_kinematics_analysis
+from examples.video_functions import plot_video_projections, prefix_video_name
+
 
 def plot_video_with_surface(
     rods_history: Sequence[Dict],
@@ -19,423 +22,28 @@ def plot_video_with_surface(
     vis2D=True,
     **kwargs,
 ):
-    plt.rcParams.update({"font.size": 22})
-
-    folder_name = kwargs.get("folder_name", "")
-
-    # 2d case <always 2d case for now>
-    import matplotlib.animation as animation
-
-    # simulation time
-    sim_time = np.array(rods_history[0]["time"])
-
-    # Rod
-    n_visualized_rods = len(rods_history)  # should be one for now
-    # Rod info
-    rod_history_unpacker = lambda rod_idx, t_idx: (
-        rods_history[rod_idx]["position"][t_idx],
-        rods_history[rod_idx]["radius"][t_idx],
+    folder_name = kwargs.pop("folder_name", "")
+    sphere_history = kwargs.pop("sphere_history", None)
+    video_name = folder_name + video_name
+
+    # All requested views are rendered in parallel from a single pass over the data
+    video_names = {}
+    if kwargs.pop("vis3D", True):
+        video_names["3d"] = prefix_video_name(video_name, "3D_")
+
+    if kwargs.pop("vis2D", vis2D):
+        video_names["xy"] = prefix_video_name(video_name, "2D_xy_")
+        video_names["zy"] = prefix_video_name(video_name, "2D_zy_")
+        video_names["xz"] = prefix_video_name(video_name, "2D_xz_")
+
+    plot_video_projections(
+        rods_history,
+        video_names,
+        fps=fps,
+        step=step,
+        sphere_history=sphere_history,
+        **kwargs,
     )
-    # Rod center of mass
-    com_history_unpacker = lambda rod_idx, t_idx: rods_history[rod_idx]["com"][time_idx]
-
-    # Generate target sphere data
-    sphere_flag = False
-    if kwargs.__contains__("sphere_history"):
-        sphere_flag = True
-        sphere_history = kwargs.get("sphere_history")
-        n_visualized_spheres = len(sphere_history)  # should be one for now
-        sphere_history_unpacker = lambda sph_idx, t_idx: (
-            sphere_history[sph_idx]["position"][t_idx],
-            sphere_history[sph_idx]["radius"][t_idx],
-        )
-        # color mapping
-        sphere_cmap = cm.get_cmap("Spectral", n_visualized_spheres)
-
-    # video pre-processing
-    print("plot scene visualization video")
-    FFMpegWriter = animation.writers["ffmpeg"]
-    metadata = dict(title="Movie Test", artist="Matplotlib", comment="Movie support!")
-    writer = FFMpegWriter(fps=fps, metadata=metadata)
-    dpi = kwargs.get("dpi", 100)
-
-    xlim = kwargs.get("x_limits", (-1.0, 1.0))
-    ylim = kwargs.get("y_limits", (-1.0, 1.0))
-    zlim = kwargs.get("z_limits", (-0.05, 1.0))
-
-    difference = lambda x: x[1] - x[0]
-    max_axis_length = max(difference(xlim), difference(ylim))
-    # The scaling factor from physical space to matplotlib space
-    scaling_factor = (2 * 0.1) / max_axis_length  # Octopus head dimension
-    scaling_factor *= 2.6e3  # Along one-axis
-
-    if kwargs.get("vis3D", True):
-        fig = plt.figure(1, figsize=(10, 8), frameon=True, dpi=dpi)
-        ax = plt.axes(projection="3d")
-
-        ax.set_xlabel("x")
-        ax.set_ylabel("y")
-        ax.set_zlabel("z")
-
-        ax.set_xlim(*xlim)
-        ax.set_ylim(*ylim)
-        ax.set_zlim(*zlim)
-
-        time_idx = 0
-        rod_lines = [None for _ in range(n_visualized_rods)]
-        rod_com_lines = [None for _ in range(n_visualized_rods)]
-        rod_scatters = [None for _ in range(n_visualized_rods)]
-
-        for rod_idx in range(n_visualized_rods):
-            inst_position, inst_radius = rod_history_unpacker(rod_idx, time_idx)
-            if not inst_position.shape[1] == inst_radius.shape[0]:
-                inst_position = 0.5 * (inst_position[..., 1:] + inst_position[..., :-1])
-
-            rod_scatters[rod_idx] = ax.scatter(
-                inst_position[0],
-                inst_position[1],
-                inst_position[2],
-                s=np.pi * (scaling_factor * inst_radius) ** 2,
-            )
-
-        if sphere_flag:
-            sphere_artists = [None for _ in range(n_visualized_spheres)]
-            for sphere_idx in range(n_visualized_spheres):
-                sphere_position, sphere_radius = sphere_history_unpacker(
-                    sphere_idx, time_idx
-                )
-                sphere_artists[sphere_idx] = ax.scatter(
-                    sphere_position[0],
-                    sphere_position[1],
-                    sphere_position[2],
-                    s=np.pi * (scaling_factor * sphere_radius) ** 2,
-                )
-                # sphere_radius,
-                # color=sphere_cmap(sphere_idx),)
-                ax.add_artist(sphere_artists[sphere_idx])
-
-        # ax.set_aspect("equal")
-        video_name_3D = folder_name + "3D_" + video_name
-
-        with writer.saving(fig, video_name_3D, dpi):
-            with plt.style.context("seaborn-whitegrid"):
-                for time_idx in tqdm(range(0, sim_time.shape[0], int(step))):
-
-                    for rod_idx in range(n_visualized_rods):
-                        inst_position, inst_radius = rod_history_unpacker(
-                            rod_idx, time_idx
-                        )
-                        if not inst_position.shape[1] == inst_radius.shape[0]:
-                            inst_position = 0.5 * (
-                                inst_position[..., 1:] + inst_position[..., :-1]
-                            )
-
-                        rod_scatters[rod_idx]._offsets3d = (
-                            inst_position[0],
-                            inst_position[1],
-                            inst_position[2],
-                        )
-
-                        # rod_scatters[rod_idx].set_offsets(inst_position[:2].T)
-                        rod_scatters[rod_idx].set_sizes(
-                            np.pi * (scaling_factor * inst_radius) ** 2
-                        )
-
-                    if sphere_flag:
-                        for sphere_idx in range(n_visualized_spheres):
-                            sphere_position, _ = sphere_history_unpacker(
-                                sphere_idx, time_idx
-                            )
-                            sphere_artists[sphere_idx]._offsets3d = (
-                                sphere_position[0],
-                                sphere_position[1],
-                                sphere_position[2],
-                            )
-
-                    writer.grab_frame()
-
-        # Be a good boy and close figures
-        # https://stackoverflow.com/a/37451036
-        # plt.close(fig) alone does not suffice
-        # See https://github.com/matplotlib/matplotlib/issues/8560/
-        plt.close(plt.gcf())
-
-    if kwargs.get("vis2D", True):
-        max_axis_length = max(difference(xlim), difference(ylim))
-        # The scaling factor from physical space to matplotlib space
-        scaling_factor = (2 * 0.1) / max_axis_length  # Octopus head dimension
-        scaling_factor *= 2.6e3  # Along one-axis
-
-        fig = plt.figure(2, figsize=(10, 8), frameon=True, dpi=dpi)
-        ax = fig.add_subplot(111)
-        ax.set_xlim(*xlim)
-        ax.set_ylim(*ylim)
-
-        time_idx = 0
-        rod_lines = [None for _ in range(n_visualized_rods)]
-        rod_com_lines = [None for _ in range(n_visualized_rods)]
-        rod_scatters = [None for _ in range(n_visualized_rods)]
-
-        for rod_idx in range(n_visualized_rods):
-            inst_position, inst_radius = rod_history_unpacker(rod_idx, time_idx)
-            if not inst_position.shape[1] == inst_radius.shape[0]:
-                inst_position = 0.5 * (inst_position[..., 1:] + inst_position[..., :-1])
-            rod_lines[rod_idx] = ax.plot(
-                inst_position[0], inst_position[1], "r", lw=0.5
-            )[0]
-            inst_com = com_history_unpacker(rod_idx, time_idx)
-            rod_com_lines[rod_idx] = ax.plot(inst_com[0], inst_com[1], "k--", lw=2.0)[0]
-
-            rod_scatters[rod_idx] = ax.scatter(
-                inst_position[0],
-                inst_position[1],
-                s=np.pi * (scaling_factor * inst_radius) ** 2,
-            )
-
-        if sphere_flag:
-            sphere_artists = [None for _ in range(n_visualized_spheres)]
-            for sphere_idx in range(n_visualized_spheres):
-                sphere_position, sphere_radius = sphere_history_unpacker(
-                    sphere_idx, time_idx
-                )
-                sphere_artists[sphere_idx] = Circle(
-                    (sphere_position[0], sphere_position[1]),
-                    sphere_radius,
-                    color=sphere_cmap(sphere_idx),
-                )
-                ax.add_artist(sphere_artists[sphere_idx])
-
-        ax.set_aspect("equal")
-        video_name_2D = folder_name + "2D_xy_" + video_name
-
-        with writer.saving(fig, video_name_2D, dpi):
-            with plt.style.context("seaborn-whitegrid"):
-                for time_idx in tqdm(range(0, sim_time.shape[0], int(step))):
-
-                    for rod_idx in range(n_visualized_rods):
-                        inst_position, inst_radius = rod_history_unpacker(
-                            rod_idx, time_idx
-                        )
-                        if not inst_position.shape[1] == inst_radius.shape[0]:
-                            inst_position = 0.5 * (
-                                inst_position[..., 1:] + inst_position[..., :-1]
-                            )
-
-                        rod_lines[rod_idx].set_xdata(inst_position[0])
-                        rod_lines[rod_idx].set_ydata(inst_position[1])
-
-                        com = com_history_unpacker(rod_idx, time_idx)
-                        rod_com_lines[rod_idx].set_xdata(com[0])
-                        rod_com_lines[rod_idx].set_ydata(com[1])
-
-                        rod_scatters[rod_idx].set_offsets(inst_position[:2].T)
-                        rod_scatters[rod_idx].set_sizes(
-                            np.pi * (scaling_factor * inst_radius) ** 2
-                        )
-
-                    if sphere_flag:
-                        for sphere_idx in range(n_visualized_spheres):
-                            sphere_position, _ = sphere_history_unpacker(
-                                sphere_idx, time_idx
-                            )
-                            sphere_artists[sphere_idx].center = (
-                                sphere_position[0],
-                                sphere_position[1],
-                            )
-
-                    writer.grab_frame()
-
-        # Be a good boy and close figures
-        # https://stackoverflow.com/a/37451036
-        # plt.close(fig) alone does not suffice
-        # See https://github.com/matplotlib/matplotlib/issues/8560/
-        plt.close(plt.gcf())
-
-        # Plot zy
-        max_axis_length = max(difference(zlim), difference(ylim))
-        # The scaling factor from physical space to matplotlib space
-        scaling_factor = (2 * 0.1) / max_axis_length  # Octopus head dimension
-        scaling_factor *= 2.6e3  # Along one-axis
-
-        fig = plt.figure(2, figsize=(10, 8), frameon=True, dpi=dpi)
-        ax = fig.add_subplot(111)
-        ax.set_xlim(*zlim)
-        ax.set_ylim(*ylim)
-
-        time_idx = 0
-        rod_lines = [None for _ in range(n_visualized_rods)]
-        rod_com_lines = [None for _ in range(n_visualized_rods)]
-        rod_scatters = [None for _ in range(n_visualized_rods)]
-
-        for rod_idx in range(n_visualized_rods):
-            inst_position, inst_radius = rod_history_unpacker(rod_idx, time_idx)
-            if not inst_position.shape[1] == inst_radius.shape[0]:
-                inst_position = 0.5 * (inst_position[..., 1:] + inst_position[..., :-1])
-            rod_lines[rod_idx] = ax.plot(
-                inst_position[2], inst_position[1], "r", lw=0.5
-            )[0]
-            inst_com = com_history_unpacker(rod_idx, time_idx)
-            rod_com_lines[rod_idx] = ax.plot(inst_com[2], inst_com[1], "k--", lw=2.0)[0]
-
-            rod_scatters[rod_idx] = ax.scatter(
-                inst_position[2],
-                inst_position[1],
-                s=np.pi * (scaling_factor * inst_radius) ** 2,
-            )
-
-        if sphere_flag:
-            sphere_artists = [None for _ in range(n_visualized_spheres)]
-            for sphere_idx in range(n_visualized_spheres):
-                sphere_position, sphere_radius = sphere_history_unpacker(
-                    sphere_idx, time_idx
-                )
-                sphere_artists[sphere_idx] = Circle(
-                    (sphere_position[2], sphere_position[1]),
-                    sphere_radius,
-                    color=sphere_cmap(sphere_idx),
-                )
-                ax.add_artist(sphere_artists[sphere_idx])
-
-        ax.set_aspect("equal")
-        video_name_2D = folder_name + "2D_zy_" + video_name
-
-        with writer.saving(fig, video_name_2D, dpi):
-            with plt.style.context("seaborn-whitegrid"):
-                for time_idx in tqdm(range(0, sim_time.shape[0], int(step))):
-
-                    for rod_idx in range(n_visualized_rods):
-                        inst_position, inst_radius = rod_history_unpacker(
-                            rod_idx, time_idx
-                        )
-                        if not inst_position.shape[1] == inst_radius.shape[0]:
-                            inst_position = 0.5 * (
-                                inst_position[..., 1:] + inst_position[..., :-1]
-                            )
-
-                        rod_lines[rod_idx].set_xdata(inst_position[2])
-                        rod_lines[rod_idx].set_ydata(inst_position[1])
-
-                        com = com_history_unpacker(rod_idx, time_idx)
-                        rod_com_lines[rod_idx].set_xdata(com[2])
-                        rod_com_lines[rod_idx].set_ydata(com[1])
-
-                        rod_scatters[rod_idx].set_offsets(
-                            np.vstack((inst_position[2], inst_position[1])).T
-                        )
-                        rod_scatters[rod_idx].set_sizes(
-                            np.pi * (scaling_factor * inst_radius) ** 2
-                        )
-
-                    if sphere_flag:
-                        for sphere_idx in range(n_visualized_spheres):
-                            sphere_position, _ = sphere_history_unpacker(
-                                sphere_idx, time_idx
-                            )
-                            sphere_artists[sphere_idx].center = (
-                                sphere_position[2],
-                                sphere_position[1],
-                            )
-
-                    writer.grab_frame()
-
-        # Be a good boy and close figures
-        # https://stackoverflow.com/a/37451036
-        # plt.close(fig) alone does not suffice
-        # See https://github.com/matplotlib/matplotlib/issues/8560/
-        plt.close(plt.gcf())
-
-        # Plot xz
-        fig = plt.figure(2, figsize=(10, 8), frameon=True, dpi=dpi)
-        ax = fig.add_subplot(111)
-        ax.set_xlim(*xlim)
-        ax.set_ylim(*zlim)
-
-        # The scaling factor from physical space to matplotlib space
-        max_axis_length = max(difference(zlim), difference(xlim))
-        scaling_factor = (2 * 0.1) / (max_axis_length)  # Octopus head dimension
-        scaling_factor *= 2.6e3  # Along one-axis
-
-        time_idx = 0
-        rod_lines = [None for _ in range(n_visualized_rods)]
-        rod_com_lines = [None for _ in range(n_visualized_rods)]
-        rod_scatters = [None for _ in range(n_visualized_rods)]
-
-        for rod_idx in range(n_visualized_rods):
-            inst_position, inst_radius = rod_history_unpacker(rod_idx, time_idx)
-            if not inst_position.shape[1] == inst_radius.shape[0]:
-                inst_position = 0.5 * (inst_position[..., 1:] + inst_position[..., :-1])
-            rod_lines[rod_idx] = ax.plot(
-                inst_position[0], inst_position[2], "r", lw=0.5
-            )[0]
-            inst_com = com_history_unpacker(rod_idx, time_idx)
-            rod_com_lines[rod_idx] = ax.plot(inst_com[0], inst_com[2], "k--", lw=2.0)[0]
-
-            rod_scatters[rod_idx] = ax.scatter(
-                inst_position[0],
-                inst_position[2],
-                s=np.pi * (scaling_factor * inst_radius) ** 2,
-            )
-
-        if sphere_flag:
-            sphere_artists = [None for _ in range(n_visualized_spheres)]
-            for sphere_idx in range(n_visualized_spheres):
-                sphere_position, sphere_radius = sphere_history_unpacker(
-                    sphere_idx, time_idx
-                )
-                sphere_artists[sphere_idx] = Circle(
-                    (sphere_position[0], sphere_position[2]),
-                    sphere_radius,
-                    color=sphere_cmap(sphere_idx),
-                )
-                ax.add_artist(sphere_artists[sphere_idx])
-
-        ax.set_aspect("equal")
-        video_name_2D = folder_name + "2D_xz_" + video_name
-
-        with writer.saving(fig, video_name_2D, dpi):
-            with plt.style.context("seaborn-whitegrid"):
-                for time_idx in tqdm(range(0, sim_time.shape[0], int(step))):
-
-                    for rod_idx in range(n_visualized_rods):
-                        inst_position, inst_radius = rod_history_unpacker(
-                            rod_idx, time_idx
-                        )
-                        if not inst_position.shape[1] == inst_radius.shape[0]:
-                            inst_position = 0.5 * (
-                                inst_position[..., 1:] + inst_position[..., :-1]
-                            )
-
-                        rod_lines[rod_idx].set_xdata(inst_position[0])
-                        rod_lines[rod_idx].set_ydata(inst_position[2])
-
-                        com = com_history_unpacker(rod_idx, time_idx)
-                        rod_com_lines[rod_idx].set_xdata(com[0])
-                        rod_com_lines[rod_idx].set_ydata(com[2])
-
-                        rod_scatters[rod_idx].set_offsets(
-                            np.vstack((inst_position[0], inst_position[2])).T
-                        )
-                        rod_scatters[rod_idx].set_sizes(
-                            np.pi * (scaling_factor * inst_radius) ** 2
-                        )
-
-                    if sphere_flag:
-                        for sphere_idx in range(n_visualized_spheres):
-                            sphere_position, _ = sphere_history_unpacker(
-                                sphere_idx, time_idx
-                            )
-                            sphere_artists[sphere_idx].center = (
-                                sphere_position[0],
-                                sphere_position[2],
-                            )
-
-                    writer.grab_frame()
-
-        # Be a good boy and close figures
-        # https://stackoverflow.com/a/37451036
-        # plt.close(fig) alone does not suffice
-        # See https://github.com/matplotlib/matplotlib/issues/8560/
-        plt.close(plt.gcf())
 
 
 def plot_snake_velocity(
@@ -443,8 +51,9 @@ def plot_snake_velocity(
     period,
     filename="slithering_snake_velocity.png",
 ):
-    time_per_period = np.array(plot_params["time"]) / period
-    avg_velocity = np.array(plot_params["avg_velocity"])
+    plot_params = as_kinematics_analysis(plot_params, period)
+    time_per_period = plot_params.time_per_period
+    avg_velocity = plot_params.average_velocity()
 
     [
         velocity_in_direction_of_rod,
@@ -471,55 +80,30 @@ def plot_snake_velocity(
     fig.savefig(filename)
 
 
-def compute_projected_velocity(plot_params: dict, period):
+def compute_projected_velocity(plot_params, period):
+    """Computes the forward and lateral velocity of the snake
 
-    time_per_period = np.array(plot_params["time"]) / period
-    avg_velocity = np.array(plot_params["avg_velocity"])
-    center_of_mass = np.array(plot_params["center_of_mass"])
+    Args:
+        plot_params (dict or KinematicsAnalysis): Callback history of the snake. Passing a
+        KinematicsAnalysis reuses results already computed for the run.
+        period (float): Period of the snake actuation.
+    """
 
-    # Compute rod velocity in rod direction. We need to compute that because,
-    # after snake starts to move it chooses an arbitrary direction, which does not
-    # have to be initial tangent direction of the rod. Thus we need to project the
-    # snake velocity with respect to its new tangent and roll direction, after that
-    # we will get the correct forward and lateral speed. After this projection
-    # lateral velocity of the snake has to be oscillating between + and - values with
-    # zero mean.
+    analysis = as_kinematics_analysis(plot_params, period)
 
     # Number of steps in one period.
+    time_per_period = analysis.time_per_period
     period_step = int(period / (time_per_period[-1] - time_per_period[-2])) + 1
     number_of_period = int(time_per_period.shape[0] / period_step)
-    # Center of mass position averaged in one period
-    center_of_mass_averaged_over_one_period = np.zeros((number_of_period - 2, 3))
-    for i in range(1, number_of_period - 1):
-        # position of center of mass averaged over one period
-        center_of_mass_averaged_over_one_period[i - 1] = np.mean(
-            center_of_mass[(i + 1) * period_step : (i + 2) * period_step]
-            - center_of_mass[(i + 0) * period_step : (i + 1) * period_step],
-            axis=0,
-        )
-
-    # Average the rod directions over multiple periods and get the direction of the rod.
-    direction_of_rod = np.mean(center_of_mass_averaged_over_one_period, axis=0)
-    direction_of_rod /= np.linalg.norm(direction_of_rod, ord=2)
-    print("direction of rod " + str(direction_of_rod))
 
-    # Compute the projected rod velocity in the direction of the rod
-    velocity_mag_in_direction_of_rod = np.einsum(
-        "ji,i->j", avg_velocity, direction_of_rod
-    )
-    velocity_in_direction_of_rod = np.einsum(
-        "j,i->ji", velocity_mag_in_direction_of_rod, direction_of_rod
-    )
-
-    # Get the lateral or roll velocity of the rod after subtracting its projected
-    # velocity in the direction of rod
-    velocity_in_rod_roll_dir = avg_velocity - velocity_in_direction_of_rod
-
-    # Compute the average velocity over the simulation, this can be used for optimizing snake
-    # for fastest forward velocity. We start after first period, because of the ramping up happens
-    # in first period.
-    average_velocity_over_simulation = np.mean(
-        velocity_in_direction_of_rod[period_step * 2 :], axis=0
+    (
+        velocity_in_direction_of_rod,
+        velocity_in_rod_roll_dir,
+        average_velocity_over_simulation,
+    ) = analysis.projected_velocity(period_step, number_of_period)
+    print(
+        "direction of rod "
+        + str(analysis.direction_of_rod(period_step, number_of_period))
     )
 
     return (
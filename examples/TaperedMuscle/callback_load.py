@@ -1,42 +1,129 @@
-from examples.dMRI_Trackography.trackogram_rods_postprocessing import (
-    generate_video_fury, make_fury_video,view_w_fury)
+import os
+import re
+import sys
 import pickle
-import numpy as np
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append("../../")
+sys.path.insert(0, "")
+
+from trajectory_file import read_trajectory_file, write_trajectory_file
+
+# Shards are saved by the callbacks as callback_<rod id>_<time id>.p
+SHARD_PATTERN = re.compile(r"callback_(\d{4})_(\d{5})\.p$")
+
+
+def discover_shards(folder="callbacks"):
+    """Finds the callback shards in a folder
+
+    Returns:
+        dict: Shard file names of each rod id, ordered by time id
+    """
+
+    shards = defaultdict(dict)
+    for fname in os.listdir(folder):
+        match = SHARD_PATTERN.match(fname)
+        if match:
+            rod_id, time_id = int(match.group(1)), int(match.group(2))
+            shards[rod_id][time_id] = os.path.join(folder, fname)
+
+    return {
+        rod_id: [rod_shards[time_id] for time_id in sorted(rod_shards)]
+        for rod_id, rod_shards in sorted(shards.items())
+    }
+
+
+def _load_shard(fname):
+    with open(fname, "rb") as fp:
+        return pickle.load(fp)
+
+
+def load_callback_shards(folder="callbacks", num_workers=None):
+    """Loads the callback shards of every rod into arrays
+
+    Each shard is opened once and shards are read in parallel threads. The first shard
+    of each rod gives the shape of every recorded quantity, so the arrays of the whole
+    history eg. (T, 3, N) for positions are allocated up front and filled in place.
+
+    Args:
+        folder (str, optional): Folder containing the shards. Defaults to "callbacks".
+        num_workers (int, optional): Number of threads. Defaults to None, which lets
+        ThreadPoolExecutor decide.
+
+    Returns:
+        dict: Dictionary of rods "rod<id>", each a dictionary of arrays of its history
+    """
+
+    shards = discover_shards(folder)
+    master_dict = {}
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        for rod_id, fnames in shards.items():
+
+            history = None
+            for time_id, snapshot in enumerate(executor.map(_load_shard, fnames)):
+
+                if history is None:
+                    history = {
+                        key: np.empty(
+                            (len(fnames),) + np.shape(value),
+                            dtype=np.asarray(value).dtype,
+                        )
+                        for key, value in snapshot.items()
+                    }
+
+                for key, value in snapshot.items():
+                    history[key][time_id] = value
+
+            master_dict["rod" + str(rod_id)] = history
+
+    return master_dict
+
+
+def load_trajectories(folder="callbacks", trajectory_fname=None, consolidate=False):
+    """Loads rod histories, from a consolidated trajectory file if there is one
+
+    Args:
+        folder (str, optional): Folder containing the shards. Defaults to "callbacks".
+        trajectory_fname (str, optional): Indexed trajectory file. If it exists it is
+        memory-mapped instead of loading the shards. Defaults to None, which is
+        "trajectories.traj" in the shards folder.
+        consolidate (bool, optional): Whether the loaded shards are written to the
+        trajectory file, so the next load is a single memory map. Defaults to False.
+
+    Returns:
+        dict: Dictionary of rods "rod<id>", each a dictionary of arrays of its history
+    """
+
+    if trajectory_fname is None:
+        trajectory_fname = os.path.join(folder, "trajectories.traj")
+
+    if os.path.exists(trajectory_fname):
+        return read_trajectory_file(trajectory_fname)
+
+    master_dict = load_callback_shards(folder)
+
+    if consolidate:
+        write_trajectory_file(trajectory_fname, master_dict)
+
+    return master_dict
+
+
+if __name__ == "__main__":
+    from examples.dMRI_Trackography.trackogram_rods_postprocessing import (
+        generate_video_fury,
+        make_fury_video,
+        view_w_fury,
+    )
+
+    master_dict = load_trajectories("callbacks", consolidate=True)
 
+    pos = dict()
+    for id in range(len(master_dict)):
+        pos[id] = master_dict["rod" + str(id)]["position"]
 
-# pos = dict()
-# for id in range(len(pp_list)):
-#     pos[id] = np.array(pp_list["rod" + str(id)]["position"])
-
-master_dict = defaultdict(list)
-
-for rod_id in range(10):
-    master_dict["rod" + str(rod_id)] = {}
-    for time_id in range(100):
-        with open('callbacks/callback_%04d_%05d.p' % (rod_id, time_id), 'rb') as fp:
-            master_dict["rod" + str(rod_id)]["time"] = []
-            master_dict["rod" + str(rod_id)]["step"]=[]
-            master_dict["rod" + str(rod_id)]["position"]=[]
-            master_dict["rod" + str(rod_id)]["velocity"]=[]
-            master_dict["rod" + str(rod_id)]["avg_velocity"]=[]
-            master_dict["rod" + str(rod_id)]["center_of_mass"]=[]
-
-
-for rod_id in range(10):
-    for time_id in range(100):
-        with open('callbacks/callback_%04d_%05d.p' % (rod_id, time_id), 'rb') as fp:
-            temp_dict = pickle.load(fp)
-            master_dict["rod" + str(rod_id)]["time"].append(temp_dict['time'])
-            master_dict["rod" + str(rod_id)]["step"].append(temp_dict["step"])
-            master_dict["rod" + str(rod_id)]["position"].append(temp_dict["position"])
-            master_dict["rod" + str(rod_id)]["velocity"].append(temp_dict["velocity"])
-            master_dict["rod" + str(rod_id)]["avg_velocity"].append(temp_dict["avg_velocity"])
-            master_dict["rod" + str(rod_id)]["center_of_mass"].append(temp_dict["center_of_mass"])
-
-pos = dict()
-for id in range(len(master_dict)):
-    pos[id] = np.array(master_dict["rod" + str(id)]["position"])
-
-# view_w_fury(pos,start=0,end=100)
-generate_video_fury(pos,start=0,end=100,fname='temp_img')
\ No newline at end of file
+    # view_w_fury(pos,start=0,end=100)
+    generate_video_fury(pos, start=0, end=100, fname="temp_img")
@@ -4,14 +4,15 @@ import pickle
 import numpy as np
 from fury import window, actor
 
+# Camera of the scene. You can also get the camera position with
+# print(scene.get_camera()) after manipulating it in the viewer.
+CAMERA_POSITION = (7.71357108132753e-06, 0.4999510228569592, 6.9036315905697665)
+CAMERA_FOCAL_POINT = (7.71357108132753e-06, 0.4999510228569592, 0.0)
+CAMERA_VIEW_UP = (0.0, 1.0, 0.0)
+
 
 def main():
 	data = np.load("tapered_nine_muscle_rods.npz")
-	(time_list, 
-		straight_rods_position_history, straight_rods_radius_history, 
-		inner_ring_rods_position_history, inner_ring_rods_radius_history, 
-		outer_ring_rods_position_history, outer_ring_rods_radius_history) = (data['time'], data['straight_rods_position_history'],data['straight_rods_radius_history'], data['inner_ring_rods_position_history'], 
-																			data['inner_ring_rods_radius_history'], data['outer_ring_rods_position_history'], data['outer_ring_rods_radius_history'])
 
 	# set the colors for the different groups
 	color = (window.colors.white, window.colors.blue, window.colors.green, window.colors.red)
@@ -19,130 +20,158 @@ def main():
 	opacity = (1.0, 0.75, 0.5, 1.0)
 
 	view_data = True
-	save_images = False
 	make_video = False
 
+	# Actors are created once from the first frame and updated in place afterwards
+	stream_coll, radius = frame_geometry(data, 0)
+	print(len(stream_coll), stream_coll[0].shape )
+	print(len(radius), radius[0].shape  )
+	renderer = StreamtubeRenderer(stream_coll, radius, color=color, opacity=opacity)
 
 	if view_data:
-		time = 0
-		print(time)
-		axon = (straight_rods_position_history[0,time])
-		straight = (straight_rods_position_history[1:,time])
-		circle_inner = inner_ring_rods_position_history[:,time]
-		circle_outer = outer_ring_rods_position_history[:,time]
-		stream_coll = (axon, straight,circle_outer,circle_inner)
-
-		radius = (straight_rods_radius_history[0,time],
-			straight_rods_radius_history[1:,time], 
-				outer_ring_rods_radius_history[:,time], 
-				inner_ring_rods_radius_history[:,time])
-		print(len(stream_coll), stream_coll[0].shape )
-		print(len(radius), radius[0].shape  )
-		print(time)
-		fury_save_files(stream_coll, radius, time, color=color, opacity=opacity, view = True)
-
-
-	if save_images:
-		for time in range(len(time_list)):
-			print(time)
-			axon = (straight_rods_position_history[0,time])
-			straight = (straight_rods_position_history[1:,time])
-			circle_inner = inner_ring_rods_position_history[:,time]
-			circle_outer = outer_ring_rods_position_history[:,time]
-			stream_coll = (axon, straight,circle_outer,circle_inner)
-
-			radius = (straight_rods_radius_history[0,time],
-				straight_rods_radius_history[1:,time], 
-					outer_ring_rods_radius_history[:,time], 
-					inner_ring_rods_radius_history[:,time])
-			
-			fury_save_files(stream_coll, radius, time, color=color, opacity=opacity, view = False)
-
+		renderer.show()
 
 	if make_video:
-		make_fury_video()
+		frames = (frame_geometry(data, time) for time in range(len(data['time'])))
+		renderer.record_video(frames, "full_sim_video2.mp4", fps=20)
 
 # view_w_fury(pos,0,1)
 
 
-# In this example, callback_data is a dict with entries for each rod.
-def fury_save_files(stream_coll, radius, time, color, opacity, view = True):
-	# initalize viewer
-	ren = window.Scene()
+def frame_geometry(data, time):
+	"""Returns the rod positions and radii of each group of rods at a time index
 
-	# optional: set camera position. You can also get the camera position
-	# with print(ren.get_camera()) after manipulating it in the viewer.
-	# position = (17.14, 52.24, 2.97)
-	# focal_pt = (0.98, 4.65, 3.52)
-	# view_up = (-0.03, 0.18, -0.58)
-	position, focal_pt, view_up = (
-									(7.71357108132753e-06, 0.4999510228569592, 6.9036315905697665), 
-									(7.71357108132753e-06, 0.4999510228569592, 0.0), 
-									(0.0, 1.0, 0.0))
+	Groups are the axon, the straight muscles, the outer ring and the inner ring muscles.
+	"""
 
-	# Make list of rods/streamlines centerline postions.
-	# Rods should be np array of size [N,3]
+	axon = (data['straight_rods_position_history'][0,time])
+	straight = (data['straight_rods_position_history'][1:,time])
+	circle_inner = data['inner_ring_rods_position_history'][:,time]
+	circle_outer = data['outer_ring_rods_position_history'][:,time]
+	stream_coll = (axon, straight,circle_outer,circle_inner)
 
-	# generate color scheme. For all one color, can use `window.colors.red`
-	# colormapping = actor.create_colormap(np.arange(len(stream_coll)))
-	
+	radius = (data['straight_rods_radius_history'][0,time],
+		data['straight_rods_radius_history'][1:,time],
+			data['outer_ring_rods_radius_history'][:,time],
+			data['inner_ring_rods_radius_history'][:,time])
 
-	# ren.SetBackground(0, 0, 0) # set black background (default)
-	# ren.SetBackground(1, 1, 1) # set white background
+	return stream_coll, radius
 
-	# add streamtubes to ren
-	# print(radii_array)
+
+def _iterate_rods(stream_coll, radius):
+	"""Yields the group index, centerline of shape [N,3] and radii of each rod"""
 
 	# iterate through the groupings of the rods
 	for n, (rods, radii) in enumerate(zip(stream_coll, radius)):
-		# iterate through each rod in the grouping
-		num_rods = rods.shape[0] if rods.ndim == 3 else 1
-		for i in range(num_rods):
-			if rods.ndim == 3:
-				rod = rods[i:i+1]
-				radius = radii[i]
-				test = np.swapaxes(rod,1,2)
-
-			else:
-				rod = rods
-				radius = radii
-				test = np.swapaxes(rod,0,1)
-				test = test[None,:,:] #Add a blank axis since there is  only 1 rod in this group.     		
-			
+		# iterate through each rod in the grouping, groups with a single rod have no
+		# rod axis
+		if rods.ndim == 3:
+			for i in range(rods.shape[0]):
+				yield n, rods[i].T, radii[i]
+		else:
+			yield n, rods.T, radii
+
+
+def _tube_radius(radii_array):
+	# To match the length of the stream tube each end of the radius array is padded
+	return np.concatenate((radii_array[:1], radii_array[:-1], radii_array[-2:-1]))
+
+
+class StreamtubeRenderer:
+	"""Renders the rods as streamtubes, keeping the actors alive between frames
+
+	Each rod gets one streamtube actor when the renderer is created. For later frames the
+	points and radii of the actors are overwritten in place through the VTK numpy bridge,
+	and the VTK pipeline recomputes the tubes on the next render. Frames are read back
+	from an offscreen render window and piped straight into the video encoder.
+
+	Attributes
+	----------
+
+	scene: fury.window.Scene
+		The scene containing every streamtube actor.
+	tubes: list
+		(points, radii, poly data) of each rod, where points and radii are numpy views
+		of the VTK arrays used by its actor.
+	"""
+
+	def __init__(self, stream_coll, radius, color, opacity, size=(512, 512)):
+
+		self.size = size
+		self.scene = window.Scene()
+		self.tubes = []
+
+		for n, rod, radii in _iterate_rods(stream_coll, radius):
 			# axon and straight muscles should have a cap on them, ring rods should not
-			if n <= 1:
-				st = streamtube(test, radii_array = radius, colors = color[n], opacity=opacity[n], )
-			else:
-				st = streamtube(test, radii_array = radius, colors = color[n], opacity=opacity[n], remove_cap=True)
-			ren.add(st)
-
-	# optional: set camera position
-	ren.set_camera(position=position, focal_point=focal_pt, view_up=view_up)
-	
-
-	# display interactive window viewer
-	if view:
-		window.show(ren)
-		print(ren.get_camera())
-	else:
-		fname='file'
-		# save image
-		window.record(ren, out_path="temp_imgs/%s%02d.png" % (fname, time), size=(512, 512))
-
-	# optional: remove all objects in ren
-	ren.clear()
-
-def make_fury_video():
-	import os
-	import subprocess
-	import glob
-	os.chdir("temp_imgs")
-	subprocess.call([
-		'ffmpeg', '-framerate', '20', '-i', 'file%02d.png', '-r', '30', '-pix_fmt', 'yuv420p',
-		'../full_sim_video2.mp4'
-	])
-	# for file_name in glob.glob("*.png"):
-	#     os.remove(file_name)
+			st, poly_data, tube_radius = streamtube([rod], radii_array = radii, colors = color[n], opacity=opacity[n], remove_cap=n > 1, return_arrays=True)
+			self.scene.add(st)
+
+			points = numpy_support.vtk_to_numpy(poly_data.GetPoints().GetData())
+			self.tubes.append((points, numpy_support.vtk_to_numpy(tube_radius), poly_data))
+
+		self.scene.set_camera(position=CAMERA_POSITION, focal_point=CAMERA_FOCAL_POINT, view_up=CAMERA_VIEW_UP)
+
+	def update(self, stream_coll, radius):
+		"""Updates the points and radii of every actor in place"""
+
+		for (points, tube_radius, poly_data), (_, rod, radii) in zip(self.tubes, _iterate_rods(stream_coll, radius)):
+			points[:] = rod
+			tube_radius[:] = _tube_radius(radii)
+
+			# Marks the arrays as modified so the tubes are recomputed on the next render
+			poly_data.GetPoints().Modified()
+			poly_data.GetPointData().GetArray("TubeRadius").Modified()
+			poly_data.Modified()
+
+	def show(self):
+		"""Displays the scene in an interactive window"""
+
+		window.show(self.scene)
+		print(self.scene.get_camera())
+
+	def record_video(self, frames, video_fname, fps=20, quality=8):
+		"""Renders each frame offscreen and streams it to a video file
+
+		Args:
+			frames (iterable): (stream_coll, radius) of each frame, eg. from frame_geometry
+			video_fname (str): Name of the video file
+			fps (int, optional): Frame rate of the video. Defaults to 20.
+			quality (int, optional): Quality of the video from 0 to 10. Defaults to 8.
+		"""
+
+		from imageio_ffmpeg import write_frames
+
+		# The render window and the filter reading back its pixels are created once
+		render_window = vtk.vtkRenderWindow()
+		render_window.SetOffScreenRendering(1)
+		render_window.AddRenderer(self.scene)
+		render_window.SetSize(*self.size)
+
+		window_to_image = vtk.vtkWindowToImageFilter()
+		window_to_image.SetInput(render_window)
+		window_to_image.SetInputBufferTypeToRGB()
+		window_to_image.ReadFrontBufferOff()
+
+		writer = write_frames(video_fname, self.size, pix_fmt_in="rgb24", fps=fps, quality=quality)
+		writer.send(None)
+
+		try:
+			for time, (stream_coll, radius) in enumerate(frames):
+				print(time)
+				self.update(stream_coll, radius)
+				render_window.Render()
+
+				window_to_image.Modified()
+				window_to_image.Update()
+				image = window_to_image.GetOutput()
+				width, height, _ = image.GetDimensions()
+				pixels = numpy_support.vtk_to_numpy(image.GetPointData().GetScalars())
+
+				# VTK images start at the bottom row
+				writer.send(np.ascontiguousarray(pixels.reshape(height, width, 3)[::-1]))
+		finally:
+			writer.close()
+			render_window.Finalize()
 
 import os.path as op
 import numpy as np
@@ -166,7 +195,8 @@ import fury.primitive as fp
 # Adapted from fury.actor.streamtube to allow varying radius of the rod
 def streamtube(lines, colors=None, opacity=1, linewidth=0.1, tube_sides=20,
 			   lod=True, lod_points=10 ** 4, lod_points_size=3,
-			   spline_subdiv=None, lookup_colormap=None, radii_array=None, remove_cap = False):
+			   spline_subdiv=None, lookup_colormap=None, radii_array=None, remove_cap = False,
+			   return_arrays=False):
 	"""Use streamtubes to visualize polylines
 
 	Parameters
@@ -213,6 +243,13 @@ def streamtube(lines, colors=None, opacity=1, linewidth=0.1, tube_sides=20,
 	lookup_colormap : vtkLookupTable, optional
 		Add a default lookup table to the colormap. Default is None which calls
 		:func:`fury.actor.colormap_lookup_table`.
+	radii_array : array (N,), optional
+		Radius of each element of the rod.
+	remove_cap : bool, optional
+		Whether the ends of the tube are left open. Default is False.
+	return_arrays : bool, optional
+		Whether the input poly data and radius array are also returned, so the
+		tube can be updated in place. Default is False.
 
 	Examples
 	--------
@@ -250,14 +287,8 @@ def streamtube(lines, colors=None, opacity=1, linewidth=0.1, tube_sides=20,
 	next_input = poly_data
 
 			#Add radius
-	tubeRadius=vtk.vtkDoubleArray()
-	tubeRadius.SetNumberOfTuples(radii_array.shape[0]+1)
+	tubeRadius = numpy_support.numpy_to_vtk(_tube_radius(np.asarray(radii_array, dtype=np.float64)), deep=True)
 	tubeRadius.SetName("TubeRadius")
-	# To match the length of the stream tube I need to pad each end of the radius array. I don't know why. 
-	tubeRadius.SetTuple1(0, radii_array[0])
-	for i, rad in enumerate(radii_array[:-1]):
-		tubeRadius.SetTuple1(i+1, rad)
-	tubeRadius.SetTuple1(i+2, rad)
 	next_input.GetPointData().AddArray(tubeRadius)
 	next_input.GetPointData().SetActiveScalars("TubeRadius")
 
@@ -325,6 +356,9 @@ def streamtube(lines, colors=None, opacity=1, linewidth=0.1, tube_sides=20,
 	actor.GetProperty().BackfaceCullingOn()
 	actor.GetProperty().SetOpacity(opacity)
 
+	if return_arrays:
+		return actor, poly_data, tubeRadius
+
 	return actor
 if __name__ == "__main__":
 	main()
@@ -11,7 +11,8 @@ from examples.TimoshenkoBeamCase.timoshenko_postprocessing import (
     plot_timoshenko,
     analytical_shearable,
 )
-from examples.convergence_functions import calculate_error_norm, plot_convergence
+from examples.convergence_functions import calculate_error_norm
+from examples.sweep_functions import ConvergencePlot, run_parameter_sweep
 
 
 class TimoshenkoBeamSimulator(BaseSystemCollection, Constraints, Forcing):
@@ -114,8 +115,6 @@ def simulate_timoshenko_beam_with(
 
 
 if __name__ == "__main__":
-    import multiprocessing as mp
-
     # 5, 6, ... 9
     convergence_elements = list(range(5, 10))
     # 10, 20, ... , 100
@@ -123,13 +122,25 @@ if __name__ == "__main__":
     convergence_elements.extend([200])
 
     # Convergence study
-    # for n_elem in [5, 6, 7, 8, 9, 10]
-    with mp.Pool(mp.cpu_count()) as pool:
-        results = pool.map(simulate_timoshenko_beam_with, convergence_elements)
+    # Each result is saved as soon as its simulation finishes, so rerunning the study
+    # only runs the simulations that are not cached yet
+    convergence_plot = None
+    if PLOT_FIGURE:
+        convergence_plot = ConvergencePlot("Timoshenko beam convergence")
+
+    results = run_parameter_sweep(
+        simulate_timoshenko_beam_with,
+        [{"elements": n_elem} for n_elem in convergence_elements],
+        cache_dir="Timoshenko_convergence_results",
+        on_result=convergence_plot.add_result if PLOT_FIGURE else None,
+    )
 
     if PLOT_FIGURE:
         filename = "Timoshenko_convergence_test.png"
-        plot_convergence(results, SAVE_FIGURE, filename)
+        if SAVE_FIGURE:
+            convergence_plot.save(filename)
+        convergence_plot.plt.ioff()
+        convergence_plot.plt.show()
 
     if SAVE_RESULTS:
         import pickle
@@ -0,0 +1,238 @@
+import numpy as np
+
+
+def envelope(arg_pos):
+    """
+    Given points, computes the arc length and envelope of the curve
+
+    Positions can be of a single frame with shape (3, n), or a history with shape
+    (frames, 3, n) in which case the envelopes of all frames are computed at once.
+    """
+
+    # Computes the direction in which the rod points
+    # in our cases it should be the z-axis
+    rod_direction = arg_pos[..., :, -1] - arg_pos[..., :, 0]
+    rod_direction = rod_direction / np.linalg.norm(rod_direction, axis=-1)[..., None]
+
+    # Compute local tangent directions
+    tangent_s = np.diff(arg_pos, n=1, axis=-1)  # x_(i+1)-x(i)
+    length_s = np.linalg.norm(tangent_s, axis=-2)
+    tangent_s = tangent_s / length_s[..., None, :]
+
+    # Dot product with direction is cos_phi, see RSOS
+    cos_phi_s = np.einsum("...ij,...i->...j", tangent_s, rod_direction)
+
+    # Compute phi-max now
+    phi = np.arccos(cos_phi_s)
+    cos_phi_max = np.cos(np.max(phi, axis=-1))[..., None]
+
+    # Return envelope and arclength
+    envelope = (cos_phi_s - cos_phi_max) / (1.0 - cos_phi_max)
+    # -0.5 * length accounts for the element/node business
+    arclength = np.cumsum(length_s, axis=-1) - 0.5 * length_s[..., :1]
+
+    return arclength, envelope
+
+
+class KinematicsAnalysis:
+    """Kinematics analysis of the history recorded by a callback over a full simulation run
+
+    Every quantity is computed vectorized over time the first time it is requested and
+    cached, so plots and optimization objectives using the same run share the results.
+    Items of the history can be accessed as arrays eg. analysis["time"], which are also
+    only converted once.
+
+    Attributes
+    ----------
+
+    history: dict
+        Dictionary of lists recorded by a callback, eg. "time", "position", "velocity",
+        "center_of_mass", "avg_velocity" and "curvature".
+    period: float
+        Period of the actuation, used to average quantities over periods.
+
+    """
+
+    def __init__(self, history: dict, period=1.0) -> None:
+
+        self.history = history
+        self.period = period
+        self._cache = {}
+
+    def __getitem__(self, key):
+
+        if key not in self._cache:
+            self._cache[key] = np.asarray(self.history[key])
+        return self._cache[key]
+
+    def __contains__(self, key):
+        return key in self._cache or key in self.history
+
+    def _cached(self, key, compute):
+        """Returns the cached result for key, calling compute to calculate it the first time"""
+
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @property
+    def time_per_period(self):
+        return self._cached("time_per_period", lambda: self["time"] / self.period)
+
+    def center_of_mass(self):
+        """Center of mass history of shape (frames, 3)
+
+        Uses the recorded "center_of_mass" if present, otherwise the mean of the node
+        positions of each frame.
+        """
+
+        if "center_of_mass" in self.history:
+            return self["center_of_mass"]
+
+        return self._cached(
+            "computed_center_of_mass", lambda: self["position"].mean(axis=-1)
+        )
+
+    def average_velocity(self):
+        """Average velocity history of shape (frames, 3)
+
+        Uses the recorded "avg_velocity" if present, then the mean of the node velocities
+        and otherwise the time derivative of the center of mass.
+        """
+
+        if "avg_velocity" in self.history:
+            return self["avg_velocity"]
+
+        if "velocity" in self.history:
+            return self._cached(
+                "computed_avg_velocity", lambda: self["velocity"].mean(axis=-1)
+            )
+
+        return self._cached(
+            "computed_avg_velocity",
+            lambda: np.gradient(self.center_of_mass(), self["time"], axis=0),
+        )
+
+    def default_period_step(self):
+        """Number of recorded frames in one period and the number of recorded periods"""
+
+        time_per_period = self.time_per_period
+        period_step = int(1.0 / (time_per_period[-1] - time_per_period[-2]))
+        number_of_period = int(time_per_period[-1])
+
+        return period_step, number_of_period
+
+    def period_averaged_displacement(self, period_step=None, number_of_period=None):
+        """Center of mass displacement between consecutive periods, averaged over each period
+
+        Periods are taken as a strided (number_of_period, period_step, 3) view of the center
+        of mass history, skipping the first period where the motion ramps up.
+
+        Args:
+            period_step (int, optional): Number of recorded frames per period.
+            number_of_period (int, optional): Number of periods recorded.
+            If either is None, they are calculated from the time history.
+
+        Returns:
+            numpy.ndarray: Averaged displacement of shape (number_of_period - 2, 3)
+        """
+
+        if period_step is None or number_of_period is None:
+            period_step, number_of_period = self.default_period_step()
+
+        def compute():
+            center_of_mass = self.center_of_mass()
+            num_periods = min(number_of_period, len(center_of_mass) // period_step)
+            windows = center_of_mass[: num_periods * period_step].reshape(
+                num_periods, period_step, 3
+            )
+            return np.mean(windows[2:] - windows[1:-1], axis=1)
+
+        return self._cached(
+            ("period_averaged_displacement", period_step, number_of_period), compute
+        )
+
+    def direction_of_rod(self, period_step=None, number_of_period=None):
+        """Unit direction of motion, the period averaged displacement averaged over the periods
+
+        Args:
+            period_step (int, optional): Number of recorded frames per period.
+            number_of_period (int, optional): Number of periods recorded.
+            If either is None, they are calculated from the time history.
+        """
+
+        displacement = self.period_averaged_displacement(period_step, number_of_period)
+        direction_of_rod = np.mean(displacement, axis=0)
+
+        return direction_of_rod / np.linalg.norm(direction_of_rod, ord=2)
+
+    def projected_velocity(self, period_step=None, number_of_period=None):
+        """Velocity projected onto the direction of motion and its lateral remainder
+
+        After the snake starts to move it chooses an arbitrary direction, which does not
+        have to be the initial tangent direction of the rod. The velocity is therefore
+        projected onto the direction of the center of mass motion averaged over the
+        periods, and the remainder is the lateral/roll velocity, which oscillates between
+        + and - values with zero mean.
+
+        Args:
+            period_step (int, optional): Number of recorded frames per period.
+            number_of_period (int, optional): Number of periods recorded.
+            If either is None, they are calculated from the time history.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray, numpy.ndarray): Velocity in the direction of the
+            rod and in the roll direction, both (frames, 3), and the velocity in the
+            direction of the rod averaged over the simulation after the first two periods.
+        """
+
+        if period_step is None or number_of_period is None:
+            period_step, number_of_period = self.default_period_step()
+
+        def compute():
+            avg_velocity = self.average_velocity()
+
+            direction_of_rod = self.direction_of_rod(period_step, number_of_period)
+
+            # Compute the projected rod velocity in the direction of the rod
+            velocity_in_direction_of_rod = np.outer(
+                avg_velocity @ direction_of_rod, direction_of_rod
+            )
+
+            # Get the lateral or roll velocity of the rod after subtracting its projected
+            # velocity in the direction of rod
+            velocity_in_rod_roll_dir = avg_velocity - velocity_in_direction_of_rod
+
+            # We start after the ramping up which happens in the first periods
+            average_velocity_over_simulation = np.mean(
+                velocity_in_direction_of_rod[period_step * 2 :], axis=0
+            )
+
+            return (
+                velocity_in_direction_of_rod,
+                velocity_in_rod_roll_dir,
+                average_velocity_over_simulation,
+            )
+
+        return self._cached(
+            ("projected_velocity", period_step, number_of_period), compute
+        )
+
+    def curvature(self):
+        """Curvature history of shape (frames, 3, n - 1)"""
+
+        return self["curvature"]
+
+    def envelope(self):
+        """Arc length and helical buckling envelope of every frame, each of shape (frames, n - 1)"""
+
+        return self._cached("envelope", lambda: envelope(self["position"]))
+
+
+def as_kinematics_analysis(history, period=1.0):
+    """Returns history if it is already a KinematicsAnalysis, otherwise wraps it in one"""
+
+    if isinstance(history, KinematicsAnalysis):
+        return history
+
+    return KinematicsAnalysis(history, period)
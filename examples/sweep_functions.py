@@ -0,0 +1,196 @@
+import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from typing import Callable, Dict, Sequence
+
+
+def parameter_key(simulate: Callable, parameters: Dict):
+    """Hash identifying a simulation run, from the simulate function name and its parameters
+
+    Parameters are sorted by name so the key does not depend on the order they are given in.
+    """
+
+    items = sorted((key, repr(value)) for key, value in parameters.items())
+    description = repr((simulate.__name__, items))
+    return hashlib.sha1(description.encode()).hexdigest()[:16]
+
+
+def _result_fname(cache_dir, simulate, parameters):
+    return os.path.join(
+        cache_dir, f"{simulate.__name__}_{parameter_key(simulate, parameters)}.pkl"
+    )
+
+
+def load_cached_result(cache_dir, simulate, parameters):
+    """Returns the cached result of a run, or None if it has not been run yet"""
+
+    fname = _result_fname(cache_dir, simulate, parameters)
+    if not os.path.exists(fname):
+        return None
+
+    with open(fname, "rb") as f:
+        return pickle.load(f)["result"]
+
+
+def save_result(cache_dir, simulate, parameters, result):
+    """Saves the result of a run to the cache as soon as it is available
+
+    The result is written to a temporary file first and then renamed, so a crash while
+    saving never leaves a partially written result in the cache.
+    """
+
+    fname = _result_fname(cache_dir, simulate, parameters)
+    temp_fname = fname + ".tmp"
+
+    with open(temp_fname, "wb") as f:
+        pickle.dump({"parameters": parameters, "result": result}, f)
+
+    os.replace(temp_fname, fname)
+
+
+def run_parameter_sweep(
+    simulate: Callable,
+    parameter_sets: Sequence[Dict],
+    cache_dir="sweep_results",
+    cost=None,
+    num_workers=None,
+    on_result=None,
+):
+    """Runs simulate for every parameter set across a process pool, caching each result
+
+    Runs are submitted longest first, so the most expensive runs do not start last and
+    leave the other workers idle at the end of the sweep. Each result is saved as soon as
+    its run completes, keyed by a hash of its parameters, so a crash only loses the runs
+    in progress and rerunning a sweep skips every run that is already cached.
+
+    Args:
+        simulate (Callable): Module level function called as simulate(**parameters).
+        parameter_sets (list dict): Keyword arguments of each run.
+        cache_dir (str, optional): Folder the results are saved in. Defaults to
+        "sweep_results".
+        cost (Callable, optional): Estimated cost of a run from its parameters, used to
+        order the runs. Defaults to None, which uses the "elements" parameter.
+        num_workers (int, optional): Number of worker processes. Defaults to None, which
+        uses the number of CPUs.
+        on_result (Callable, optional): Called as on_result(parameters, result) for each
+        result as it becomes available, including cached ones, eg. to update a plot.
+
+    Returns:
+        list: Results in the same order as parameter_sets
+    """
+
+    if cost is None:
+        cost = lambda parameters: parameters.get("elements", 0)
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    results = [None] * len(parameter_sets)
+    pending = []
+
+    for num, parameters in enumerate(parameter_sets):
+        result = load_cached_result(cache_dir, simulate, parameters)
+
+        if result is None:
+            pending.append(num)
+            continue
+
+        print(f"Loaded cached result for {parameters}")
+        results[num] = result
+        if on_result is not None:
+            on_result(parameters, result)
+
+    # Longest runs first
+    pending.sort(key=lambda num: cost(parameter_sets[num]), reverse=True)
+
+    if not pending:
+        return results
+
+    print(f"Running {len(pending)} of {len(parameter_sets)} simulations...")
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {
+            executor.submit(simulate, **parameter_sets[num]): num for num in pending
+        }
+
+        for future in as_completed(futures):
+            num = futures[future]
+            parameters = parameter_sets[num]
+            result = future.result()
+
+            save_result(cache_dir, simulate, parameters, result)
+            print(f"Finished simulation for {parameters}")
+
+            results[num] = result
+            if on_result is not None:
+                on_result(parameters, result)
+
+    return results
+
+
+class ConvergencePlot:
+    """Log-log plot of the error norms against the number of elements, updated as results arrive
+
+    Attributes
+    ----------
+
+    elements: list
+        Number of elements of each result added so far.
+    norms: dict
+        Lists of the "l1", "l2" and "linf" error norms of each result added so far.
+    """
+
+    def __init__(self, title="Convergence", interactive=True) -> None:
+
+        import matplotlib.pyplot as plt
+
+        self.plt = plt
+        self.interactive = interactive
+        self.elements = []
+        self.norms = {"l1": [], "l2": [], "linf": []}
+
+        if interactive:
+            plt.ion()
+
+        self.fig = plt.figure(figsize=(10, 8), frameon=True, dpi=150)
+        self.ax = self.fig.add_subplot(111)
+        self.ax.grid(which="minor", color="k", linestyle="--")
+        self.ax.grid(which="major", color="k", linestyle="-")
+        self.ax.set_xscale("log")
+        self.ax.set_yscale("log")
+        self.ax.set_xlabel("N")
+        self.ax.set_ylabel("error")
+        self.ax.set_title(title)
+
+        self.lines = {
+            "l1": self.ax.plot([], [], "ro-", label="l1")[0],
+            "l2": self.ax.plot([], [], "go-", label="l2")[0],
+            "linf": self.ax.plot([], [], "bo-", label="linf")[0],
+        }
+        self.ax.legend(loc="upper right")
+
+    def add_result(self, parameters, result):
+        """Adds the error norms of a result to the plot, usable as on_result of a sweep"""
+
+        self.elements.append(parameters["elements"])
+        for norm in self.norms:
+            self.norms[norm].append(result[norm])
+
+        order = np.argsort(self.elements)
+        for norm, line in self.lines.items():
+            line.set_data(
+                np.asarray(self.elements)[order], np.asarray(self.norms[norm])[order]
+            )
+
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+        if self.interactive:
+            self.fig.canvas.draw_idle()
+            self.plt.pause(0.001)
+
+    def save(self, filename):
+        self.fig.savefig(filename, dpi=300)
@@ -0,0 +1,287 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from tqdm import tqdm
+
+from typing import Dict, Sequence
+
+AXIS_INDEX = {"x": 0, "y": 1, "z": 2}
+
+
+def compute_video_history(rods_history: Sequence[Dict], step=1, sphere_history=None):
+    """Converts the rod (and sphere) histories into arrays used for every frame of the videos
+
+    Derived quantities are computed once, vectorized over all frames, instead of per rod per
+    frame inside the rendering loop. Element midpoints are used as rod positions when the
+    position history has one more node than the radius history.
+
+    Args:
+        rods_history (list dict): Callback dictionaries of the rods, with "time", "position",
+        "radius" and optionally "com" histories.
+        step (int, optional): Only every step-th frame is kept. Defaults to 1.
+        sphere_history (list dict, optional): Callback dictionaries of spheres, with
+        "position" and "radius" histories. Defaults to None.
+
+    Returns:
+        dict: "time" array and "rods"/"spheres" lists of dicts of arrays, with positions of
+        shape (frames, 3, n).
+    """
+
+    video_history = {
+        "time": np.asarray(rods_history[0]["time"])[::step],
+        "rods": [],
+        "spheres": [],
+    }
+
+    for rod_history in rods_history:
+        position = np.asarray(rod_history["position"])[::step]
+        radius = np.asarray(rod_history["radius"])[::step]
+
+        if position.shape[2] != radius.shape[1]:
+            position = 0.5 * (position[..., 1:] + position[..., :-1])
+
+        rod = {"position": position, "radius": radius}
+        if "com" in rod_history:
+            rod["com"] = np.asarray(rod_history["com"])[::step]
+
+        video_history["rods"].append(rod)
+
+    for sphere in sphere_history or []:
+        video_history["spheres"].append(
+            {
+                "position": np.asarray(sphere["position"])[::step].reshape(-1, 3),
+                "radius": np.asarray(sphere["radius"])[::step].reshape(-1),
+            }
+        )
+
+    return video_history
+
+
+def plot_video_projections(
+    rods_history: Sequence[Dict],
+    video_names: Dict,
+    fps=60,
+    step=1,
+    sphere_history=None,
+    parallel=True,
+    **kwargs,
+):
+    """Renders videos of several projections of the rods in a single pass over the data
+
+    The histories are converted to arrays once and each projection is then rendered in
+    its own process. Artists are created once and only their data is updated each frame,
+    and only the moving artists are redrawn over a cached background (blitting), with the
+    frames piped straight to ffmpeg.
+
+    Args:
+        rods_history (list dict): Callback dictionaries of the rods.
+        video_names (dict): Maps each projection to the file name of its video. Projections
+        are "3d" or two axes eg. "xy", "xz" or "zy", where the first axis is horizontal.
+        fps (int, optional): Frame rate of the videos. Defaults to 60.
+        step (int, optional): Only every step-th frame is rendered. Defaults to 1.
+        sphere_history (list dict, optional): Callback dictionaries of spheres to be drawn.
+        Defaults to None.
+        parallel (bool, optional): Whether projections are rendered in parallel processes.
+        Defaults to True.
+
+    Keyword Args:
+        x_limits, y_limits, z_limits ((float, float)): Bounds of each axis.
+        dpi (int): Resolution of the videos. Defaults to 100.
+    """
+
+    video_history = compute_video_history(rods_history, step, sphere_history)
+
+    print("plot scene visualization video")
+
+    if parallel and len(video_names) > 1:
+        with ProcessPoolExecutor(max_workers=len(video_names)) as executor:
+            futures = [
+                executor.submit(
+                    _render_projection_video,
+                    video_history,
+                    projection,
+                    video_name,
+                    fps,
+                    False,
+                    kwargs,
+                )
+                for projection, video_name in video_names.items()
+            ]
+            for future in futures:
+                future.result()
+    else:
+        for projection, video_name in video_names.items():
+            _render_projection_video(
+                video_history, projection, video_name, fps, True, kwargs
+            )
+
+
+def prefix_video_name(video_name, prefix):
+    """Adds a prefix to the file name of a video path, eg. "out/video.mp4" -> "out/xy_video.mp4" """
+
+    folder, file_name = os.path.split(video_name)
+    return os.path.join(folder, prefix + file_name)
+
+
+def _render_projection_video(
+    video_history, projection, video_name, fps, show_progress, kwargs
+):
+    """Renders the video of a single projection, run in a worker process when in parallel"""
+
+    import matplotlib
+    from matplotlib import cm
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.patches import Circle
+    from imageio_ffmpeg import write_frames
+
+    dpi = kwargs.get("dpi", 100)
+    limits = {
+        "x": kwargs.get("x_limits", (-1.0, 1.0)),
+        "y": kwargs.get("y_limits", (-1.0, 1.0)),
+        "z": kwargs.get("z_limits", (-0.05, 1.0)),
+    }
+
+    is_3d = projection.lower() == "3d"
+    axes = "xyz" if is_3d else projection
+    indices = [AXIS_INDEX[axis] for axis in axes]
+
+    difference = lambda x: x[1] - x[0]
+    max_axis_length = max(difference(limits[axes[0]]), difference(limits[axes[1]]))
+    # The scaling factor from physical space to matplotlib space
+    scaling_factor = (2 * 0.1) / max_axis_length  # Octopus head dimension
+    scaling_factor *= 2.6e3  # Along one-axis
+
+    # Marker sizes of every frame are computed at once
+    rods = video_history["rods"]
+    spheres = video_history["spheres"]
+    rod_sizes = [np.pi * (scaling_factor * rod["radius"]) ** 2 for rod in rods]
+    sphere_sizes = [np.pi * (scaling_factor * sph["radius"]) ** 2 for sph in spheres]
+
+    with matplotlib.rc_context({"font.size": 22}):
+
+        fig = Figure(figsize=(10, 8), frameon=True, dpi=dpi)
+        canvas = FigureCanvasAgg(fig)
+
+        if is_3d:
+            ax = fig.add_subplot(111, projection="3d")
+            ax.set_xlabel("x")
+            ax.set_ylabel("y")
+            ax.set_zlabel("z")
+            ax.set_zlim(*limits[axes[2]])
+        else:
+            ax = fig.add_subplot(111)
+            ax.set_aspect("equal")
+
+        ax.set_xlim(*limits[axes[0]])
+        ax.set_ylim(*limits[axes[1]])
+
+        # Artists are created once and flagged as animated, so they are left out of
+        # the cached background and only they are redrawn each frame
+        rod_lines, rod_com_lines, rod_scatters = [], [], []
+
+        for rod_idx, rod in enumerate(rods):
+            inst_position = rod["position"][0][indices]
+
+            if is_3d:
+                rod_scatters.append(
+                    ax.scatter(*inst_position, s=rod_sizes[rod_idx][0], animated=True)
+                )
+                continue
+
+            rod_lines.append(ax.plot(*inst_position, "r", lw=0.5, animated=True)[0])
+            if "com" in rod:
+                rod_com_lines.append(
+                    ax.plot(
+                        *rod["com"][0][indices, None], "k--", lw=2.0, animated=True
+                    )[0]
+                )
+            rod_scatters.append(
+                ax.scatter(*inst_position, s=rod_sizes[rod_idx][0], animated=True)
+            )
+
+        sphere_artists = []
+        for sphere_idx, sphere in enumerate(spheres):
+            sphere_position = sphere["position"][0][indices]
+
+            if is_3d:
+                sphere_artists.append(
+                    ax.scatter(
+                        *sphere_position[:, None],
+                        s=sphere_sizes[sphere_idx][0],
+                        animated=True,
+                    )
+                )
+            else:
+                sphere_artists.append(
+                    Circle(
+                        sphere_position,
+                        sphere["radius"][0],
+                        color=cm.Spectral(sphere_idx / max(len(spheres) - 1, 1)),
+                        animated=True,
+                    )
+                )
+                ax.add_artist(sphere_artists[-1])
+
+        artists = rod_lines + rod_com_lines + rod_scatters + sphere_artists
+
+        canvas.draw()
+        background = canvas.copy_from_bbox(fig.bbox)
+        width, height = canvas.get_width_height()
+
+        writer = write_frames(
+            video_name, (width, height), pix_fmt_in="rgba", fps=fps, quality=8
+        )
+        writer.send(None)
+
+        frames = range(len(video_history["time"]))
+        if show_progress:
+            frames = tqdm(frames, desc=projection)
+
+        try:
+            for time_idx in frames:
+                canvas.restore_region(background)
+
+                for rod_idx, rod in enumerate(rods):
+                    inst_position = rod["position"][time_idx][indices]
+
+                    if is_3d:
+                        rod_scatters[rod_idx]._offsets3d = tuple(inst_position)
+                    else:
+                        rod_lines[rod_idx].set_data(*inst_position)
+                        rod_scatters[rod_idx].set_offsets(inst_position.T)
+                    rod_scatters[rod_idx].set_sizes(rod_sizes[rod_idx][time_idx])
+
+                if not is_3d:
+                    com_rods = [rod for rod in rods if "com" in rod]
+                    for com_line, rod in zip(rod_com_lines, com_rods):
+                        com_line.set_data(*rod["com"][time_idx][indices, None])
+
+                # Spheres follow their radius history as well as their position
+                for sphere_idx, sphere in enumerate(spheres):
+                    sphere_position = sphere["position"][time_idx][indices]
+                    if is_3d:
+                        sphere_artists[sphere_idx]._offsets3d = tuple(
+                            sphere_position[:, None]
+                        )
+                        sphere_artists[sphere_idx].set_sizes(
+                            sphere_sizes[sphere_idx][time_idx, None]
+                        )
+                    else:
+                        sphere_artists[sphere_idx].center = tuple(sphere_position)
+                        sphere_artists[sphere_idx].set_radius(
+                            sphere["radius"][time_idx]
+                        )
+
+                for artist in artists:
+                    # 3D collections have to be projected before being drawn on their own
+                    if is_3d:
+                        artist.do_3d_projection()
+                    ax.draw_artist(artist)
+
+                canvas.blit(fig.bbox)
+                writer.send(np.asarray(canvas.buffer_rgba()))
+
+        finally:
+            writer.close()
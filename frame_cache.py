@@ -0,0 +1,220 @@
+"""
+Cache of the meshdata of the frames of a simulation, kept within the memory available.
+
+The cache is sized from the memory available when it is created (see
+system_memory.memory_budget), and the available memory is checked again every
+MEMORY_CHECK_INTERVAL seconds while it is monitored. Simulations often run on the same
+machine, so when the memory available on the host falls below RESERVED_MEMORY_FRACTION
+of its total, the cache shrinks to give the difference back, and grows back to its
+budget once the pressure is gone. Frames are evicted from the farthest from the frame
+displayed (the playhead), as they are the last to be displayed again when playing.
+
+Frames evicted are simply meshed again when they are displayed.
+"""
+import threading
+
+import numpy as np
+
+from system_memory import available_memory, memory_budget, total_memory
+
+# Fraction of the total memory kept available on the host, frames are evicted below it
+RESERVED_MEMORY_FRACTION = 0.1
+MEMORY_CHECK_INTERVAL = 1.0  # seconds
+
+
+def mesh_bytes(tube_meshes):
+    """Bytes of the arrays of the TubeMesh or QuantizedTubeMesh of each level"""
+
+    return sum(
+        value.nbytes
+        for tube_mesh in tube_meshes
+        for value in tube_mesh
+        if isinstance(value, np.ndarray)
+    )
+
+
+def frame_bytes(frame):
+    """Bytes of the meshdata of a frame, a dict of the meshes of each object"""
+
+    return sum(mesh_bytes(tube_meshes) for tube_meshes in frame.values())
+
+
+class FrameCache:
+    """Meshdata of frames by index, kept within a number of frames and a memory budget
+
+    Frames are dicts of the meshing.TubeMesh (or QuantizedTubeMesh) of each level of
+    detail of each rod. The frame at the playhead is never evicted. The cache is thread
+    safe, so frames can be meshed in a background thread.
+
+    Attributes
+    ----------
+
+    max_frames: int or None
+        Largest number of frames kept, or None for no limit.
+    budget: float
+        Bytes the cache may take up when there is no memory pressure.
+    max_bytes: float
+        Bytes the cache may take up now, lowered under memory pressure.
+    reserved_memory: float
+        Bytes kept available on the host, frames are evicted when less is available.
+    playhead: int
+        Index of the frame displayed last.
+    bytes: int
+        Bytes of the frames cached.
+    hits: int
+        Number of frames displayed that were cached.
+    misses: int
+        Number of frames displayed that had to be meshed.
+    evictions: int
+        Number of frames evicted.
+    """
+
+    def __init__(
+        self,
+        max_frames=None,
+        budget=None,
+        reserved_memory=None,
+        check_interval=MEMORY_CHECK_INTERVAL,
+    ) -> None:
+
+        if reserved_memory is None:
+            total = total_memory()
+            reserved_memory = 0.0 if total is None else RESERVED_MEMORY_FRACTION * total
+
+        self.max_frames = max_frames
+        self.budget = memory_budget() if budget is None else budget
+        self.max_bytes = self.budget
+        self.reserved_memory = reserved_memory
+        self.check_interval = check_interval
+        self.playhead = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._frames = {}
+        self._frame_bytes = {}
+        self._lock = threading.Lock()
+        self._stop_monitoring = threading.Event()
+        self._monitor_thread = None
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, index):
+        return index in self._frames
+
+    def __getitem__(self, index):
+        with self._lock:
+            return self._frames[index]
+
+    def get(self, index):
+        """Moves the playhead to a frame and returns it, or None if it is not cached"""
+
+        with self._lock:
+            self.playhead = index
+            frame = self._frames.get(index)
+
+            if frame is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            return frame
+
+    def put(self, index, frame):
+        """Caches a frame, evicting the frames farthest from the playhead if needed
+
+        Returns:
+            bool: Whether the frame is kept, which it is not if it is itself the
+            farthest from the playhead once the cache is full
+        """
+
+        size = frame_bytes(frame)
+
+        with self._lock:
+            self.bytes += size - self._frame_bytes.get(index, 0)
+            self._frames[index] = frame
+            self._frame_bytes[index] = size
+            self._evict()
+
+            return index in self._frames
+
+    def _evict(self):
+        """Evicts the frames farthest from the playhead until within the limits"""
+
+        while len(self._frames) > 1 and (
+            self.bytes > self.max_bytes
+            or (self.max_frames is not None and len(self._frames) > self.max_frames)
+        ):
+            # Frames behind the playhead go first at equal distance, as playback moves
+            # forward
+            farthest = max(
+                (index for index in self._frames if index != self.playhead),
+                key=lambda index: (abs(index - self.playhead), index < self.playhead),
+            )
+            del self._frames[farthest]
+            self.bytes -= self._frame_bytes.pop(farthest)
+            self.evictions += 1
+
+    def check_memory(self):
+        """Adjusts max_bytes to the memory available, evicting frames under pressure"""
+
+        available = available_memory()
+        if available is None:
+            return
+
+        with self._lock:
+            # The memory taken up by the cache is not available, so it is added back to
+            # find what the cache could take up while leaving reserved_memory available
+            self.max_bytes = max(
+                min(self.budget, self.bytes + available - self.reserved_memory), 0.0
+            )
+            self._evict()
+
+    def _monitor(self):
+        while not self._stop_monitoring.wait(self.check_interval):
+            self.check_memory()
+
+    def start_monitoring(self):
+        """Checks the available memory every check_interval seconds in a thread"""
+
+        if self._monitor_thread is not None:
+            return
+
+        self.check_memory()
+        self._stop_monitoring.clear()
+        self._monitor_thread = threading.Thread(target=self._monitor, daemon=True)
+        self._monitor_thread.start()
+
+    def stop_monitoring(self):
+
+        if self._monitor_thread is None:
+            return
+
+        self._stop_monitoring.set()
+        self._monitor_thread.join()
+        self._monitor_thread = None
+
+    def stats(self):
+        """Current size and effectiveness of the cache
+
+        Returns:
+            dict: Bytes cached ("bytes"), bytes allowed ("max_bytes"), number of frames
+            cached ("frames"), frames displayed that were cached ("hits") or not
+            ("misses"), the fraction that were cached ("hit_rate") and number of frames
+            evicted ("evictions")
+        """
+
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "frames": len(self._frames),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,151 @@
+"""
+Measures the import time of the viewer modules and checks they do not import heavy
+dependencies they do not need.
+
+Each module is imported in a fresh interpreter with python -X importtime, which reports
+the cumulative time of every import. Viewing saved data should not import PyElastica or
+Numba, and importing the Visualizer should not import Vispy or tqdm until a window or
+video is made.
+
+Run from the repository root:
+
+    python import_benchmark.py
+    python import_benchmark.py --repeat 5 --budget 1.5
+
+The exit code is 1 if a module imports a forbidden dependency or is slower than the
+budget, so it can be used to catch import time regressions.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Dependencies each module must not import, by module
+FORBIDDEN_IMPORTS = {
+    "utils": ("elastica", "numba"),
+    "scene_bounds": ("elastica", "numba", "vispy"),
+    "trajectory_file": ("elastica", "numba", "vispy"),
+    "picking": ("elastica", "numba", "vispy"),
+    "meshing": ("elastica", "numba", "vispy", "tqdm"),
+    "visualizer": ("elastica", "numba", "vispy", "tqdm", "imageio_ffmpeg"),
+    "qt_visualizer": ("elastica", "numba", "tqdm", "imageio_ffmpeg"),
+}
+
+# Budget of the cumulative import time of each module in milliseconds, multiplied by the
+# --budget factor. Importing numpy alone takes most of it.
+IMPORT_BUDGETS = {
+    "utils": 150.0,
+    "scene_bounds": 150.0,
+    "trajectory_file": 150.0,
+    "picking": 150.0,
+    "meshing": 150.0,
+    "visualizer": 200.0,
+    "qt_visualizer": 600.0,
+}
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import(module):
+    """Imports a module in a fresh interpreter with python -X importtime
+
+    Returns:
+        (float, dict) or None: Cumulative import time of the module in milliseconds and
+        the cumulative time of every module imported along with it, or None if the import
+        failed
+    """
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+
+    if result.returncode != 0:
+        print(f"{module}: import failed\n{result.stderr.splitlines()[-1]}")
+        return None
+
+    imported = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            imported[match.group(4)] = int(match.group(2)) / 1000
+
+    return imported[module], imported
+
+
+def run_benchmark(modules, repeat=3, budget=1.0):
+    """Measures the import time of modules and checks their imports
+
+    The best of repeat imports is kept, so the times are not inflated by a cold disk
+    cache.
+
+    Returns:
+        bool: Whether every module is within its budget and imports no forbidden module
+    """
+
+    passed = True
+
+    for module in modules:
+        measurements = [measure_import(module)]
+        if measurements[0] is None:
+            passed = False
+            continue
+        measurements += [measure_import(module) for _ in range(repeat - 1)]
+
+        import_time, imported = min(measurements, key=lambda result: result[0])
+        module_budget = IMPORT_BUDGETS.get(module, float("inf")) * budget
+
+        # Top level packages imported, eg. vispy for vispy.scene
+        packages = {name.split(".")[0] for name in imported}
+        forbidden = [
+            package
+            for package in FORBIDDEN_IMPORTS.get(module, ())
+            if package in packages
+        ]
+
+        status = "ok"
+        if forbidden:
+            status = "imports " + ", ".join(forbidden)
+        elif import_time > module_budget:
+            status = f"over budget of {module_budget:.0f}ms"
+        passed = passed and status == "ok"
+
+        # The slowest dependencies show where the time goes
+        slowest = sorted(
+            (
+                (time, name)
+                for name, time in imported.items()
+                if "." not in name and name != module
+            ),
+            reverse=True,
+        )[:3]
+        slowest = ", ".join(f"{name} {time:.1f}ms" for time, name in slowest)
+
+        print(f"{module:<16} {import_time:8.1f}ms  {status:<24} ({slowest})")
+
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "modules",
+        nargs="*",
+        default=list(FORBIDDEN_IMPORTS),
+        help="Modules to import. Defaults to every viewer module.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Number of imports of each module"
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=1.0,
+        help="Factor applied to the import time budgets, eg. for slower machines",
+    )
+    args = parser.parse_args()
+
+    sys.exit(0 if run_benchmark(args.modules, args.repeat, args.budget) else 1)
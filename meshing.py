@@ -0,0 +1,932 @@
+"""
+Functions for calculating the meshdata of objects in the visualization dict, shared by the
+Visualizer, CanvasWrapper and MeshdataSource so objects are meshed the same way in each.
+
+Only the vertices of each frame are cached. Faces only depend on the number of rings of
+a tube, so they are shared by every frame and rod with the same number of rings, and colors
+are a separate render attribute (TubeColor) applied when a frame is displayed, so
+recoloring never requires meshing again.
+
+Rings are placed at the nodes of the rod by default. With an adaptive tolerance, rings are
+instead placed from the curvature of the centerline (see adaptive_ring_nodes), so straight
+stretches need few rings and sharp bends get extra rings on a smooth curve through the
+nodes.
+
+Rods can be colored by a scalar field by adding the following to their parameters in the
+visualization dict:
+
+"scalar": np.ndarray of shape (frames, n) or (frames, 3, n), eg. internal stress or curvature
+    for each node or element. Vector fields are reduced to their magnitude, and the values
+    are resampled along the rod to match the number of tube points.
+"colormap": str, name of a Vispy colormap. Defaults to "viridis".
+"clim": (float, float), the scalar values mapped to the ends of the colormap. Defaults to
+    the minimum and maximum over the whole simulation.
+
+Tubes are meshed with several cross-section resolutions (LOD_TUBE_POINTS), and each rod
+is displayed with the level matching its radius on screen, see TubeLOD.
+
+The axis-aligned bounding box of every object at every frame is calculated up front from
+its position history, so objects outside the view can be skipped, see FrustumCuller.
+
+Spheres and cylinders are rendered with instancing, where every body of an object shares
+one unit mesh and only the position, transform and color of each instance change between
+frames. Their parameters in the visualization dict are:
+
+"type": "sphere" or "cylinder"
+"position": np.ndarray of shape (frames, 3, instances), the center of each body
+"radius": np.ndarray of shape (frames, instances) or (frames,)
+"color": a single color, or colors of shape (instances, 3 or 4) or (frames, instances, 3 or 4)
+"direction": np.ndarray of shape (frames, 3, instances), axis of each cylinder
+"length": np.ndarray of shape (frames, instances) or (frames,), length of each cylinder
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+# Vispy is imported where it is used, so importing this module does not import Vispy
+# for code that only needs the bounding boxes, culling or colors
+
+TUBE_POINTS = 8
+LUT_SIZE = 256
+
+# Cross-section resolutions of each level of detail, from finest to coarsest, and the
+# projected tube radius in pixels below which the next coarser level is used. Levels only
+# change once the radius is a factor LOD_HYSTERESIS past a threshold, to avoid popping.
+LOD_TUBE_POINTS = (TUBE_POINTS, 5, 3)
+LOD_SCREEN_RADII = (6.0, 1.5)
+LOD_HYSTERESIS = 1.25
+# The origin and the unit axes, mapped through the transform from the scene to the view
+# to detect when the camera has moved
+VIEW_PROBE_POINTS = np.vstack((np.zeros(3), np.eye(3)))
+
+# Vertices of a tube at one frame and level of detail, with the fractional node index of
+# each ring, or None if the rings are at the nodes
+TubeMesh = namedtuple("TubeMesh", ["vertices", "ring_nodes"])
+
+# TubeMesh with its vertices quantized to uint16 within their bounding box, taking half
+# the memory. Vertices are recovered as quantized * scale + lower.
+QuantizedTubeMesh = namedtuple(
+    "QuantizedTubeMesh", ["vertices", "ring_nodes", "lower", "scale"]
+)
+QUANTIZATION_LEVELS = np.iinfo(np.uint16).max
+INSTANCED_TYPES = ("sphere", "cylinder")
+
+# Rods are either drawn as full tube meshes, or as line strips of their centerlines straight
+# from the position history, which needs no meshing
+RENDER_MODES = ("tube", "centerline")
+SPHERE_ROWS = 12
+SPHERE_COLS = 16
+CYLINDER_COLS = 16
+
+
+def colormap_lut(colormap="viridis", size=LUT_SIZE):
+    """Precomputes a lookup table of RGBA colors for a colormap
+
+    Args:
+        colormap (str, optional): Name of a Vispy colormap. Defaults to "viridis".
+        size (int, optional): Number of entries in the table. Defaults to 256.
+
+    Returns:
+        numpy.ndarray: uint8 array of shape (size, 4)
+    """
+
+    from vispy.color import get_colormap
+
+    colors = get_colormap(colormap).map(np.linspace(0.0, 1.0, size))
+    return np.round(np.asarray(colors) * 255).astype(np.uint8)
+
+
+def scalar_limits(scalar_history, clim=None):
+    """Returns the scalar limits of the colormap, calculated once over the whole simulation"""
+
+    if clim is not None:
+        return float(clim[0]), float(clim[1])
+
+    return float(np.nanmin(scalar_history)), float(np.nanmax(scalar_history))
+
+
+def _resample_along_rod(scalar_history, num_points):
+    """Linearly resamples (frames, n) scalar values to (frames, num_points) along the rod"""
+
+    num_values = scalar_history.shape[1]
+    if num_values == num_points:
+        return scalar_history
+
+    # Fractional index of each tube point into the scalar values, shared by every frame
+    positions = np.linspace(0.0, num_values - 1, num_points)
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, num_values - 1)
+    weight = positions - lower
+
+    return scalar_history[:, lower] * (1.0 - weight) + scalar_history[:, upper] * weight
+
+
+def calculate_point_colors(object_parameters, return_clim=False):
+    """Maps the scalar history of an object through its colormap into per-point colors
+
+    The mapping is vectorized over the whole simulation, so it only happens once before
+    meshing starts and colors are stored as uint8.
+
+    Args:
+        object_parameters (dict): Parameters of the object in the visualization dict
+        return_clim (bool, optional): Whether the colormap limits used are also returned.
+        Defaults to False.
+
+    Returns:
+        numpy.ndarray or None: uint8 array of shape (frames, points, 4), where points
+        is the number of tube points of the rod. None if the object has no scalar field.
+    """
+
+    if object_parameters.get("scalar") is None:
+        return (None, None) if return_clim else None
+
+    scalar_history = np.asarray(object_parameters["scalar"], dtype=np.float64)
+
+    # Vector quantities such as internal stress are colored by their magnitude
+    if scalar_history.ndim == 3:
+        scalar_history = np.linalg.norm(scalar_history, axis=1)
+
+    # Some quantities are not recorded at the first callback, so the first recorded
+    # values are repeated to match the number of frames
+    num_frames = len(object_parameters["position"])
+    if len(scalar_history) < num_frames:
+        padding = np.repeat(
+            scalar_history[:1], num_frames - len(scalar_history), axis=0
+        )
+        scalar_history = np.concatenate((padding, scalar_history))
+
+    num_points = np.shape(object_parameters["radius"])[-1]
+    scalar_history = _resample_along_rod(scalar_history, num_points)
+
+    lut = colormap_lut(object_parameters.get("colormap", "viridis"))
+    min_val, max_val = scalar_limits(scalar_history, object_parameters.get("clim"))
+    scale = (len(lut) - 1) / (max_val - min_val) if max_val > min_val else 0.0
+
+    indices = np.clip((scalar_history - min_val) * scale, 0, len(lut) - 1)
+    point_colors = lut[np.nan_to_num(indices).astype(np.intp)]
+
+    if return_clim:
+        return point_colors, (min_val, max_val)
+
+    return point_colors
+
+
+@lru_cache(maxsize=None)
+def tube_faces(num_points, tube_points=TUBE_POINTS, closed=False):
+    """Calculates the triangle faces of a tube, which are the same for every frame of a rod
+
+    Vertices are ordered ring by ring, with tube_points vertices per ring, matching the
+    vertices calculated by Vispy's Tube visual. Results are cached, so tubes with the same
+    number of rings share their faces.
+
+    Args:
+        num_points (int): Number of points along the rod
+        tube_points (int, optional): Number of points in the cross section. Defaults to 8.
+        closed (bool, optional): Whether the tube joins the last point to the first.
+        Defaults to False.
+
+    Returns:
+        numpy.ndarray: uint32 array of shape (2 * segments * tube_points, 3)
+    """
+
+    segments = num_points - 1
+    i = np.arange(segments)[:, None]
+    j = np.arange(tube_points)[None, :]
+
+    ip = (i + 1) % segments if closed else i + 1
+    jp = (j + 1) % tube_points
+
+    index_a = i * tube_points + j
+    index_b = ip * tube_points + j
+    index_c = ip * tube_points + jp
+    index_d = i * tube_points + jp
+
+    faces = np.stack(
+        (
+            np.stack((index_a, index_b, index_d), axis=-1),
+            np.stack((index_b, index_c, index_d), axis=-1),
+        ),
+        axis=2,
+    )
+    faces = faces.reshape(-1, 3).astype(np.uint32)
+    faces.flags.writeable = False
+    return faces
+
+
+def tube_mesh_faces(tube_mesh, tube_points, closed):
+    """Returns the faces of a TubeMesh from its number of rings"""
+
+    return tube_faces(len(tube_mesh.vertices) // tube_points, tube_points, closed)
+
+
+def adaptive_ring_nodes(position, radius, tolerance):
+    """Places the rings of a tube from the curvature of its centerline
+
+    An arc of length L and curvature kappa deviates from its chord by about
+    L**2 * kappa / 8, so rings spaced sqrt(8 * tolerance / kappa) apart keep the meshed
+    centerline within tolerance of the smooth one. Rings are placed at equal steps of the
+    integral of the inverse of this spacing along the rod. Changes in radius are treated
+    the same way, with the second derivative of the radius in place of the curvature.
+
+    Args:
+        position (numpy.ndarray): Node positions of shape (n, 3)
+        radius (numpy.ndarray): Radius at each node of shape (n,)
+        tolerance (float): Largest allowed deviation, in the units of the simulation
+
+    Returns:
+        numpy.ndarray: Fractional node index of each ring, from 0 to n - 1
+    """
+
+    num_nodes = len(position)
+
+    # The curvature needs an interior node, so short rods keep a ring at every node
+    if num_nodes < 3:
+        return np.arange(num_nodes, dtype=float)
+
+    # Coincident nodes are given a tiny length so the arc length is strictly increasing
+    lengths = np.maximum(np.linalg.norm(np.diff(position, axis=0), axis=1), 1e-12)
+    arc_length = np.concatenate(([0.0], np.cumsum(lengths)))
+
+    # Discrete curvature at interior nodes, from the turning angle of the tangents
+    tangents = np.diff(position, axis=0) / lengths[:, None]
+    cos_angle = np.clip(np.sum(tangents[:-1] * tangents[1:], axis=1), -1.0, 1.0)
+    curvature = np.arccos(cos_angle) / (0.5 * (lengths[:-1] + lengths[1:]))
+    curvature = np.concatenate((curvature[:1], curvature, curvature[-1:]))
+
+    radius_change = np.abs(np.gradient(np.gradient(radius, arc_length), arc_length))
+
+    # A small floor keeps the integral strictly increasing along straight stretches
+    density = np.sqrt((curvature + radius_change) / (8.0 * tolerance))
+    density = np.maximum(density, 1e-6 / arc_length[-1])
+
+    ring_measure = np.concatenate(
+        ([0.0], np.cumsum(0.5 * (density[1:] + density[:-1]) * lengths))
+    )
+    num_rings = max(2, int(np.ceil(ring_measure[-1])) + 1)
+
+    ring_arc_length = np.interp(
+        np.linspace(0.0, ring_measure[-1], num_rings), ring_measure, arc_length
+    )
+    return np.interp(ring_arc_length, arc_length, np.arange(num_nodes))
+
+
+def _catmull_rom(points, nodes):
+    """Evaluates the uniform Catmull-Rom spline through points at fractional node indices"""
+
+    last = len(points) - 1
+    i = np.clip(np.floor(nodes).astype(int), 0, last - 1)
+    u = (nodes - i)[:, None]
+
+    p0 = points[np.maximum(i - 1, 0)]
+    p1 = points[i]
+    p2 = points[i + 1]
+    p3 = points[np.minimum(i + 2, last)]
+
+    return 0.5 * (
+        2.0 * p1
+        + (p2 - p0) * u
+        + (2.0 * p0 - 5.0 * p1 + 4.0 * p2 - p3) * u**2
+        + (3.0 * p1 - p0 - 3.0 * p2 + p3) * u**3
+    )
+
+
+def _tube_rings(object_parameters, index, adaptive_tolerance=None):
+    """Returns the ring centers, radii and fractional node indices of a rod at a frame"""
+
+    # Takes object position data up to -1th element so dimension matches radius dimension
+    # This is due to how PyElastica functions, where position array has one more element
+    # than the radius array
+    object_position = object_parameters["position"][index].transpose()[:-1]
+    object_radius = object_parameters["radius"][index]
+
+    # Closed rods keep one ring per node, as their faces wrap around the nodes
+    if adaptive_tolerance is None or object_parameters["closed"]:
+        return object_position, object_radius, None
+
+    ring_nodes = adaptive_ring_nodes(object_position, object_radius, adaptive_tolerance)
+    ring_position = _catmull_rom(object_position, ring_nodes)
+    ring_radius = np.interp(ring_nodes, np.arange(len(object_radius)), object_radius)
+
+    return ring_position, ring_radius, ring_nodes
+
+
+def calculate_tube_vertices(
+    object_parameters, index, tube_points=TUBE_POINTS, adaptive_tolerance=None
+):
+    """Calculates the tube vertices of a rod at a single frame
+
+    Only the geometry is calculated, colors are applied separately when the frame is
+    displayed so they can be changed without meshing again.
+
+    Args:
+        object_parameters (dict): Parameters of the rod in the visualization dict
+        index (int): Index of the frame
+        tube_points (int, optional): Number of points in the cross section. Defaults to 8.
+        adaptive_tolerance (float, optional): If given, rings are placed from the
+        curvature of the rod within this tolerance instead of at every node.
+
+    Returns:
+        TubeMesh: float32 vertices of shape (rings * tube_points, 3) and the node of
+        each ring
+    """
+
+    return calculate_tube_lod_vertices(
+        object_parameters, index, (tube_points,), adaptive_tolerance
+    )[0]
+
+
+def calculate_tube_lod_vertices(
+    object_parameters, index, lod_tube_points=LOD_TUBE_POINTS, adaptive_tolerance=None
+):
+    """Calculates the tube vertices of a rod at a single frame for every level of detail
+
+    Rings are placed once and shared by every level of detail.
+
+    Returns:
+        tuple: TubeMesh of each level of detail
+    """
+
+    from vispy import scene
+
+    ring_position, ring_radius, ring_nodes = _tube_rings(
+        object_parameters, index, adaptive_tolerance
+    )
+
+    return tuple(
+        TubeMesh(
+            scene.visuals.Tube(
+                points=ring_position,
+                radius=ring_radius,
+                closed=object_parameters["closed"],
+                tube_points=tube_points,
+            )
+            ._meshdata.get_vertices()
+            .astype(np.float32),
+            ring_nodes,
+        )
+        for tube_points in lod_tube_points
+    )
+
+
+def quantize_tube_mesh(tube_mesh):
+    """Quantizes the vertices of a TubeMesh to uint16 within their bounding box
+
+    The largest error is half a step, 1 / (2 * QUANTIZATION_LEVELS) of the size of the
+    rod along each axis, eg. under 10 micrometers for a rod 1 meter long.
+
+    Returns:
+        QuantizedTubeMesh: The quantized mesh
+    """
+
+    vertices = tube_mesh.vertices
+    lower = vertices.min(axis=0)
+    scale = (vertices.max(axis=0) - lower) / QUANTIZATION_LEVELS
+    # Flat axes are given any scale, as every vertex is quantized to 0 along them
+    scale[scale == 0] = 1.0
+
+    quantized = np.rint((vertices - lower) / scale).astype(np.uint16)
+    return QuantizedTubeMesh(quantized, tube_mesh.ring_nodes, lower, scale)
+
+
+def dequantize_tube_mesh(quantized_mesh):
+    """Recovers the TubeMesh of a QuantizedTubeMesh, with float32 vertices"""
+
+    vertices = quantized_mesh.vertices * quantized_mesh.scale + quantized_mesh.lower
+    return TubeMesh(vertices.astype(np.float32), quantized_mesh.ring_nodes)
+
+
+def select_lod_level(level, screen_radius, thresholds=LOD_SCREEN_RADII):
+    """Picks the level of detail for a tube from its radius on screen, with hysteresis
+
+    Args:
+        level (int): Current level, where 0 is the finest
+        screen_radius (float): Projected radius of the tube in pixels
+        thresholds (tuple, optional): Radius below which each next coarser level is used.
+        Defaults to LOD_SCREEN_RADII.
+
+    Returns:
+        int: The new level
+    """
+
+    while level > 0 and screen_radius > thresholds[level - 1] * LOD_HYSTERESIS:
+        level -= 1
+
+    while (
+        level < len(thresholds) and screen_radius < thresholds[level] / LOD_HYSTERESIS
+    ):
+        level += 1
+
+    return level
+
+
+class TubeLOD:
+    """Level of detail of the cross sections of a rod, picked from its size on screen
+
+    The projected radius is estimated at the center of the rod, from the largest radius
+    of its elements, through the transform from the scene to the canvas. This works for
+    any camera, as it only uses the transform the camera sets.
+
+    Attributes
+    ----------
+
+    tube_points: tuple
+        Number of points in the cross section of each level, from finest to coarsest.
+    level: int
+        Index of the level currently used.
+    centers: numpy.ndarray
+        Center of the rod at each frame, of shape (frames, 3).
+    radii: numpy.ndarray
+        Largest radius of the rod at each frame, of shape (frames,).
+    """
+
+    def __init__(self, object_parameters, lod_tube_points=LOD_TUBE_POINTS) -> None:
+
+        self.tube_points = tuple(lod_tube_points)
+        self.thresholds = LOD_SCREEN_RADII[: len(self.tube_points) - 1]
+        self.level = 0
+        self.centers = np.mean(object_parameters["position"], axis=2)
+        self.radii = np.max(object_parameters["radius"], axis=1)
+
+    @property
+    def current_tube_points(self):
+        return self.tube_points[self.level]
+
+    def update(self, screen_radius):
+        """Updates the level from the projected radius, returns whether it changed"""
+
+        level = select_lod_level(self.level, screen_radius, self.thresholds)
+        changed = level != self.level
+        self.level = level
+        return changed
+
+
+def update_lod_levels(lods, transform, index):
+    """Updates the levels of detail of several rods at a frame
+
+    The centers of every rod, offset by their radius along each axis, are mapped to the
+    canvas in a single call. The largest offset on screen is used as projected radius.
+
+    Args:
+        lods (dict): TubeLOD of each object
+        transform (vispy.visuals.transforms.BaseTransform): Transform from the scene to
+        the canvas, eg. view.scene.transform
+        index (int): Index of the frame
+
+    Returns:
+        list: Objects whose level changed
+    """
+
+    if not lods:
+        return []
+
+    centers = np.array([lod.centers[index] for lod in lods.values()])
+    radii = np.array([lod.radii[index] for lod in lods.values()])
+
+    offsets = np.vstack((np.zeros(3), np.eye(3)))
+    points = centers[:, None, :] + radii[:, None, None] * offsets[None]
+
+    mapped = np.asarray(transform.map(points.reshape(-1, 3)))
+    mapped = (mapped[:, :2] / mapped[:, 3:4]).reshape(len(lods), 4, 2)
+    screen_radii = np.linalg.norm(mapped[:, 1:] - mapped[:, :1], axis=2).max(axis=1)
+
+    return [
+        object
+        for object, screen_radius in zip(lods, screen_radii)
+        if lods[object].update(screen_radius)
+    ]
+
+
+def calculate_bounding_boxes(object_parameters):
+    """Calculates the axis-aligned bounding box of an object at every frame
+
+    Boxes are calculated for the whole history at once, from the nodes of a rod or the
+    centers of the instances of a sphere or cylinder object, padded by the largest radius
+    (and half the largest length of cylinders) of the frame. Per-frame bounds recorded
+    with the object ("bounds", see scene_bounds) are used instead of the positions if
+    available.
+
+    Args:
+        object_parameters (dict): Parameters of the object in the visualization dict
+
+    Returns:
+        numpy.ndarray: float32 minimum and maximum corners of shape (frames, 2, 3)
+    """
+
+    position = object_parameters["position"]
+    num_frames = len(position)
+
+    radius = np.asarray(object_parameters["radius"]).reshape(num_frames, -1)
+    padding = np.max(radius, axis=1)
+
+    if object_parameters["type"] == "cylinder":
+        length = np.asarray(object_parameters["length"]).reshape(num_frames, -1)
+        padding = padding + 0.5 * np.max(length, axis=1)
+
+    bounds = np.empty((num_frames, 2, 3), dtype=np.float32)
+
+    if "bounds" in object_parameters:
+        bounds[:] = object_parameters["bounds"]
+    else:
+        bounds[:, 0] = np.min(position, axis=2)
+        bounds[:, 1] = np.max(position, axis=2)
+
+    bounds[:, 0] -= padding[:, None]
+    bounds[:, 1] += padding[:, None]
+
+    return bounds
+
+
+# Picks the minimum (False) or maximum (True) of each axis for the 8 corners of a box
+BOX_CORNERS = np.array(
+    [[x, y, z] for x in (False, True) for y in (False, True) for z in (False, True)]
+)
+
+
+class FrustumCuller:
+    """Tracks which objects are inside the view frustum, from their bounding boxes
+
+    The corners of the bounding boxes of every object at a frame are mapped through the
+    transform from the scene to the view in a single call. An object is culled when all
+    its corners are beyond the same edge of the view, or all behind the camera. The test
+    is done on homogeneous coordinates, so it holds for corners behind a perspective
+    camera. Objects culled are neither uploaded nor drawn.
+
+    Attributes
+    ----------
+
+    objects: list
+        Names of the objects, in the order of the bounds.
+    bounds: numpy.ndarray
+        Bounding boxes of every object at each frame, of shape (frames, objects, 2, 3).
+    visible: dict
+        Whether each object was inside the view at the last update.
+    """
+
+    def __init__(self, objects) -> None:
+        """
+        Args:
+            objects (dict): Parameters of each object in the visualization dict
+        """
+
+        self.objects = list(objects)
+        self.bounds = np.stack(
+            [calculate_bounding_boxes(object) for object in objects.values()], axis=1
+        )
+        self.visible = {object: True for object in self.objects}
+
+    def update(self, transform, size, index):
+        """Updates which objects are visible at a frame
+
+        Args:
+            transform (vispy.visuals.transforms.BaseTransform): Transform from the scene
+            to the view, eg. view.scene.transform
+            size ((float, float)): Size of the view in pixels, eg. view.size
+            index (int): Index of the frame
+
+        Returns:
+            list: Objects whose visibility changed
+        """
+
+        if not self.objects:
+            return []
+
+        bounds = self.bounds[index]
+        corners = np.where(BOX_CORNERS[None], bounds[:, 1:2], bounds[:, 0:1])
+
+        mapped = np.asarray(transform.map(corners.reshape(-1, 3)))
+        mapped = mapped.reshape(len(self.objects), len(BOX_CORNERS), 4)
+        x, y, w = mapped[..., 0], mapped[..., 1], mapped[..., 3]
+
+        outside = (
+            np.all(x < 0, axis=1)
+            | np.all(x > size[0] * w, axis=1)
+            | np.all(y < 0, axis=1)
+            | np.all(y > size[1] * w, axis=1)
+            | np.all(w <= 0, axis=1)
+        )
+
+        changed = []
+        for object, is_outside in zip(self.objects, outside):
+            if self.visible[object] == is_outside:
+                self.visible[object] = not is_outside
+                changed.append(object)
+
+        return changed
+
+
+class TubeColor:
+    """Render attribute holding the color of a tube, separate from its cached geometry
+
+    A tube is either colored uniformly or by its scalar field mapped through a colormap.
+    Changing the color, colormap or opacity only changes this attribute, so it is
+    instant and the meshdata never needs to be calculated again.
+
+    Attributes
+    ----------
+
+    color: str or tuple
+        The uniform color of the tube.
+    colormap: str
+        Name of the Vispy colormap the scalar field is mapped through.
+    clim: (float, float)
+        The scalar values mapped to the ends of the colormap.
+    opacity: float
+        Opacity of the tube from 0 to 1.
+    use_scalar: bool
+        Whether the tube is colored by its scalar field or uniformly.
+    point_colors: numpy.ndarray or None
+        uint8 colors of each tube point for every frame, of shape (frames, points, 4).
+    """
+
+    def __init__(self, object_parameters) -> None:
+
+        self.object_parameters = object_parameters
+        self.color = object_parameters["color"]
+        self.colormap = object_parameters.get("colormap", "viridis")
+        self.clim = object_parameters.get("clim")
+        self.opacity = 1.0
+        self.use_scalar = object_parameters.get("scalar") is not None
+        self.point_colors = None
+
+        if self.use_scalar:
+            self._map_scalars()
+
+    def _map_scalars(self):
+
+        self.point_colors, self.clim = calculate_point_colors(
+            {**self.object_parameters, "colormap": self.colormap, "clim": self.clim},
+            return_clim=True,
+        )
+
+    def set_color(self, color):
+        """Colors the tube uniformly with color"""
+
+        self.color = color
+        self.use_scalar = False
+
+    def set_colormap(self, colormap=None, clim=None):
+        """Colors the tube by its scalar field, optionally changing colormap and limits
+
+        Raises:
+            ValueError: Error if the object has no scalar field in the visualization dict
+        """
+
+        if self.object_parameters.get("scalar") is None:
+            raise ValueError("Object has no scalar field to be colored by")
+
+        if colormap is not None:
+            self.colormap = colormap
+
+        if clim is not None:
+            self.clim = clim
+
+        self._map_scalars()
+        self.use_scalar = True
+
+    def set_opacity(self, opacity):
+        self.opacity = opacity
+
+    def get_state(self):
+        """Returns the color settings, with resolved colormap limits, to recreate the colors"""
+
+        return {
+            "color": self.color,
+            "colormap": self.colormap,
+            "clim": self.clim,
+            "opacity": self.opacity,
+            "use_scalar": self.use_scalar,
+        }
+
+    def set_state(self, state):
+        """Applies color settings from get_state"""
+
+        self.opacity = state["opacity"]
+        if state["use_scalar"]:
+            self.set_colormap(state["colormap"], state["clim"])
+        else:
+            self.set_color(state["color"])
+
+    def mesh_colors(self, index, tube_points=TUBE_POINTS, ring_nodes=None):
+        """Returns the color arguments to pass to MeshVisual.set_data for a frame
+
+        Args:
+            index (int): Index of the frame
+            tube_points (int, optional): Number of points in the cross section of the
+            displayed level of detail. Defaults to 8.
+            ring_nodes (numpy.ndarray, optional): Fractional node index of each ring of
+            an adaptively meshed tube, each ring takes the color of the nearest node.
+            Defaults to None, where there is a ring at every node.
+
+        Returns:
+            dict: "color" and "vertex_colors" keyword arguments
+        """
+
+        if self.use_scalar:
+            ring_colors = self.point_colors[index]
+            if ring_nodes is not None:
+                ring_colors = ring_colors[np.rint(ring_nodes).astype(np.intp)]
+
+            vertex_colors = np.repeat(ring_colors, tube_points, axis=0).astype(
+                np.float32
+            )
+            vertex_colors /= 255
+            vertex_colors[:, 3] *= self.opacity
+            return {"color": None, "vertex_colors": vertex_colors}
+
+        from vispy.color import Color
+
+        return {"color": Color(self.color, alpha=self.opacity), "vertex_colors": None}
+
+
+def unit_instance_meshdata(object_type):
+    """Unit mesh shared by every instance of a sphere or cylinder object
+
+    Spheres have radius 1, and cylinders have radius 1 and length 1 along the z axis
+    and are centered on the origin.
+    """
+
+    from vispy.geometry import MeshData, create_cylinder, create_sphere
+
+    if object_type == "sphere":
+        return create_sphere(rows=SPHERE_ROWS, cols=SPHERE_COLS, radius=1.0)
+
+    cylinder = create_cylinder(2, CYLINDER_COLS, radius=[1.0, 1.0], length=1.0)
+    return MeshData(
+        vertices=cylinder.get_vertices() - np.array([0.0, 0.0, 0.5]),
+        faces=cylinder.get_faces(),
+    )
+
+
+def _per_instance(values, index, num_instances):
+    """Values of a frame broadcast to every instance, from (frames,) or (frames, instances)"""
+
+    frame_values = np.reshape(np.asarray(values)[index], (-1,))
+    return np.broadcast_to(frame_values, (num_instances,))
+
+
+def calculate_instance_transforms(object_parameters, index):
+    """Calculates the position and transform of every instance of an object at a frame
+
+    Args:
+        object_parameters (dict): Parameters of the sphere or cylinder object
+        index (int): Index of the frame
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray): float32 positions of shape (instances, 3) and
+        transforms of shape (instances, 3, 3), mapping the unit mesh to each body
+    """
+
+    positions = np.asarray(object_parameters["position"][index]).reshape(3, -1).T
+    num_instances = len(positions)
+    radius = _per_instance(object_parameters["radius"], index, num_instances)
+
+    if object_parameters["type"] == "sphere":
+        transforms = radius[:, None, None] * np.eye(3)
+
+    else:
+        direction = np.asarray(object_parameters["direction"][index]).reshape(3, -1).T
+        direction = direction / np.linalg.norm(direction, axis=1)[:, None]
+        length = _per_instance(object_parameters["length"], index, num_instances)
+
+        # Orthonormal basis around each axis, from whichever coordinate axis is least
+        # aligned with it
+        helper = np.zeros_like(direction)
+        helper[np.arange(num_instances), np.argmin(np.abs(direction), axis=1)] = 1.0
+        normal = np.cross(direction, helper)
+        normal /= np.linalg.norm(normal, axis=1)[:, None]
+        binormal = np.cross(direction, normal)
+
+        # Columns are the images of the x, y and z axes of the unit cylinder
+        transforms = np.stack(
+            (
+                normal * radius[:, None],
+                binormal * radius[:, None],
+                direction * length[:, None],
+            ),
+            axis=-1,
+        )
+
+    return positions.astype(np.float32), transforms.astype(np.float32)
+
+
+def calculate_instance_colors(object_parameters, index):
+    """Colors of every instance of an object at a frame
+
+    Returns:
+        numpy.ndarray or None: Colors of shape (instances, 3 or 4), or None if the
+        object has a single color
+    """
+
+    color = object_parameters["color"]
+    if isinstance(color, str) or np.ndim(color) < 2:
+        return None
+
+    color = np.asarray(color)
+    return color[index] if color.ndim == 3 else color
+
+
+def instancing_supported():
+    """Whether the OpenGL backend of Vispy can draw instanced meshes
+
+    The default "gl2" backend cannot, instancing needs eg. vispy.use(gl="gl+") and
+    PyOpenGL.
+    """
+
+    from vispy.gloo import gl
+
+    return hasattr(gl, "glDrawArraysInstanced")
+
+
+@lru_cache(maxsize=None)
+def _unit_instance_arrays(object_type):
+    """Vertices and faces of the unit mesh, shared by every merged instance mesh"""
+
+    meshdata = unit_instance_meshdata(object_type)
+    return (
+        meshdata.get_vertices().astype(np.float32),
+        meshdata.get_faces().astype(np.uint32),
+    )
+
+
+def calculate_merged_instances(object_parameters, index):
+    """Merges every instance of an object at a frame into a single mesh
+
+    Used when instancing is not supported, the unit mesh is then transformed on the
+    CPU for each instance.
+
+    Returns:
+        dict: "vertices", "faces", "vertex_colors" and "color" keyword arguments of the
+        mesh visual
+    """
+
+    unit_vertices, unit_faces = _unit_instance_arrays(object_parameters["type"])
+    positions, transforms = calculate_instance_transforms(object_parameters, index)
+    num_instances = len(positions)
+
+    vertices = positions[:, None] + np.einsum("nij,vj->nvi", transforms, unit_vertices)
+    offsets = len(unit_vertices) * np.arange(num_instances, dtype=np.uint32)
+    faces = unit_faces + offsets[:, None, None]
+
+    instance_colors = calculate_instance_colors(object_parameters, index)
+    if instance_colors is None:
+        colors = {"vertex_colors": None, "color": object_parameters["color"]}
+    else:
+        colors = {
+            "vertex_colors": np.repeat(instance_colors, len(unit_vertices), axis=0),
+            "color": "white",
+        }
+
+    return {
+        "vertices": vertices.reshape(-1, 3),
+        "faces": faces.reshape(-1, 3),
+        **colors,
+    }
+
+
+def create_instanced_visual(object_parameters, index=0, parent=None):
+    """Creates the instanced mesh visual of a sphere or cylinder object
+
+    Every instance is drawn in a single draw call, sharing the unit mesh. If the OpenGL
+    backend does not support instancing, the instances are merged into a single mesh
+    instead, see calculate_merged_instances.
+    """
+
+    from vispy import scene
+
+    if not instancing_supported():
+        return scene.visuals.Mesh(
+            shading="smooth",
+            parent=parent,
+            **calculate_merged_instances(object_parameters, index),
+        )
+
+    positions, transforms = calculate_instance_transforms(object_parameters, index)
+    instance_colors = calculate_instance_colors(object_parameters, index)
+
+    return scene.visuals.InstancedMesh(
+        meshdata=unit_instance_meshdata(object_parameters["type"]),
+        instance_positions=positions,
+        instance_transforms=transforms,
+        instance_colors=instance_colors,
+        color="white" if instance_colors is not None else object_parameters["color"],
+        shading="smooth",
+        parent=parent,
+    )
+
+
+def update_instanced_visual(visual, object_parameters, index):
+    """Uploads the positions, transforms and colors of every instance at a frame"""
+
+    from vispy import scene
+
+    if not isinstance(visual, scene.visuals.InstancedMesh):
+        visual.set_data(**calculate_merged_instances(object_parameters, index))
+        return
+
+    positions, transforms = calculate_instance_transforms(object_parameters, index)
+    visual.instance_positions = positions
+    visual.instance_transforms = transforms
+
+    if np.ndim(object_parameters["color"]) == 3:
+        visual.instance_colors = calculate_instance_colors(object_parameters, index)
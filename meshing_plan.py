@@ -0,0 +1,290 @@
+"""
+Planning of how rods are meshed, picked before any meshing starts so a run too large to
+mesh ahead of time is found out before the machine starts swapping.
+
+A few frames spread over the simulation are meshed as a calibration, which gives the
+memory taken up by the meshdata of a frame and the time to mesh it. The first of these
+that fits in the memory budget is picked:
+
+- "eager": every frame is meshed ahead of time and kept.
+- "quantized": every frame is meshed ahead of time and kept quantized to 16 bits, which
+  halves the memory, see meshing.quantize_tube_mesh.
+- "lazy": frames are meshed as they are displayed, and the frames displayed last are
+  kept in a cache sized to the budget. Only picked if a frame fits in the budget and
+  frames can be meshed as fast as they are played.
+- "centerline": rods are drawn as lines straight from the position history, so nothing
+  is meshed.
+
+The plan is printed, and any mode can be forced instead.
+"""
+import time
+
+import numpy as np
+
+from frame_cache import mesh_bytes
+from meshing import (
+    LOD_TUBE_POINTS,
+    calculate_tube_lod_vertices,
+    quantize_tube_mesh,
+)
+from system_memory import memory_budget as default_memory_budget
+
+MESHING_MODES = ("eager", "quantized", "lazy", "centerline")
+
+CALIBRATION_FRAMES = 3
+# Frame rate lazy meshing must keep up with to be picked
+PLAYBACK_FPS = 30
+# Largest number of frames kept when meshing lazily, as the frames around the one
+# displayed are all that is needed
+MAX_CACHED_FRAMES = 256
+
+
+def calibrate_meshing(
+    visualization_dict,
+    lod_tube_points=LOD_TUBE_POINTS,
+    adaptive_tolerance=None,
+    calibration_frames=CALIBRATION_FRAMES,
+):
+    """Meshes a few frames spread over the simulation to measure the cost of a frame
+
+    Returns:
+        (float, float, float): Bytes of the meshdata of every rod at a frame, the same
+        quantized, and seconds to mesh every rod at a frame, averaged over the frames
+    """
+
+    rods = [
+        object_parameters
+        for object_parameters in visualization_dict["objects"].values()
+        if object_parameters["type"] == "rod"
+    ]
+    if not rods:
+        return 0.0, 0.0, 0.0
+
+    num_frames = len(visualization_dict["time"])
+    indices = np.unique(np.linspace(0, num_frames - 1, calibration_frames).astype(int))
+
+    # Warms up, as the first mesh also imports Vispy
+    calculate_tube_lod_vertices(rods[0], 0, lod_tube_points, adaptive_tolerance)
+
+    frame_bytes, quantized_bytes, frame_time = 0, 0, 0.0
+    for index in indices:
+        for object_parameters in rods:
+            start = time.perf_counter()
+            tube_meshes = calculate_tube_lod_vertices(
+                object_parameters, index, lod_tube_points, adaptive_tolerance
+            )
+            frame_time += time.perf_counter() - start
+
+            frame_bytes += mesh_bytes(tube_meshes)
+            quantized_bytes += mesh_bytes(map(quantize_tube_mesh, tube_meshes))
+
+    return (
+        frame_bytes / len(indices),
+        quantized_bytes / len(indices),
+        frame_time / len(indices),
+    )
+
+
+def _format_bytes(num_bytes):
+    if num_bytes < 1024**2:
+        return f"{num_bytes / 1024:.1f}KiB"
+    if num_bytes < 1024**3:
+        return f"{num_bytes / 1024**2:.1f}MiB"
+    return f"{num_bytes / 1024**3:.2f}GiB"
+
+
+class MeshingPlan:
+    """How rods are meshed, from the size of the simulation and a calibration
+
+    Attributes
+    ----------
+
+    mode: str
+        One of MESHING_MODES.
+    cached_frames: int or None
+        Number of frames kept when meshing lazily, otherwise None.
+    memory_budget: float
+        Bytes the meshdata may take up.
+    num_frames: int
+        Number of frames of the simulation.
+    num_rods: int
+        Number of rods.
+    num_elements: int
+        Number of elements of every rod.
+    frame_bytes: float
+        Bytes of the meshdata of every rod at a frame.
+    quantized_frame_bytes: float
+        Bytes of the quantized meshdata of every rod at a frame.
+    frame_time: float
+        Seconds to mesh every rod at a frame.
+    reason: str
+        Why the mode was picked.
+    """
+
+    def __init__(
+        self,
+        mode,
+        cached_frames,
+        memory_budget,
+        num_frames,
+        num_rods,
+        num_elements,
+        frame_bytes,
+        quantized_frame_bytes,
+        frame_time,
+        reason,
+    ) -> None:
+
+        self.mode = mode
+        self.cached_frames = cached_frames
+        self.memory_budget = memory_budget
+        self.num_frames = num_frames
+        self.num_rods = num_rods
+        self.num_elements = num_elements
+        self.frame_bytes = frame_bytes
+        self.quantized_frame_bytes = quantized_frame_bytes
+        self.frame_time = frame_time
+        self.reason = reason
+
+    @property
+    def estimated_bytes(self):
+        """Bytes the meshdata is expected to take up with the mode picked"""
+
+        if self.mode == "eager":
+            return self.num_frames * self.frame_bytes
+        if self.mode == "quantized":
+            return self.num_frames * self.quantized_frame_bytes
+        if self.mode == "lazy":
+            return self.cached_frames * self.frame_bytes
+        return 0.0
+
+    @property
+    def estimated_precompute_time(self):
+        """Seconds to mesh every frame ahead of time, 0 if not meshed ahead of time"""
+
+        if self.mode in ("eager", "quantized"):
+            return self.num_frames * self.frame_time
+        return 0.0
+
+    def visualizer_kwargs(self):
+        """Keyword arguments of the Visualizer meshing as planned"""
+
+        return {
+            "cached_frames": self.cached_frames,
+            "quantize": self.mode == "quantized",
+            "render_mode": "centerline" if self.mode == "centerline" else "tube",
+            "memory_budget": self.memory_budget,
+        }
+
+    def __str__(self):
+
+        all_frames_bytes = self.num_frames * self.frame_bytes
+
+        return (
+            f"Meshing plan: {self.mode} ({self.reason})\n"
+            f"  {self.num_rods} rods, {self.num_elements} elements, "
+            f"{self.num_frames} frames\n"
+            f"  {_format_bytes(self.frame_bytes)} and {self.frame_time * 1000:.1f}ms "
+            f"per frame, {_format_bytes(all_frames_bytes)} for every frame\n"
+            f"  Expected {_format_bytes(self.estimated_bytes)} of a "
+            f"{_format_bytes(self.memory_budget)} budget, "
+            f"{self.estimated_precompute_time:.1f}s meshing ahead of time"
+        )
+
+
+def plan_meshing(
+    visualization_dict,
+    mode=None,
+    memory_budget=None,
+    lod_tube_points=LOD_TUBE_POINTS,
+    adaptive_tolerance=None,
+    cached_frames=None,
+    single_pass=False,
+    playback_fps=PLAYBACK_FPS,
+    calibration_frames=CALIBRATION_FRAMES,
+):
+    """Picks how the rods of a visualization dict are meshed, and prints the plan
+
+    Args:
+        visualization_dict (dict): The visualization dict
+        mode (str, optional): One of MESHING_MODES, forcing the mode instead of picking
+        it. Defaults to None.
+        memory_budget (float, optional): Bytes the meshdata may take up. Defaults to
+        None, which is system_memory.MEMORY_FRACTION of the available memory.
+        lod_tube_points (tuple, optional): Number of points in the cross section of each
+        level of detail meshed. Defaults to LOD_TUBE_POINTS.
+        adaptive_tolerance (float, optional): The adaptive_tolerance of the Visualizer.
+        Defaults to None.
+        cached_frames (int, optional): Number of frames kept when meshing lazily.
+        Defaults to None, as many as fit in the budget up to MAX_CACHED_FRAMES.
+        single_pass (bool, optional): Whether each frame is displayed once, eg. when
+        exporting a video, so meshing lazily costs nothing. Defaults to False.
+        playback_fps (float, optional): Frame rate lazy meshing must keep up with to be
+        picked. Defaults to PLAYBACK_FPS.
+        calibration_frames (int, optional): Number of frames meshed to calibrate.
+        Defaults to CALIBRATION_FRAMES.
+
+    Raises:
+        ValueError: Error if mode is not one of MESHING_MODES
+
+    Returns:
+        MeshingPlan: The plan, see MeshingPlan.visualizer_kwargs
+    """
+
+    if mode is not None and mode not in MESHING_MODES:
+        raise ValueError(f"Meshing mode should be one of {MESHING_MODES}")
+
+    if memory_budget is None:
+        memory_budget = default_memory_budget()
+
+    rods = [
+        object_parameters
+        for object_parameters in visualization_dict["objects"].values()
+        if object_parameters["type"] == "rod"
+    ]
+    num_frames = len(visualization_dict["time"])
+
+    # Centerlines need no calibration, as nothing is meshed
+    if mode == "centerline":
+        frame_bytes, quantized_frame_bytes, frame_time = 0.0, 0.0, 0.0
+    else:
+        frame_bytes, quantized_frame_bytes, frame_time = calibrate_meshing(
+            visualization_dict, lod_tube_points, adaptive_tolerance, calibration_frames
+        )
+
+    if cached_frames is None:
+        cached_frames = int(memory_budget // max(frame_bytes, 1.0))
+        cached_frames = min(max(cached_frames, 1), MAX_CACHED_FRAMES, num_frames)
+
+    # Lazy meshing keeps at least the frame displayed, so it needs a frame to fit
+    fits_a_frame = frame_bytes <= memory_budget
+
+    if mode is not None:
+        reason = "forced"
+    elif single_pass and fits_a_frame:
+        mode, reason = "lazy", "each frame is displayed once"
+    elif num_frames * frame_bytes <= memory_budget:
+        mode, reason = "eager", "every frame fits in the budget"
+    elif num_frames * quantized_frame_bytes <= memory_budget:
+        mode, reason = "quantized", "every frame fits in the budget once quantized"
+    elif fits_a_frame and frame_time <= 1.0 / playback_fps:
+        mode, reason = "lazy", f"frames are meshed faster than {playback_fps} fps"
+    else:
+        mode = "centerline"
+        reason = f"frames do not fit in the budget or mesh at {playback_fps} fps"
+
+    plan = MeshingPlan(
+        mode,
+        cached_frames if mode == "lazy" else None,
+        memory_budget,
+        num_frames,
+        len(rods),
+        sum(np.shape(object_parameters["radius"])[-1] for object_parameters in rods),
+        frame_bytes,
+        quantized_frame_bytes,
+        frame_time,
+        reason,
+    )
+    print(plan)
+
+    return plan
@@ -0,0 +1,274 @@
+"""
+Command line interface to view or export a saved simulation, without writing a script.
+
+    pyelastica-vis continuum_snake.dat
+    pyelastica-vis tapered_nine_muscle_rods.npz --closed "*ring*"
+    pyelastica-vis trajectories.traj --export video.mp4 --headless
+
+Saved runs are loaded along the fastest path for their format:
+
+- Indexed trajectory files (see trajectory_file) are memory-mapped, so only the frames
+  displayed are read from disk, and the scene is framed from the bounds stored in the
+  file.
+- .npz files are read one array at a time, see load_npz_postprocessing_dict.
+- Any other file is unpickled, either as a postprocessing dict saved from the callbacks
+  or as a visualization dict.
+
+How rods are meshed is planned from the size of the simulation and the available
+memory, see meshing_plan. The Visualizer and Vispy are only imported once the data is
+loaded, so the interface starts quickly.
+"""
+import argparse
+import fnmatch
+import pickle
+import re
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from meshing import LOD_TUBE_POINTS, TUBE_POINTS
+from meshing_plan import MESHING_MODES, plan_meshing
+from trajectory_file import is_trajectory_file, read_trajectory_file
+from utils import generate_visualization_dict
+
+# Histories saved by the examples, eg. "straight_rods_position_history" or
+# "position_history_body"
+NPZ_HISTORY_KEY = re.compile(
+    r"^(?:(?P<prefix>.+)_)?(?P<quantity>position|radius)_history(?:_(?P<suffix>.+))?$"
+)
+
+
+def load_npz_postprocessing_dict(fname):
+    """Loads the histories of the objects saved in an .npz file as a postprocessing dict
+
+    Arrays are matched to objects from their names, either "<object>/<quantity>" or the
+    "<object>_<quantity>_history" and "<quantity>_history_<object>" names used by the
+    examples. The times are read from "time" or "time_history". Histories of several
+    objects stacked in one array, of shape (objects, frames, ...), are split into one
+    object each, named "<object>_<number>".
+
+    Raises:
+        ValueError: Error if the file has no times
+
+    Returns:
+        dict: Dictionary of objects, where each value is a dictionary of their histories
+    """
+
+    postprocessing_dict = defaultdict(dict)
+
+    with np.load(fname) as data:
+
+        time_key = next((key for key in ("time", "time_history") if key in data), None)
+        if time_key is None:
+            raise ValueError(f"{fname} has no 'time' or 'time_history' array")
+        time_history = data[time_key]
+
+        for key in data.files:
+            if "/" in key:
+                object, quantity = key.split("/", 1)
+            else:
+                match = NPZ_HISTORY_KEY.match(key)
+                if match is None:
+                    continue
+                object = match.group("prefix") or match.group("suffix")
+                quantity = match.group("quantity")
+
+            postprocessing_dict[object][quantity] = data[key]
+
+    objects = {}
+    for object, history in postprocessing_dict.items():
+
+        if "position" not in history or "radius" not in history:
+            print(f"Skipping {object}, which has no position or radius history")
+            continue
+
+        # Stacked histories have one more dimension than (frames, 3, nodes) positions
+        if np.ndim(history["position"]) == 4:
+            for num in range(len(history["position"])):
+                objects[f"{object}_{num}"] = {
+                    quantity: value[num] for quantity, value in history.items()
+                }
+        else:
+            objects[object] = history
+
+    for history in objects.values():
+        history.setdefault("time", time_history)
+
+    return objects
+
+
+def load_visualization_dict(fname):
+    """Loads a saved simulation as a visualization dict, the fastest way for its format
+
+    Args:
+        fname (str): An indexed trajectory file, an .npz file, or a pickled
+        postprocessing dict or visualization dict
+
+    Returns:
+        dict: The visualization dict
+    """
+
+    if is_trajectory_file(fname):
+        return generate_visualization_dict(read_trajectory_file(fname))
+
+    if fname.endswith(".npz"):
+        return generate_visualization_dict(load_npz_postprocessing_dict(fname))
+
+    with open(fname, "rb") as f:
+        saved = pickle.load(f)
+
+    # Visualization dicts are used as they are
+    if "objects" in saved and "time" in saved:
+        return saved
+
+    return generate_visualization_dict(saved)
+
+
+def _parse_args(argv):
+
+    parser = argparse.ArgumentParser(
+        prog="pyelastica-vis",
+        description="View or export a saved PyElastica simulation.",
+    )
+    parser.add_argument(
+        "fname",
+        help="Indexed trajectory file, .npz file or pickled postprocessing dict (.dat)",
+    )
+    parser.add_argument(
+        "--export", metavar="VIDEO", help="Export the simulation to a video and exit"
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Export without a display, with the OSMesa software OpenGL backend",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Export with this many rendering processes, see export_video_parallel",
+    )
+    parser.add_argument(
+        "--meshing",
+        choices=("auto",) + MESHING_MODES,
+        default="auto",
+        help="How rods are meshed, see meshing_plan. Defaults to auto, planned from "
+        "the size of the simulation and the available memory.",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        metavar="GIB",
+        help="Memory the meshdata may take up. Defaults to half the available memory.",
+    )
+    parser.add_argument(
+        "--cached-frames",
+        type=int,
+        help="Number of frames kept when meshing lazily. Defaults to as many as fit "
+        "in the memory budget.",
+    )
+    parser.add_argument(
+        "--camera",
+        choices=("turntable", "arcball", "fly"),
+        default="turntable",
+    )
+    parser.add_argument(
+        "--axes", default="xz", help="Axes added to the scene, eg. xyz. Defaults to xz."
+    )
+    parser.add_argument(
+        "--closed",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Rods whose name matches this pattern are closed, eg. '*ring*'",
+    )
+    parser.add_argument("--size", type=int, nargs=2, default=(800, 608))
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--quality", type=int, default=10)
+    parser.add_argument("--backend", help="Vispy app backend, eg. pyqt5 or egl")
+    parser.add_argument(
+        "--no-lod", action="store_true", help="Only mesh the finest cross section"
+    )
+    parser.add_argument(
+        "--adaptive-tolerance",
+        type=float,
+        help="Place rings along the rods from their curvature, within this tolerance",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.headless and args.export is None:
+        parser.error("--headless needs --export, as no window can be shown")
+
+    if args.cached_frames is not None and args.cached_frames < 1:
+        parser.error("--cached-frames must be at least 1")
+
+    return args
+
+
+def main(argv=None):
+    """Entry point of the pyelastica-vis command"""
+
+    args = _parse_args(argv)
+
+    start_time = time.perf_counter()
+    visualization_dict = load_visualization_dict(args.fname)
+    print(f"Data loaded in {time.perf_counter() - start_time:.3f}s")
+
+    for object, object_parameters in visualization_dict["objects"].items():
+        if any(fnmatch.fnmatchcase(object, pattern) for pattern in args.closed):
+            object_parameters["closed"] = True
+
+    memory_budget = None
+    if args.memory_budget is not None:
+        memory_budget = args.memory_budget * 1024**3
+
+    plan = plan_meshing(
+        visualization_dict,
+        mode=None if args.meshing == "auto" else args.meshing,
+        memory_budget=memory_budget,
+        lod_tube_points=(TUBE_POINTS,) if args.no_lod else LOD_TUBE_POINTS,
+        adaptive_tolerance=args.adaptive_tolerance,
+        cached_frames=args.cached_frames,
+        single_pass=args.export is not None,
+    )
+
+    from visualizer import Visualizer
+
+    backend = args.backend
+    if backend is None and args.headless:
+        backend = "osmesa"
+
+    visualizer = Visualizer(
+        visualization_dict,
+        canvas_size=tuple(args.size),
+        backend=backend,
+        lod=not args.no_lod,
+        adaptive_tolerance=args.adaptive_tolerance,
+        **plan.visualizer_kwargs(),
+    )
+
+    for axis in args.axes:
+        visualizer.add_axis(axis)
+    getattr(visualizer, f"{args.camera}_camera")()
+
+    if args.export is None:
+        visualizer.run()
+
+    elif args.workers is not None:
+        visualizer.export_video_parallel(
+            args.export,
+            num_workers=args.workers,
+            fps=args.fps,
+            quality=args.quality,
+        )
+
+    else:
+        visualizer.export_video(args.export, fps=args.fps, quality=args.quality)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
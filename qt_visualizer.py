@@ -8,11 +8,34 @@ from vispy import app, scene
 from vispy.scene import SceneCanvas, visuals, Text
 from vispy.app import use_app
 
+from frame_cache import FrameCache
+from meshing import (
+    INSTANCED_TYPES,
+    LOD_TUBE_POINTS,
+    RENDER_MODES,
+    TUBE_POINTS,
+    VIEW_PROBE_POINTS,
+    FrustumCuller,
+    TubeColor,
+    TubeLOD,
+    calculate_tube_lod_vertices,
+    create_instanced_visual,
+    tube_mesh_faces,
+    update_instanced_visual,
+    update_lod_levels,
+)
+from picking import RodPicker, describe_pick
+from scene_bounds import SceneBounds
 from utils import generate_visualization_dict
 
 IMAGE_SHAPE = (600, 800)  # (height, width)
 CANVAS_SIZE = (800, 600)  # (width, height)
 
+# Meshdata calculated in the background thread is handed over to the GUI thread in batches,
+# flushed when either limit is reached, so signal overhead does not dominate for light frames
+BATCH_MAX_FRAMES = 64
+BATCH_MAX_INTERVAL = 0.016  # seconds
+
 
 class CustomSlider(QtWidgets.QSlider):
     """Custom slider class based off QSlider to change slider position on mouse click"""
@@ -83,12 +106,16 @@ class PlayPauseControls(QtWidgets.QWidget):
         self.progress_bar.setRange(0, 0)
         self.progress_bar.setFormat("Calculating Meshdata... %p%")
 
+        # Switches between tube and centerline rendering
+        self.centerline_checkbox = QtWidgets.QCheckBox("Centerlines")
+
         # Widgets are placed within QGrid
         controlLayout = QtWidgets.QHBoxLayout()
         controlLayout = QtWidgets.QGridLayout()
         controlLayout.setContentsMargins(0, 0, 0, 0)
         controlLayout.addWidget(self.play_button, 0, 0)
         controlLayout.addWidget(self.position_slider, 0, 1)
+        controlLayout.addWidget(self.centerline_checkbox, 0, 2)
         controlLayout.addWidget(self.progress_bar, 1, 0, -1, -1)
         self.setLayout(controlLayout)
 
@@ -102,18 +129,130 @@ class PlayPauseControls(QtWidgets.QWidget):
             QtWidgets.QWidget.keyPressEvent(self, event)
 
 
+def mesh_frame(visualization_dict, index, lod_tube_points, adaptive_tolerance=None):
+    """Meshes every rod of the simulation at a frame
+
+    Only vertices are meshed, for every level of detail. Faces and colors are kept by
+    the canvas.
+
+    Returns:
+        dict: meshing.TubeMesh of each level of detail of each rod, by the name of the
+        rod in the canvas
+    """
+
+    frame = {}
+
+    for num, object in enumerate(visualization_dict["objects"]):
+
+        object_parameters = visualization_dict["objects"][object]
+
+        if object_parameters["type"] == "rod":
+            frame[f"{object}_{num}"] = calculate_tube_lod_vertices(
+                object_parameters, index, lod_tube_points, adaptive_tolerance
+            )
+
+    return frame
+
+
 class CanvasWrapper:
-    """Class that contains Vispy canvas and corresponding methods to be embedded in GUI"""
+    """Class that contains Vispy canvas and corresponding methods to be embedded in GUI
+
+    Args:
+        visualization_dict (dict): Visualization dict of the simulation
+        render_mode (str, optional): "tube" to draw rods as tube meshes, or "centerline" to
+        draw them as lines straight from the position history. Defaults to "tube".
+        lod (bool, optional): Whether rods are meshed with several cross-section
+        resolutions, picked from their size on screen. Defaults to True.
+        adaptive_tolerance (float, optional): If given, rings are placed along the rods
+        from their curvature, keeping the meshed centerline within this distance of the
+        smooth one. Defaults to None, a ring at every node.
+        culling (bool, optional): Whether objects outside the view are skipped, neither
+        uploaded nor drawn. Defaults to True.
+        domain_percentile (float, optional): If given, the domain framed by the cameras
+        and axes ignores the frames beyond this percentile of the extent of each object.
+        Defaults to None, the full extent.
+        start_time (float, optional): time.perf_counter() when startup began, from which
+        time_to_first_frame is measured. Defaults to None, the creation of the canvas.
+        memory_budget (float, optional): Bytes the cached meshdata may take up. Frames
+        evicted to stay within it are meshed again when they are displayed. Defaults to
+        None, half the memory available, see system_memory.memory_budget.
+    """
 
-    def __init__(self, visualization_dict):
+    def __init__(
+        self,
+        visualization_dict,
+        render_mode="tube",
+        lod=True,
+        adaptive_tolerance=None,
+        culling=True,
+        domain_percentile=None,
+        start_time=None,
+        memory_budget=None,
+    ):
+
+        # Time to first frame is measured up to the first draw of the canvas
+        self._start_time = time.perf_counter() if start_time is None else start_time
+        self.time_to_first_frame = None
 
         self.canvas = SceneCanvas(keys="interactive", size=CANVAS_SIZE, bgcolor="black")
         self.view = self.canvas.central_widget.add_view()
         self.visualization_dict = visualization_dict
+        self.domain_percentile = domain_percentile
         self.objects = {}
-        self.meshdata_cache = []
+
+        # Frames meshed ahead by the data source are cached within the memory budget,
+        # and the frames that are not cached are meshed when they are displayed.
+        # meshed_frames is the number of frames from the first the slider can reach in
+        # tube mode
+        self.meshdata_cache = FrameCache(budget=memory_budget)
+        self.meshed_frames = 0
+        self._frame_index = None
+        self._frame = None
+
+        # Only vertices are cached for each frame, faces are shared by every frame with
+        # the same number of rings and colors are applied when a frame is displayed
+        self.colors = {}
+        self._current_vertices = {}
+
+        # Every level of detail is cached, and the level displayed for each rod is
+        # picked from its size on screen
+        self.lod = lod
+        self.lod_tube_points = LOD_TUBE_POINTS if lod else (TUBE_POINTS,)
+        self.lods = {}
+        self.adaptive_tolerance = adaptive_tolerance
+
+        # Spheres and cylinders are instanced and updated straight from the
+        # visualization dict, as they have no meshdata
+        self.instanced_objects = {}
+
+        # Centerlines of the rods of each group share a single line buffer. Rods named
+        # in tube_objects are still drawn as tubes in centerline mode
+        self.centerlines = {}
+        self.render_mode = "tube"
+        self.tube_objects = set()
         self.data_length = len(visualization_dict["time"])
 
+        # Index of the frame currently displayed, used to skip redundant scene updates so
+        # the canvas is only redrawn when the frame, camera or scene state has changed
+        self._current_index = 0
+        self._tube_color = None
+
+        # Objects whose bounding box at the current frame is outside the view are
+        # culled, and the frame last uploaded for each object is kept so objects coming
+        # back into view are only uploaded if they are out of date
+        self.culler = None
+        self._uploaded_index = {}
+
+        # Picks the rod element under the mouse, building the element hierarchy of a
+        # frame only once it is inspected
+        self.picker = RodPicker(
+            {
+                object: object_parameters
+                for object, object_parameters in visualization_dict["objects"].items()
+                if object_parameters["type"] == "rod"
+            }
+        )
+
         # Iterates through objects passed in visualization dictionary
         # and intializes them into the scene
 
@@ -124,22 +263,12 @@ class CanvasWrapper:
 
             if object_type == "rod":
 
-                is_closed = object_parameters["closed"]
                 color = object_parameters["color"]
 
-                # Takes object position data up to -1th element so dimension matches radius dimension
-                # This is due to how PyElastica functions, where position array has one more element
-                # than the radius array
-                object_position = object_parameters["position"][0].transpose()[:-1]
-                object_radius = object_parameters["radius"][0]
-
-                # Calculates tube meshdata
-                initial_tube_meshdata = visuals.Tube(
-                    points=object_position,
-                    radius=object_radius,
-                    closed=is_closed,
-                    color=color,
-                )._meshdata
+                self.colors[f"{object}_{num}"] = TubeColor(object_parameters)
+                self.lods[f"{object}_{num}"] = TubeLOD(
+                    object_parameters, self.lod_tube_points
+                )
 
                 self.objects[f"{object}_{num}"] = visuals.Tube(
                     points=[[0, 0, 0], [1, 1, 1]],
@@ -147,13 +276,26 @@ class CanvasWrapper:
                     parent=self.view.scene,
                     name=f"{object}",
                 )
-                self.objects[f"{object}_{num}"].set_data(meshdata=initial_tube_meshdata)
 
-            elif object_type == "sphere":
+                # Calculates tube vertices of the first frame, nothing is meshed while
+                # rods are drawn as centerlines
+                if render_mode == "tube":
+                    self._set_tube_frame(f"{object}_{num}", 0)
+
+                group = self.centerlines.setdefault(
+                    object_parameters.get("group", object),
+                    {"color": color, "objects": []},
+                )
+                group["objects"].append(object_parameters)
+
+            elif object_type in INSTANCED_TYPES:
 
-                raise NotImplementedError(
-                    "TODO: Implement other shapes and object visualization"
+                self.objects[f"{object}_{num}"] = create_instanced_visual(
+                    object_parameters, parent=self.view.scene
                 )
+                self.instanced_objects[f"{object}_{num}"] = object_parameters
+                self._uploaded_index[f"{object}_{num}"] = 0
+
             else:
 
                 raise ValueError("Not valid object type")
@@ -169,14 +311,306 @@ class CanvasWrapper:
             parent=self.canvas.central_widget,
         )
 
+        # Values of the rod element under the mouse
+        self.inspect_text = scene.Text(
+            "",
+            font_size=10,
+            color="w",
+            anchor_x="left",
+            anchor_y="top",
+            pos=(10, 60),
+            parent=self.canvas.central_widget,
+        )
+        self.canvas.events.mouse_move.connect(self._on_mouse_move)
+
+        if culling:
+            self.culler = FrustumCuller(
+                {
+                    f"{object}_{num}": visualization_dict["objects"][object]
+                    for num, object in enumerate(visualization_dict["objects"])
+                }
+            )
+
+        self._create_centerlines()
+        self.set_render_mode(render_mode)
+
+        # The first frame is meshed straight away in tube mode, so the slider can reach it
+        # before the data source has started
+        if 0 in self.meshdata_cache:
+            self.meshed_frames = 1
+
+        self.meshdata_cache.start_monitoring()
+
+        # Levels of detail and objects in view are updated whenever the camera moves.
+        # Cameras change the scene transform in place, which emits no transform_change
+        # event, so the view is checked before each draw instead
+        self._view_probe = None
+        self.canvas.events.draw.connect(self._on_view_change, position="first")
+        self.canvas.events.draw.connect(self._on_first_draw, position="last")
+
         # Calculates the spatial domain traversed by the objects during the simulation
         # Used for automatic scaling of axes and camera framing
         self._calculate_domain()
 
+    def _on_first_draw(self, event):
+        """Records the time to the first frame, once it has been drawn"""
+
+        self.canvas.events.draw.disconnect(self._on_first_draw)
+        self.time_to_first_frame = time.perf_counter() - self._start_time
+        print(f"Time to first frame: {self.time_to_first_frame:.3f}s")
+
+    def _create_centerlines(self):
+        """Creates one line visual per group of rods, hidden until centerline mode is used
+
+        The nodes of every rod in the group are concatenated into one buffer, and the
+        segments joining consecutive nodes of each rod are given as connections so the
+        whole group is a single draw call.
+        """
+
+        for group in self.centerlines.values():
+
+            connect = []
+            start = 0
+            for object_parameters in group["objects"]:
+                num_nodes = np.shape(object_parameters["position"])[-1]
+                nodes = np.arange(start, start + num_nodes)
+                connect.append(np.stack((nodes[:-1], nodes[1:]), axis=1))
+
+                if object_parameters["closed"]:
+                    connect.append([[nodes[-1], nodes[0]]])
+
+                start += num_nodes
+
+            group["buffer"] = np.zeros((start, 3), dtype=np.float32)
+            group["visual"] = visuals.Line(
+                pos=group["buffer"],
+                connect=np.concatenate(connect).astype(np.uint32),
+                color=group["color"],
+                width=2,
+                parent=self.view.scene,
+            )
+            group["visual"].visible = False
+
+    def _update_centerlines(self, index):
+        """Copies the rod positions of a frame into the line buffer of each group"""
+
+        for group in self.centerlines.values():
+
+            start = 0
+            for object_parameters in group["objects"]:
+                position = object_parameters["position"][index]
+                group["buffer"][start : start + position.shape[-1]] = position.T
+                start += position.shape[-1]
+
+            group["visual"].set_data(pos=group["buffer"])
+
+    def _shows_tube(self, object):
+        if self.render_mode == "tube":
+            return True
+
+        return self.objects[object].name in self.tube_objects
+
+    def shows_tubes(self):
+        """Whether any rod is drawn as a tube, and so needs to be meshed"""
+
+        return any(self._shows_tube(object) for object in self.colors)
+
+    def set_render_mode(self, render_mode, tube_objects=None):
+        """Switches between drawing rods as tubes or as centerlines
+
+        Args:
+            render_mode (str): "tube" or "centerline"
+            tube_objects (list, optional): Names of rods still drawn as tubes in
+            centerline mode. Defaults to None, which keeps the current selection.
+
+        Raises:
+            ValueError: Error if render_mode is not one of RENDER_MODES
+        """
+
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Render mode should be one of {RENDER_MODES}")
+
+        self.render_mode = render_mode
+        if tube_objects is not None:
+            self.tube_objects = set(tube_objects)
+
+        for group in self.centerlines.values():
+            group["visual"].visible = render_mode == "centerline"
+
+        if render_mode == "centerline":
+            self._update_centerlines(self._current_index)
+
+        # Hidden tubes are not updated while playing, so newly shown tubes are brought
+        # up to the current frame if it has been meshed
+        for object in self.colors:
+            self._update_object(object, self._current_index)
+
+    def available_frames(self):
+        """Number of frames that can be displayed
+
+        In centerline mode every frame can be displayed straight away, in tube mode the
+        frames meshed so far.
+        """
+
+        if self.render_mode == "centerline":
+            return self.data_length
+
+        return self.meshed_frames
+
+    def _in_view(self, object):
+        return self.culler is None or self.culler.visible[object]
+
+    def _update_object(self, object, index):
+        """Brings an object to a frame if it is shown and in view, otherwise hides it
+
+        Args:
+            object (str): Name of the object
+            index (int): Index of the frame
+        """
+
+        if object in self.instanced_objects:
+            shown = self._in_view(object)
+        else:
+            shown = self._shows_tube(object) and self._in_view(object)
+
+        self.objects[object].visible = shown
+
+        if not shown or self._uploaded_index.get(object) == index:
+            return
+
+        if object in self.instanced_objects:
+            update_instanced_visual(
+                self.objects[object], self.instanced_objects[object], index
+            )
+            self._uploaded_index[object] = index
+
+        else:
+            self._set_tube_frame(object, index)
+
+    def _set_tube_frame(self, object, index):
+        self._set_object_data(object, self._frame_meshdata(index)[object], index)
+
+    def _frame_meshdata(self, index):
+        """Meshdata of every rod at a frame, meshing it now if it is not cached
+
+        Frames are not cached when they have been evicted to stay within the memory
+        budget, or have not been meshed by the data source yet. The cache is only looked
+        up once per frame displayed, which moves its playhead to the frame.
+        """
+
+        if index != self._frame_index:
+            frame = self.meshdata_cache.get(index)
+
+            if frame is None:
+                frame = mesh_frame(
+                    self.visualization_dict,
+                    index,
+                    self.lod_tube_points,
+                    self.adaptive_tolerance,
+                )
+                self.meshdata_cache.put(index, frame)
+
+            self._frame_index = index
+            self._frame = frame
+
+        return self._frame
+
+    def _set_object_data(self, object, vertices, index):
+        """Sets the vertices of an object at a frame, with its shared faces and colors
+
+        Args:
+            object (str): Name of the object
+            vertices (tuple): meshing.TubeMesh of the frame for every level of detail,
+            of which the current level of the object is displayed
+            index (int): Index of the frame
+        """
+
+        lod = self.lods[object]
+        tube_mesh = vertices[lod.level]
+        closed = self.colors[object].object_parameters["closed"]
+
+        self._current_vertices[object] = vertices
+        self._uploaded_index[object] = index
+        self.objects[object].set_data(
+            vertices=tube_mesh.vertices,
+            faces=tube_mesh_faces(tube_mesh, lod.current_tube_points, closed),
+            **self.colors[object].mesh_colors(
+                index, lod.current_tube_points, tube_mesh.ring_nodes
+            ),
+        )
+
+    def _view_moved(self):
+        """Whether the transform from the scene to the view changed since the last call"""
+
+        probe = np.append(
+            np.ravel(self.view.scene.transform.map(VIEW_PROBE_POINTS)), self.view.size
+        )
+        if self._view_probe is not None and np.array_equal(probe, self._view_probe):
+            return False
+
+        self._view_probe = probe
+        return True
+
+    def _on_view_change(self, event):
+        """Updates the rods whose size on screen has changed and the objects in view"""
+
+        if not self._view_moved():
+            return
+
+        if self.lod:
+            changed = update_lod_levels(
+                self.lods, self.view.scene.transform, self._current_index
+            )
+            for object in changed:
+                if self.objects[object].visible:
+                    self._set_object_data(
+                        object, self._current_vertices[object], self._current_index
+                    )
+                else:
+                    # Uploaded again with the new level once shown
+                    self._uploaded_index.pop(object, None)
+
+        if self.culler is not None:
+            changed = self.culler.update(
+                self.view.scene.transform, self.view.size, self._current_index
+            )
+            for object in changed:
+                self._update_object(object, self._current_index)
+
+    def _recolor(self, update):
+        """Applies update to the TubeColor of every object and redraws the current frame
+
+        Only the colors of the displayed frame are set, the cached meshdata is untouched.
+        """
+
+        for object in self.colors:
+            update(self.colors[object])
+
+            # Rods never drawn as tubes have no vertices yet
+            if object in self._current_vertices:
+                self._set_object_data(
+                    object, self._current_vertices[object], self._current_index
+                )
+
     def set_tube_color(self, color):
+
+        if color == self._tube_color:
+            return
+
         print(f"Changing tube color")
-        for object in self.objects:
-            self.objects[object].set_data(color=color)
+        self._tube_color = color
+        self._recolor(lambda tube_color: tube_color.set_color(color))
+
+    def set_colormap(self, colormap=None, clim=None):
+        """Colors the rods by their scalar fields, optionally changing colormap and limits"""
+
+        self._tube_color = None
+        self._recolor(lambda tube_color: tube_color.set_colormap(colormap, clim))
+
+    def set_opacity(self, opacity):
+        """Sets the opacity of the rods from 0 to 1"""
+
+        self._recolor(lambda tube_color: tube_color.set_opacity(opacity))
 
     def _update_from_slider(self, index):
         """Updates scene to visualize the simulation at the time given by the slider value
@@ -185,21 +619,66 @@ class CanvasWrapper:
             index (int): Index of meshdata cache corresponding to the specified time
         """
 
-        for object in self.meshdata_cache[index]["objects"]:
-            self.objects[object].set_data(
-                meshdata=self.meshdata_cache[index]["objects"][object]
-            )
+        if index == self._current_index:
+            return
 
-        self.time_text.text = f"Time: {self.meshdata_cache[index]['time']:.4f}"
+        self._current_index = index
 
-    def _update_cache(self, new_meshdata_dict):
-        """Adds new meshdata calculated in the background thread to cache to be used for visualization
+        if self.lod:
+            for object in update_lod_levels(
+                self.lods, self.view.scene.transform, index
+            ):
+                self._uploaded_index.pop(object, None)
+
+        if self.culler is not None:
+            self.culler.update(self.view.scene.transform, self.view.size, index)
+
+        # Only tubes shown and in view are uploaded, meshing the frame if it is not
+        # cached
+        for object in self.objects:
+            self._update_object(object, index)
+
+        if self.render_mode == "centerline":
+            self._update_centerlines(index)
+
+        self.time_text.text = f"Time: {self.visualization_dict['time'][index]:.4f}"
+
+    def pick(self, canvas_position):
+        """Picks the rod element under a point of the canvas at the current frame
+
+        Args:
+            canvas_position ((float, float)): Position on the canvas in pixels
+
+        Returns:
+            dict or None: See picking.RodPicker.pick_ray
+        """
+
+        return self.picker.pick(self.view, canvas_position, self._current_index)
+
+    def _on_mouse_move(self, event):
+        """Displays the values of the rod element under the mouse, unless dragging"""
+
+        if event.is_dragging:
+            return
+
+        pick = self.pick(event.pos)
+        text = describe_pick(pick) if pick is not None else ""
+
+        if text != self.inspect_text.text:
+            self.inspect_text.text = text
+
+    def _update_cache(self, index, frame):
+        """Adds the meshdata of a frame to cache to be used for visualization
+
+        Meshdata calculated by the background thread is written to the cache directly by
+        MeshdataSource, this is only needed for frames computed elsewhere.
 
         Args:
-            new_meshdata_dict (dict): The new meshdata calcualted and emitted by the background thread
+            index (int): Index of the frame
+            frame (dict): The meshdata of every rod at the frame, see mesh_frame
         """
 
-        self.meshdata_cache.append(new_meshdata_dict)
+        self.meshdata_cache.put(index, frame)
 
     def add_axis(
         self, axis_direction, domain=None, color="white", font_size=10, axis_width=2
@@ -387,6 +866,10 @@ class CanvasWrapper:
         self.camera_type = "fly"
         self.view.camera = scene.FlyCamera()
         self.view.camera.auto_roll = autoroll
+
+        # The fly camera runs its own timer once interacted with, this stops it again once
+        # the camera has come to rest so no timer is running while the camera is idle
+        self.view.camera._timer.connect(self._stop_idle_fly_camera_timer)
         self.view.camera.set_range(
             x=(self.min_domain[0], self.max_domain[0]),
             z=(self.min_domain[2], self.max_domain[2]),
@@ -406,32 +889,40 @@ class CanvasWrapper:
         # camera_vector = np.array([0, object_y, 0])
         # self.view.camera.rotation1 = Quaternion(w=1, x=-1, y=0, z=0)
 
-    def _calculate_domain(self):
-        """Function to calculate the full domain traveresed by objects during the entire simulation"""
+    def _stop_idle_fly_camera_timer(self, event):
+        """Stops the fly camera timer once the camera is no longer moving
 
-        num_objects = len(self.visualization_dict["objects"])
-        all_objects_max_domain = np.zeros(shape=(num_objects, 3))
-        all_objects_min_domain = np.zeros(shape=(num_objects, 3))
-        all_objects_avg_coords = np.zeros(shape=(num_objects, 3))
+        Connected after the camera's own timer handler, the camera restarts the
+        timer itself on the next key or mouse event.
 
-        for num, object in enumerate(self.visualization_dict["objects"]):
+        Args:
+            event : Parameter required for Vispy app timers
+        """
 
-            object_parameters = self.visualization_dict["objects"][object]
-            object_position = object_parameters["position"]
+        camera = self.view.camera
+        if not (
+            camera._speed.any()
+            or camera._acc.any()
+            or camera._update_from_mouse
+            or camera._event_value is not None
+        ):
+            camera._timer.stop()
 
-            object_max_domain = object_position.max(axis=0).max(axis=1)
-            object_min_domain = object_position.min(axis=0).min(axis=1)
-            object_avg_coords = np.mean(object_position, axis=(0, 2))
+    def _calculate_domain(self):
+        """Calculates the region traversed by the objects, used to frame the camera and axes
 
-            all_objects_max_domain[num] = object_max_domain
-            all_objects_min_domain[num] = object_min_domain
-            all_objects_avg_coords[num] = object_avg_coords
+        Per-frame bounds recorded with the objects are used when available, otherwise
+        the positions are streamed in chunks, see scene_bounds.SceneBounds.
+        """
 
-        self.average_position = np.mean(all_objects_avg_coords, axis=0).round(
-            decimals=1
+        self.scene_bounds = SceneBounds.from_objects(self.visualization_dict["objects"])
+        min_domain, max_domain, average_position = self.scene_bounds.domain(
+            self.domain_percentile
         )
-        self.max_domain = all_objects_max_domain.max(axis=0).round(decimals=1)
-        self.min_domain = all_objects_min_domain.min(axis=0).round(decimals=1)
+
+        self.average_position = average_position.round(decimals=1)
+        self.max_domain = max_domain.round(decimals=1)
+        self.min_domain = min_domain.round(decimals=1)
 
 
 class GUIMainWindow(QtWidgets.QMainWindow):
@@ -443,6 +934,7 @@ class GUIMainWindow(QtWidgets.QMainWindow):
     """
 
     closing = QtCore.pyqtSignal()
+    render_mode_changed = QtCore.pyqtSignal()
 
     def __init__(self, canvas_wrapper: CanvasWrapper, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -465,6 +957,11 @@ class GUIMainWindow(QtWidgets.QMainWindow):
         self._connect_controls()
         self.setWindowTitle("PyElastica Interactive Visualization")
 
+        self._play_pause_controls.centerline_checkbox.setChecked(
+            canvas_wrapper.render_mode == "centerline"
+        )
+        self._update_slider_range()
+
     def _connect_controls(self):
         """Connects the control signals to their corresponding slots"""
 
@@ -474,20 +971,43 @@ class GUIMainWindow(QtWidgets.QMainWindow):
         )
         self._play_pause_controls.play_button.clicked.connect(self.playButtonPressEvent)
         self.play_timer.timeout.connect(self.increment_slider)
+        self._play_pause_controls.centerline_checkbox.toggled.connect(
+            self._set_centerline_mode
+        )
+
+    def _set_centerline_mode(self, checked):
+        """Switches the canvas between centerline and tube rendering"""
+
+        self._canvas_wrapper.set_render_mode("centerline" if checked else "tube")
+        self._update_slider_range()
+        self.render_mode_changed.emit()
+
+    def _update_slider_range(self):
+        """Sets the range of the slider to the frames the canvas can currently display"""
+
+        num_frames = self._canvas_wrapper.available_frames()
+
+        # In tube mode the slider is not shortened below the current frame, so switching
+        # back from centerline mode keeps the current position until it is meshed
+        current_val = self._play_pause_controls.position_slider.value()
+        self._play_pause_controls.slider_max = max(num_frames - 1, current_val)
+        self._play_pause_controls.position_slider.setMaximum(
+            self._play_pause_controls.slider_max
+        )
 
-    def _update_meshdata_progress(self, _):
+    def _update_meshdata_progress(self, num_frames):
         """Updates the progress bar to reflect the progress of meshdata caluclation and extends
         the range of the slider to allow newly calculated frames to be selected.
+
+        Args:
+            num_frames (int): Number of frames from the first that have been meshed, or
+            can be meshed when displayed once the memory budget is full
         """
 
         # Extends slider when new meshdata has been calculated
-        self._play_pause_controls.slider_max += 1
-        self._play_pause_controls.position_slider.setMaximum(
-            self._play_pause_controls.slider_max
-        )
-        self._play_pause_controls.progress_bar.setValue(
-            self._play_pause_controls.slider_max
-        )
+        self._canvas_wrapper.meshed_frames = num_frames
+        self._update_slider_range()
+        self._play_pause_controls.progress_bar.setValue(num_frames - 1)
 
     def increment_slider(self):
         """Increments the slider while visualizer is playing, triggering an update of the canvas scene"""
@@ -530,53 +1050,88 @@ class GUIMainWindow(QtWidgets.QMainWindow):
 
 
 class MeshdataSource(QtCore.QObject):
-    """QT Object which calculates the meshdata for the objects in the simulation"""
+    """QT Object which calculates the meshdata for the objects in the simulation
+
+    Calculated frames are written into the shared frame_cache.FrameCache as they are
+    meshed, and the GUI is notified in batches. A new_data signal carrying the number of
+    available frames is emitted once batch_max_frames frames have been meshed or
+    batch_max_interval seconds have passed since the last one, whichever comes first.
+
+    Meshing stops once the cache keeps no more frames within its memory budget, as
+    frames further ahead would only evict frames closer to the frame displayed. Every
+    frame is then made available, the others are meshed when they are displayed.
 
-    new_data = QtCore.pyqtSignal(dict)
+    Frames before start_frame are expected to already be in the cache, eg. the first
+    frame meshed by the canvas so it can be shown straight away.
+    """
+
+    new_data = QtCore.pyqtSignal(int)
     finished = QtCore.pyqtSignal()
 
-    def __init__(self, visualization_dict, parent=None):
+    def __init__(
+        self,
+        visualization_dict,
+        meshdata_cache,
+        batch_max_frames=BATCH_MAX_FRAMES,
+        batch_max_interval=BATCH_MAX_INTERVAL,
+        lod_tube_points=LOD_TUBE_POINTS,
+        adaptive_tolerance=None,
+        start_frame=0,
+        parent=None,
+    ):
         super().__init__(parent)
         self._should_end = False
         self.visualization_dict = visualization_dict
+        self.meshdata_cache = meshdata_cache
+        self.lod_tube_points = lod_tube_points
+        self.adaptive_tolerance = adaptive_tolerance
+        self.start_frame = start_frame
+        self.batch_max_frames = batch_max_frames
+        self.batch_max_interval = batch_max_interval
         self._num_iters = len(self.visualization_dict["time"])
 
     def run_data_creation(self):
 
+        last_flush = time.perf_counter()
+        num_frames = delivered_frames = self.start_frame
+
         # Iterates through each time step of the simulation
-        for i in range(self._num_iters):
+        for i in range(self.start_frame, self._num_iters):
             if self._should_end:
                 break
 
-            data_dict = {"objects": {}}
-
-            # Iterates through each object in simulation and calculates meshdata
-            for num, object in enumerate(self.visualization_dict["objects"]):
-
-                object_parameters = self.visualization_dict["objects"][object]
-                object_type = object_parameters["type"]
-
-                if object_type == "rod":
-
-                    is_closed = object_parameters["closed"]
-                    color = object_parameters["color"]
-
-                    object_position = object_parameters["position"][i].transpose()[:-1]
-                    object_radius = object_parameters["radius"][i]
+            frame = mesh_frame(
+                self.visualization_dict,
+                i,
+                self.lod_tube_points,
+                self.adaptive_tolerance,
+            )
 
-                    tube_meshdata = scene.visuals.Tube(
-                        points=object_position,
-                        radius=object_radius,
-                        closed=is_closed,
-                        color=color,
-                    )._meshdata
+            # Frames further ahead would only evict frames closer to the playhead
+            if not self.meshdata_cache.put(i, frame):
+                print(
+                    f"The meshdata of {len(self.meshdata_cache)} frames fills the "
+                    "memory budget, the other frames are meshed when they are displayed"
+                )
+                num_frames = self._num_iters
+                break
 
-                    data_dict["objects"][f"{object}_{num}"] = tube_meshdata
+            num_frames = i + 1
 
-            data_dict["time"] = self.visualization_dict["time"][i]
+            # The first frame is delivered immediately so the scene can be interacted
+            # with as soon as possible, after that frames are delivered in batches
+            now = time.perf_counter()
+            if (
+                i == self.start_frame
+                or num_frames - delivered_frames >= self.batch_max_frames
+                or now - last_flush >= self.batch_max_interval
+            ):
+                self.new_data.emit(num_frames)
+                delivered_frames = num_frames
+                last_flush = now
 
-            # Emits calculated meshdata to be stored in meshdata cache in CanvasWrapper class
-            self.new_data.emit(data_dict)
+        if num_frames > delivered_frames:
+            self.new_data.emit(num_frames)
 
         print("Data source finishing")
         self.finished.emit()
@@ -611,10 +1166,33 @@ class VisualizerGUI:
         self.visualization_dict = visualization_dict
         self._connect_data_source()
 
-    def run(self):
+        # Rods drawn as centerlines need no meshing, so the data source is only started
+        # once tubes are shown
+        self.win._play_pause_controls.progress_bar.setVisible(canvas.shows_tubes())
+        self.win.render_mode_changed.connect(self._start_meshing_if_needed)
+
+    def show(self):
+        """Shows the window and starts meshing the remaining frames in the background
+
+        Nothing is meshed while every rod is drawn as a centerline, meshing starts once
+        tubes are shown.
+        """
 
         self.win.show()
+        self._start_meshing_if_needed()
+
+    def _start_meshing_if_needed(self):
+
+        if self._meshing_started or not self.canvas.shows_tubes():
+            return
+
+        self._meshing_started = True
+        self.win._play_pause_controls.progress_bar.setVisible(True)
         self.data_thread.start()
+
+    def run(self):
+
+        self.show()
         self.app.run()
 
         print("Waiting for data source to close gracefully...")
@@ -622,13 +1200,23 @@ class VisualizerGUI:
 
     def _connect_data_source(self):
 
+        self._meshing_started = False
+
         # Create meshdata source and move it to new thread
         self.data_thread = QtCore.QThread(parent=self.win)
-        self.data_source = MeshdataSource(self.visualization_dict)
+        self.data_source = MeshdataSource(
+            self.visualization_dict,
+            self.canvas.meshdata_cache,
+            lod_tube_points=self.canvas.lod_tube_points,
+            adaptive_tolerance=self.canvas.adaptive_tolerance,
+            start_frame=self.canvas.meshed_frames,
+        )
         self.data_source.moveToThread(self.data_thread)
 
-        # update the visualization when there is new data
-        self.data_source.new_data.connect(self.canvas._update_cache)
+        # Meshdata is written straight into the canvas cache by the data source, the GUI
+        # is only notified once per batch to extend the slider and progress bar. The
+        # first frame was already meshed by the canvas in tube mode, so the data source
+        # continues from the second frame
         self.data_source.new_data.connect(self.win._update_meshdata_progress)
         # start data generation when the thread is started
         self.data_thread.started.connect(self.data_source.run_data_creation)
@@ -640,19 +1228,168 @@ class VisualizerGUI:
         self.win.closing.connect(self.data_source.stop_data, QtCore.Qt.DirectConnection)
         # when the thread has ended, delete the data source from memory
         self.data_thread.finished.connect(self.data_source.deleteLater)
+        # the memory available is no longer checked once the window is closed
+        self.win.closing.connect(self.canvas.meshdata_cache.stop_monitoring)
 
 
-if __name__ == "__main__":
+def load_postprocessing_file(fname, grouping_parameters=None):
+    """Loads a pickled postprocessing dict and generates its visualization dict"""
 
-    with open("examples/ContinuumSnakeCase/continuum_snake.dat", "rb") as f:
+    with open(fname, "rb") as f:
         postprocessing_dict = pickle.load(f)
 
-    visualization_dict = generate_visualization_dict(postprocessing_dict)
+    return generate_visualization_dict(postprocessing_dict, grouping_parameters)
+
+
+class DataLoader(QtCore.QObject):
+    """QT Object which loads the visualization dict in a background thread
+
+    Args:
+        load (Callable): Called with no arguments, returns the visualization dict
+    """
+
+    loaded = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, load, parent=None):
+        super().__init__(parent)
+        self.load = load
+
+    def run_loading(self):
 
-    canvas = CanvasWrapper(visualization_dict)
-    canvas.add_axis("z")
-    canvas.add_axis("x")
-    canvas.turntable_camera()
+        try:
+            visualization_dict = self.load()
+        except Exception as error:
+            self.failed.emit(f"Loading failed: {error!r}")
+        else:
+            self.loaded.emit(visualization_dict)
+
+        self.finished.emit()
+
+
+class LoadingWindow(QtWidgets.QWidget):
+    """Window shown straight away while the visualization dict is loaded
+
+    Once loaded, the canvas and the main window are created, the first frame is meshed
+    and displayed, and this window is closed.
+
+    Args:
+        app (vispy.app.Application): The app the GUI runs in
+        start_time (float): time.perf_counter() when startup began
+        configure (Callable, optional): Called with the CanvasWrapper before it is shown,
+        eg. to add axes and set the camera. Defaults to None, which adds x and z axes and
+        a turntable camera.
+        canvas_kwargs (dict, optional): Keyword arguments of the CanvasWrapper
+    """
+
+    def __init__(
+        self, app, start_time, configure=None, canvas_kwargs=None, parent=None
+    ):
+        super().__init__(parent)
+
+        self.app = app
+        self.start_time = start_time
+        self.configure = configure
+        self.canvas_kwargs = canvas_kwargs or {}
+        self.gui = None
+
+        # Loading has no known length, so the progress bar is shown as busy
+        self.label = QtWidgets.QLabel("Loading simulation data...")
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setRange(0, 0)
 
-    Visualizer = VisualizerGUI(visualization_dict, canvas)
-    Visualizer.run()
\ No newline at end of file
+        layout = QtWidgets.QVBoxLayout()
+        layout.addWidget(self.label)
+        layout.addWidget(self.progress_bar)
+        self.setLayout(layout)
+        self.setWindowTitle("PyElastica Interactive Visualization")
+
+    @QtCore.pyqtSlot(object)
+    def open_visualization(self, visualization_dict):
+
+        print(f"Data loaded in {time.perf_counter() - self.start_time:.3f}s")
+
+        canvas = CanvasWrapper(
+            visualization_dict, start_time=self.start_time, **self.canvas_kwargs
+        )
+
+        if self.configure is None:
+            canvas.add_axis("z")
+            canvas.add_axis("x")
+            canvas.turntable_camera()
+        else:
+            self.configure(canvas)
+
+        self.gui = VisualizerGUI(visualization_dict, canvas, app=self.app)
+        self.gui.show()
+        self.close()
+
+    @QtCore.pyqtSlot(str)
+    def show_error(self, message):
+        print(message)
+        self.progress_bar.setRange(0, 1)
+        self.label.setText(message)
+
+
+def run_gui(load, configure=None, **canvas_kwargs):
+    """Shows a window straight away and opens the visualization once its data is loaded
+
+    Loading (eg. unpickling the postprocessing dict and generating the visualization
+    dict) runs in a background thread. Once loaded, the first frame is meshed and shown
+    while the other frames are meshed in the background. The time to the first frame is
+    printed and kept as canvas.time_to_first_frame.
+
+    Args:
+        load (Callable): Called with no arguments in the background thread, returns the
+        visualization dict, eg. functools.partial(load_postprocessing_file, fname)
+        configure (Callable, optional): Called with the CanvasWrapper before it is shown,
+        eg. to add axes and set the camera. Defaults to None, which adds x and z axes and
+        a turntable camera.
+        **canvas_kwargs: Keyword arguments of the CanvasWrapper
+
+    Returns:
+        VisualizerGUI: The GUI once the window is closed, or None if loading failed
+    """
+
+    start_time = time.perf_counter()
+
+    gui_app = use_app("pyqt5")
+    gui_app.create()
+
+    loading_window = LoadingWindow(gui_app, start_time, configure, canvas_kwargs)
+    loading_window.show()
+
+    # Create data loader and move it to new thread, the loaded signal is delivered to
+    # the loading window in the GUI thread
+    load_thread = QtCore.QThread()
+    loader = DataLoader(load)
+    loader.moveToThread(load_thread)
+
+    load_thread.started.connect(loader.run_loading)
+    loader.loaded.connect(loading_window.open_visualization)
+    loader.failed.connect(loading_window.show_error)
+    loader.finished.connect(load_thread.quit, QtCore.Qt.DirectConnection)
+
+    load_thread.start()
+    gui_app.run()
+
+    load_thread.wait(5000)
+
+    gui = loading_window.gui
+    if gui is not None:
+        print("Waiting for data source to close gracefully...")
+        gui.data_thread.wait(5000)
+
+    return gui
+
+
+if __name__ == "__main__":
+
+    from functools import partial
+
+    run_gui(
+        partial(
+            load_postprocessing_file, "examples/ContinuumSnakeCase/continuum_snake.dat"
+        )
+    )
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""
+Bounds of the region traversed by the objects of a simulation, used to frame the camera and
+set the axes.
+
+Bounds are kept per frame, as the minimum and maximum corners and the mean node position of
+each object at every frame. They are tiny compared to the position histories and can be
+maintained incrementally, so the scene can be framed without reading every position:
+
+- VisualizerDictCallBack records them as the simulation runs, and
+  generate_visualization_dict passes them on as "bounds" and "centers" of each object.
+- write_trajectory_file stores them next to the index of a trajectory file, so they are
+  read without touching the positions.
+- Otherwise they are calculated from the position history BOUNDS_CHUNK_FRAMES frames at a
+  time, so memory-mapped histories are streamed instead of loaded whole.
+
+Keeping the bounds of every frame also allows percentile bounds, which ignore the few
+frames where an object flies off or the simulation blows up.
+"""
+import numpy as np
+
+BOUNDS_CHUNK_FRAMES = 256
+
+
+def position_frame_bounds(position):
+    """Minimum and maximum corners and mean node position of each frame of a history
+
+    Args:
+        position (numpy.ndarray): Positions of shape (frames, 3, nodes), or (3, nodes)
+        for a single frame
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray): Corners of shape (frames, 2, 3) and mean node
+        positions of shape (frames, 3)
+    """
+
+    position = np.asarray(position)
+    if position.ndim == 2:
+        position = position[None]
+
+    bounds = np.stack((position.min(axis=2), position.max(axis=2)), axis=1)
+    return bounds, position.mean(axis=2)
+
+
+class SceneBounds:
+    """Per-frame bounds of several objects, extended as frames become available
+
+    Attributes
+    ----------
+
+    bounds: dict
+        Minimum and maximum corners of each object at each frame, of shape (frames, 2, 3).
+    centers: dict
+        Mean node position of each object at each frame, of shape (frames, 3).
+    """
+
+    def __init__(self) -> None:
+
+        self.bounds = {}
+        self.centers = {}
+
+    def extend_bounds(self, object, bounds, centers):
+        """Appends already calculated per-frame bounds of an object
+
+        Args:
+            object (str): Name of the object
+            bounds (numpy.ndarray): Corners of shape (frames, 2, 3)
+            centers (numpy.ndarray): Mean node positions of shape (frames, 3)
+        """
+
+        bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 2, 3)
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+
+        if object in self.bounds:
+            bounds = np.concatenate((self.bounds[object], bounds))
+            centers = np.concatenate((self.centers[object], centers))
+
+        self.bounds[object] = bounds
+        self.centers[object] = centers
+
+    def extend(self, object, position):
+        """Appends the bounds of new frames of an object from their positions
+
+        Args:
+            object (str): Name of the object
+            position (numpy.ndarray): Positions of shape (frames, 3, nodes), or (3, nodes)
+            for a single frame
+        """
+
+        self.extend_bounds(object, *position_frame_bounds(position))
+
+    @classmethod
+    def from_objects(cls, objects, chunk_frames=BOUNDS_CHUNK_FRAMES):
+        """Bounds of the objects of a visualization dict
+
+        Bounds recorded with the objects ("bounds" and "centers") are used as they are.
+        Otherwise the position history is read chunk_frames frames at a time.
+
+        Args:
+            objects (dict): Parameters of each object in the visualization dict
+            chunk_frames (int, optional): Number of frames read at a time. Defaults to
+            BOUNDS_CHUNK_FRAMES.
+        """
+
+        scene_bounds = cls()
+
+        for object, object_parameters in objects.items():
+
+            if "bounds" in object_parameters and "centers" in object_parameters:
+                scene_bounds.extend_bounds(
+                    object, object_parameters["bounds"], object_parameters["centers"]
+                )
+                continue
+
+            position = object_parameters["position"]
+            chunks = [
+                position_frame_bounds(position[start : start + chunk_frames])
+                for start in range(0, len(position), chunk_frames)
+            ]
+            scene_bounds.extend_bounds(
+                object,
+                np.concatenate([bounds for bounds, _ in chunks]),
+                np.concatenate([centers for _, centers in chunks]),
+            )
+
+        return scene_bounds
+
+    def domain(self, percentile=None):
+        """Returns the region traversed by the objects
+
+        Args:
+            percentile (float, optional): If given, the lower bound of each axis is this
+            percentile of the minimum of each object over the frames, and the upper bound
+            the 100 - percentile percentile of the maximum, so outlying frames are
+            ignored. Defaults to None, which gives the full extent.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray, numpy.ndarray): Minimum and maximum corners of
+            the region, and the average position of the objects
+        """
+
+        if not self.bounds:
+            zeros = np.zeros(3)
+            return zeros, zeros, zeros
+
+        if percentile is None:
+            lower = [bounds[:, 0].min(axis=0) for bounds in self.bounds.values()]
+            upper = [bounds[:, 1].max(axis=0) for bounds in self.bounds.values()]
+        else:
+            lower = [
+                np.percentile(bounds[:, 0], percentile, axis=0)
+                for bounds in self.bounds.values()
+            ]
+            upper = [
+                np.percentile(bounds[:, 1], 100 - percentile, axis=0)
+                for bounds in self.bounds.values()
+            ]
+
+        average = np.mean(
+            [centers.mean(axis=0) for centers in self.centers.values()], axis=0
+        )
+
+        return np.min(lower, axis=0), np.max(upper, axis=0), average
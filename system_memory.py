@@ -0,0 +1,122 @@
+"""
+Memory available on the host, used to decide how much meshdata can be kept in memory.
+
+When running in a container, the memory limit of its cgroup is taken into account, as
+going over it gets the process killed even though the host has memory to spare.
+"""
+
+MEMINFO_FNAME = "/proc/meminfo"
+
+# Fraction of the available memory the meshdata may take up by default
+MEMORY_FRACTION = 0.5
+# Memory assumed available when it cannot be read from the system
+DEFAULT_AVAILABLE_MEMORY = 4 * 1024**3
+
+# Memory limit and usage of the cgroup of the process, for cgroup v2 and v1
+CGROUP_MEMORY_FNAMES = (
+    ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+    (
+        "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+        "/sys/fs/cgroup/memory/memory.usage_in_bytes",
+    ),
+)
+
+
+def _read_meminfo():
+    """Values of /proc/meminfo in bytes, or an empty dict if it cannot be read"""
+
+    meminfo = {}
+
+    try:
+        with open(MEMINFO_FNAME) as f:
+            for line in f:
+                name, value = line.split(":", 1)
+                # Values are given in kiB
+                meminfo[name] = int(value.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return {}
+
+    return meminfo
+
+
+def cgroup_memory():
+    """Memory limit and usage of the cgroup of the process
+
+    Returns:
+        (int, int) or None: Limit and usage in bytes, or None if there is no limit or it
+        cannot be read
+    """
+
+    for limit_fname, usage_fname in CGROUP_MEMORY_FNAMES:
+        try:
+            with open(limit_fname) as f:
+                limit = f.read().strip()
+            with open(usage_fname) as f:
+                usage = int(f.read().strip())
+        except (OSError, ValueError):
+            continue
+
+        # cgroup v2 writes "max" when unlimited, v1 a huge number caught by the caller
+        if limit == "max":
+            return None
+
+        return int(limit), usage
+
+    return None
+
+
+def total_memory():
+    """Memory of the host, or the memory limit of the cgroup if lower, in bytes
+
+    Returns:
+        int or None: Total memory in bytes, or None if it is not known
+    """
+
+    total = _read_meminfo().get("MemTotal")
+
+    cgroup = cgroup_memory()
+    if cgroup is not None and (total is None or cgroup[0] < total):
+        total = cgroup[0]
+
+    return total
+
+
+def available_memory():
+    """Memory available for new allocations without swapping, in bytes
+
+    Read from MemAvailable in /proc/meminfo, which counts free memory and the caches the
+    kernel can reclaim, and capped by what is left under the memory limit of the cgroup.
+
+    Returns:
+        int or None: Available memory in bytes, or None if it is not known, eg. on
+        platforms without /proc/meminfo
+    """
+
+    available = _read_meminfo().get("MemAvailable")
+
+    cgroup = cgroup_memory()
+    if cgroup is not None:
+        cgroup_available = max(cgroup[0] - cgroup[1], 0)
+        if available is None or cgroup_available < available:
+            available = cgroup_available
+
+    return available
+
+
+def memory_budget(fraction=MEMORY_FRACTION):
+    """Bytes the meshdata may take up, a fraction of the memory available now
+
+    Args:
+        fraction (float, optional): Fraction of the available memory. Defaults to
+        MEMORY_FRACTION.
+
+    Returns:
+        float: The budget in bytes, from DEFAULT_AVAILABLE_MEMORY if the available
+        memory is not known
+    """
+
+    available = available_memory()
+    if available is None:
+        available = DEFAULT_AVAILABLE_MEMORY
+
+    return fraction * available
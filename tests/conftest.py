@@ -0,0 +1,62 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The modules of the package are at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import generate_visualization_dict
+
+# Qt aborts without a display unless it renders offscreen
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# Backends tried for rendering, headless ones first, None is the default backend
+RENDER_BACKENDS = ("egl", "osmesa", None)
+NUM_FRAMES = 6
+NUM_NODES = 11
+
+
+@pytest.fixture(scope="session")
+def render_backend():
+    """First Vispy backend that can render offscreen, the test is skipped if none can"""
+
+    from vispy import app, scene
+
+    errors = []
+
+    for backend in RENDER_BACKENDS:
+        try:
+            canvas = scene.SceneCanvas(
+                size=(16, 16), show=False, app=app.Application(backend)
+            )
+            canvas.render()
+            canvas.close()
+            return backend
+
+        except Exception as error:
+            errors.append(f"{backend}: {type(error).__name__}: {error}")
+
+    pytest.skip("No Vispy backend can render: " + "; ".join(errors))
+
+
+@pytest.fixture
+def visualization_dict():
+    """A rod bending over time"""
+
+    time = np.linspace(0.0, 1.0, NUM_FRAMES)
+    s = np.linspace(0.0, 1.0, NUM_NODES)
+    position = np.stack(
+        [np.stack((s, 0.2 * t * np.sin(np.pi * s), np.zeros_like(s))) for t in time]
+    )
+
+    postprocessing_dict = {
+        "rod": {
+            "time": time,
+            "position": position,
+            "radius": np.full((NUM_FRAMES, NUM_NODES - 1), 0.02),
+        }
+    }
+
+    return generate_visualization_dict(postprocessing_dict)
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from conftest import NUM_FRAMES
+from meshing import calculate_merged_instances
+from utils import generate_visualization_dict
+from visualizer import Visualizer
+
+NUM_SPHERES = 5
+
+
+@pytest.fixture
+def sphere_visualization_dict():
+    """A row of red spheres rising and growing over time"""
+
+    time = np.linspace(0.0, 1.0, NUM_FRAMES)
+    position = np.stack(
+        [
+            np.stack(
+                (
+                    np.linspace(0.0, 1.0, NUM_SPHERES),
+                    np.full(NUM_SPHERES, 0.5),
+                    np.full(NUM_SPHERES, 0.1 * t),
+                )
+            )
+            for t in time
+        ]
+    )
+
+    postprocessing_dict = {
+        "spheres": {
+            "time": time,
+            "position": position,
+            "radius": np.outer(0.05 + 0.05 * time, np.ones(NUM_SPHERES)),
+        }
+    }
+    grouping_parameters = {
+        "spheres": {
+            "object_type": "sphere",
+            "objects": ["spheres"],
+            "color": "red",
+            "closed": False,
+        }
+    }
+
+    return generate_visualization_dict(postprocessing_dict, grouping_parameters)
+
+
+def test_merged_instances(sphere_visualization_dict):
+    object_parameters = sphere_visualization_dict["objects"]["spheres"]
+    index = NUM_FRAMES - 1
+
+    merged = calculate_merged_instances(object_parameters, index)
+    vertices = merged["vertices"].reshape(NUM_SPHERES, -1, 3)
+    centers = object_parameters["position"][index].T
+
+    # Every vertex of each sphere is on its surface at the frame
+    distances = np.linalg.norm(vertices - centers[:, None], axis=-1)
+    radius = object_parameters["radius"][index][:, None]
+    np.testing.assert_allclose(
+        distances, np.broadcast_to(radius, distances.shape), rtol=1e-5
+    )
+    assert merged["faces"].max() == len(merged["vertices"]) - 1
+
+
+def test_render_sphere_scene(render_backend, sphere_visualization_dict):
+    visualizer = Visualizer(
+        sphere_visualization_dict, canvas_size=(64, 48), backend=render_backend
+    )
+    visualizer.turntable_camera()
+
+    for index in range(NUM_FRAMES):
+        visualizer._set_frame(index)
+        image = visualizer.canvas.render()
+
+        # The red spheres are drawn over the background
+        red = image[..., 0].astype(int) - image[..., 1:3].max(axis=-1)
+        assert (red > 64).any()
@@ -0,0 +1,57 @@
+import queue
+
+import numpy as np
+
+from conftest import NUM_FRAMES
+from visualizer import Visualizer
+
+SIZE = (64, 48)  # (width, height)
+
+
+def read_video(video_fname):
+    """Frames of a video as (height, width, 3) arrays"""
+
+    from imageio_ffmpeg import read_frames
+
+    reader = read_frames(video_fname)
+    metadata = next(reader)
+    width, height = metadata["size"]
+
+    return [
+        np.frombuffer(frame, np.uint8).reshape(height, width, 3) for frame in reader
+    ]
+
+
+def test_encode_flipped_frames(tmp_path):
+    # Rendered frames are vertically flipped views of the framebuffer, like these
+    frames = [
+        np.full((SIZE[1], SIZE[0], 4), 255 * i // 4, dtype=np.uint8)[::-1]
+        for i in range(4)
+    ]
+    assert not frames[0].flags.c_contiguous
+
+    video_fname = str(tmp_path / "flipped.mp4")
+    frame_queue = queue.Queue()
+    for frame in frames + [None]:
+        frame_queue.put(frame)
+
+    timings = {"encode": 0.0, "frames": 0}
+    errors = []
+    Visualizer._encode_frames(frame_queue, video_fname, 30, 10, timings, errors)
+
+    assert errors == []
+    assert timings["frames"] == len(frames)
+    assert len(read_video(video_fname)) == len(frames)
+
+
+def test_export_video(tmp_path, render_backend, visualization_dict):
+    visualizer = Visualizer(
+        visualization_dict, canvas_size=SIZE, backend=render_backend
+    )
+    visualizer.turntable_camera()
+
+    video_fname = str(tmp_path / "export.mp4")
+    timings = visualizer.export_video(video_fname, fps=30)
+
+    assert timings["frames"] == NUM_FRAMES
+    assert len(read_video(video_fname)) == NUM_FRAMES
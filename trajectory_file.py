@@ -0,0 +1,171 @@
+"""
+Indexed trajectory files, storing the callback histories of many objects in a single file
+that is memory-mapped when loaded, so opening it is instant and only the frames used are
+read from disk.
+
+The file starts with MAGIC and the length of a JSON header as a little endian uint64. The
+header is the index, giving the dtype, shape and offset of every array, and is followed by
+the raw arrays, each aligned to ALIGNMENT bytes.
+
+The per-frame bounds of the position of each object (see scene_bounds) are stored as well,
+under BOUNDS_KEY in the index, so a scene can be framed from a file without reading the
+positions.
+"""
+import json
+import struct
+
+import numpy as np
+
+from scene_bounds import BOUNDS_CHUNK_FRAMES, position_frame_bounds
+
+MAGIC = b"PEVTRAJ1"
+ALIGNMENT = 64
+BOUNDS_KEY = "__bounds__"
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _history_bounds(history):
+    """Per-frame bounds of a history, as recorded or calculated chunk by chunk"""
+
+    if "bounds" in history and "centers" in history:
+        return np.asarray(history["bounds"]), np.asarray(history["centers"])
+
+    position = history["position"]
+    chunks = [
+        position_frame_bounds(position[start : start + BOUNDS_CHUNK_FRAMES])
+        for start in range(0, len(position), BOUNDS_CHUNK_FRAMES)
+    ]
+    return (
+        np.concatenate([bounds for bounds, _ in chunks]),
+        np.concatenate([centers for _, centers in chunks]),
+    )
+
+
+def write_trajectory_file(fname, trajectories):
+    """Writes the histories of several objects to a single indexed trajectory file
+
+    The per-frame bounds of the position of each object are written too, and are read
+    with read_trajectory_file as the "bounds" and "centers" of the object.
+
+    Args:
+        fname (str): Name of the file
+        trajectories (dict): Dictionary of objects, where each value is a dictionary of
+        numpy arrays, eg. {"rod0": {"time": (T,), "position": (T, 3, N)}}
+    """
+
+    arrays = {
+        (name, key): np.ascontiguousarray(value)
+        for name, history in trajectories.items()
+        for key, value in history.items()
+        if key not in ("bounds", "centers")
+    }
+
+    for name, history in trajectories.items():
+        if "position" in history and len(history["position"]) > 0:
+            bounds, centers = _history_bounds(history)
+            arrays[(BOUNDS_KEY, name, "bounds")] = np.ascontiguousarray(bounds)
+            arrays[(BOUNDS_KEY, name, "centers")] = np.ascontiguousarray(centers)
+
+    # The header length depends on the offsets, which depend on the header length, so
+    # the data is placed after a generous estimate of the header size
+    index_size = 256 * (len(arrays) + 1)
+    data_start = _align(len(MAGIC) + 8 + index_size)
+
+    index = {}
+    offset = data_start
+    for path, array in arrays.items():
+        entries = index
+        for key in path[:-1]:
+            entries = entries.setdefault(key, {})
+
+        entries[path[-1]] = {
+            "dtype": array.dtype.str,
+            "shape": array.shape,
+            "offset": offset,
+        }
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps(index).encode()
+    if len(header) > data_start - len(MAGIC) - 8:
+        raise ValueError("Trajectory file index is too large")
+
+    with open(fname, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+
+        for path, array in arrays.items():
+            entry = index
+            for key in path:
+                entry = entry[key]
+
+            f.seek(entry["offset"])
+            f.write(array.tobytes())
+
+        # Pads the end of the file so the last array can always be mapped
+        f.truncate(offset)
+
+
+def _read_index(fname):
+
+    with open(fname, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{fname} is not a trajectory file")
+
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        return json.loads(f.read(header_size))
+
+
+def _map_array(fname, entry, mode):
+
+    dtype = np.dtype(entry["dtype"])
+    shape = tuple(entry["shape"])
+
+    # Empty arrays cannot be memory-mapped
+    if np.prod(shape) == 0:
+        return np.empty(shape, dtype=dtype)
+
+    return np.memmap(fname, dtype=dtype, mode=mode, offset=entry["offset"], shape=shape)
+
+
+def read_trajectory_file(fname, mode="r"):
+    """Memory-maps the arrays of an indexed trajectory file
+
+    Args:
+        fname (str): Name of the file
+        mode (str, optional): Mode of the memory maps. Defaults to "r", read only.
+
+    Raises:
+        ValueError: Error if the file is not a trajectory file
+
+    Returns:
+        dict: Dictionary of objects, where each value is a dictionary of numpy.memmap,
+        including the per-frame "bounds" and "centers" of the position if stored
+    """
+
+    index = _read_index(fname)
+    bounds_index = index.pop(BOUNDS_KEY, {})
+
+    trajectories = {}
+    for name, history in index.items():
+        trajectories[name] = {
+            key: _map_array(fname, entry, mode) for key, entry in history.items()
+        }
+
+        for key, entry in bounds_index.get(name, {}).items():
+            trajectories[name][key] = _map_array(fname, entry, mode)
+
+    return trajectories
+
+
+def is_trajectory_file(fname):
+    """Returns whether a file is an indexed trajectory file"""
+
+    try:
+        with open(fname, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
@@ -18,11 +18,30 @@ grouping_parameters = {
         "objects": ["rod1", "rod2"]
         "color": "green"
         "closed": False
+        "scalar": "internal_stress"  # Optional, colors the rods by this callback quantity
+        "colormap": "viridis"        # Optional, colormap used for the scalar
+    },
+    "sphere_group": {
+        "object_type": "sphere"      # Or "cylinder", rendered with instancing
+        "objects": ["sphere1"]
+        "color": "red"
+        "closed": False
     }
 }
 """
 import numpy as np
-from elastica import CallBackBaseClass
+
+
+def __getattr__(name):
+    # The callback needs PyElastica, which is only imported once the callback is used so
+    # viewing saved data does not pay the import cost of PyElastica and Numba
+    if name == "VisualizerDictCallBack":
+        from visualizer_callback import VisualizerDictCallBack
+
+        return VisualizerDictCallBack
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def generate_visualization_dict(postprocessing_dict, grouping_parameters=None):
     """ Generates a dictionary in the required format to be passed to the Visualizer
@@ -73,43 +92,38 @@ def generate_visualization_dict(postprocessing_dict, grouping_parameters=None):
         color = grouping_parameters[group]["color"]
         closed = grouping_parameters[group]["closed"]
 
+        scalar = grouping_parameters[group].get("scalar")
+        colormap = grouping_parameters[group].get("colormap", "viridis")
+
         for object in objects:
 
             visualization_dict["objects"][object] = {
                 "type": object_type,
-                "position": np.array(postprocessing_dict[object]["position"]),
-                "radius": np.array(postprocessing_dict[object]["radius"]),
+                "position": np.asarray(postprocessing_dict[object]["position"]),
+                "radius": np.asarray(postprocessing_dict[object]["radius"]),
                 "color": color,
-                "closed": closed
+                "closed": closed,
+                "group": group
             }
 
+            # Cylinders also need the axis and length of each body
+            if object_type == "cylinder":
+                visualization_dict["objects"][object]["direction"] = np.asarray(
+                    postprocessing_dict[object]["direction"]
+                )
+                visualization_dict["objects"][object]["length"] = np.asarray(
+                    postprocessing_dict[object]["length"]
+                )
+
+            # Per-frame bounds recorded by the callback frame the scene without reading
+            # the whole position history
+            if "bounds" in postprocessing_dict[object] and "centers" in postprocessing_dict[object]:
+                visualization_dict["objects"][object]["bounds"] = np.asarray(postprocessing_dict[object]["bounds"])
+                visualization_dict["objects"][object]["centers"] = np.asarray(postprocessing_dict[object]["centers"])
+
+            if scalar is not None:
+                visualization_dict["objects"][object]["scalar"] = np.asarray(postprocessing_dict[object][scalar])
+                visualization_dict["objects"][object]["colormap"] = colormap
+
         visualization_dict["time"] = postprocessing_dict[object]["time"] 
     return visualization_dict
-
-class VisualizerDictCallBack(CallBackBaseClass):
-    """
-    Call back function to output simulation data into postprocessing dict
-    Post-processing dict attached to the callback should be of the form:
-
-    postprocessing_dict = {"object_1": defaultdict(list),
-                           "object_2": defaultdict(list),
-                           ...
-                           }
-    
-    to work as seamlessly as possible with rest of the util functions and the
-    Visualizer class
-    """
-
-    def __init__(self, step_skip: int, callback_params: dict):
-        CallBackBaseClass.__init__(self)
-        self.every = step_skip
-        self.callback_params = callback_params
-
-    def make_callback(self, system, time, current_step: int):
-
-        if current_step % self.every == 0:
-
-            self.callback_params["time"].append(time)
-            self.callback_params["position"].append(system.position_collection.copy())
-            self.callback_params["radius"].append(system.radius.copy())
-            return
\ No newline at end of file
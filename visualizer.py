@@ -1,10 +1,38 @@
-from ast import Raise
-from unicodedata import decimal
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+
 import numpy as np
 
-from tqdm import tqdm
-from vispy import app, scene
-from vispy.gloo.util import _screenshot
+from frame_cache import FrameCache
+
+# Vispy and tqdm are imported where they are used, so importing this module stays cheap,
+# eg. for the command line interface or for code that only reads the visualization dict
+
+from meshing import (
+    INSTANCED_TYPES,
+    LOD_TUBE_POINTS,
+    RENDER_MODES,
+    TUBE_POINTS,
+    VIEW_PROBE_POINTS,
+    FrustumCuller,
+    TubeColor,
+    TubeLOD,
+    tube_mesh_faces,
+    calculate_tube_lod_vertices,
+    create_instanced_visual,
+    dequantize_tube_mesh,
+    quantize_tube_mesh,
+    update_instanced_visual,
+    update_lod_levels,
+)
+from picking import RodPicker, describe_pick
+from scene_bounds import SceneBounds
 
 
 class Visualizer:
@@ -23,10 +51,20 @@ class Visualizer:
         Dictionary of Vispy.scene.visual instances of the simulation objects to
         be visualized. Key is a string of the name of the object as given in the
         visualization dict, and the value is a Vispy.scene.visual instance
-    meshdata: dict
-        Dictionary of the meshdata for each object to be visualized. Key is the
-        string of the name of the object as given in the visualization dict and
-        the value is a list of meshdata
+    meshdata: frame_cache.FrameCache
+        Cache of the meshdata of each frame, by frame index. Each frame is a dictionary
+        keyed by the name of each rod as given in the visualization dict, and the value
+        is the meshing.TubeMesh of each level of detail. Faces only depend on the number
+        of rings, and are shared from meshing.tube_faces. The cache is kept within the
+        memory budget and within the memory available on the host, evicting the frames
+        farthest from the frame displayed, which are meshed again when displayed. See
+        meshdata.stats() for its size, hit rate and evictions.
+    lods: dict
+        Dictionary of the meshing.TubeLOD of each object, picking the cross-section
+        resolution used from the size of the rod on screen.
+    colors: dict
+        Dictionary of the meshing.TubeColor of each object. Colors are applied when
+        a frame is displayed, so they can be changed without recalculating meshdata.
     app_timers: dict
         A dictionary of the Vispy app timers. Key is a string of the name of
         the timer and the value is a Vispy.app.Timer instance
@@ -60,18 +98,131 @@ class Visualizer:
         The maximum number of updates/number of times the app timers can
         run, to prevent IndexErrors.
         TODO: See comments further down about ways to improve the usage of this
+    measure_fps: bool
+        Whether the FPS is printed to the console. Off by default as it is only
+        needed when measuring performance.
+    is_playing: bool
+        Whether the visualization is currently playing. While paused all app
+        timers are stopped and the canvas is only redrawn when the frame, camera
+        or scene changes.
+    axes_parameters: list
+        Parameters of the axes added to the scene, used to recreate the scene
+        when exporting video in parallel.
+    backend: str
+        Name of the Vispy app backend to use eg. "pyqt5". Use "osmesa" or "egl"
+        to export videos headless with a software OpenGL implementation. If None,
+        Vispy picks the backend.
+    lod: bool
+        Whether rods are meshed with several cross-section resolutions, picked from
+        their size on screen. Otherwise only the finest resolution is meshed.
+    adaptive_tolerance: float or None
+        If given, rings are placed along the rods from their curvature, keeping the
+        meshed centerline within this distance of the smooth one. Straight rods then
+        need far fewer vertices. If None, there is a ring at every node.
+    culler: meshing.FrustumCuller or None
+        Tracks which objects are inside the view from their bounding box at each frame.
+        Objects outside the view are neither uploaded nor drawn. None if culling is
+        turned off.
+    picker: picking.RodPicker
+        Picks the rod element under the mouse. While paused, the values of the element
+        under the mouse are displayed in inspect_text.
+    domain_percentile: float or None
+        If given, the domain framed by the cameras and axes ignores the frames beyond
+        this percentile of the extent of each object, eg. 1 to ignore outliers. If None,
+        the domain is the full extent of the objects.
+    background_meshing: bool
+        Whether frames after the first are meshed in a background thread while the
+        scene is already shown. Playback waits for frames that are not meshed yet.
+    meshed_frames: int
+        Number of frames meshed so far, from the first frame. When meshing lazily every
+        frame is available, so this is the number of frames.
+    cached_frames: int or None
+        If given, frames are meshed lazily when they are displayed instead of ahead of
+        time, and only the meshdata of the cached_frames frames closest to the frame
+        displayed is kept, so memory does not grow with the length of the simulation. If
+        None, every frame is meshed ahead of time and kept while it fits in the memory
+        budget.
+    memory_budget: float or None
+        Bytes the cached meshdata may take up. If None, half the memory available when
+        the Visualizer is created, see system_memory.memory_budget.
+    quantize: bool
+        Whether the cached meshdata is quantized to 16 bits, halving its memory, see
+        meshing.quantize_tube_mesh. Frames are recovered when they are displayed.
+    render_mode: str
+        "tube" to draw rods as tube meshes, or "centerline" to draw them as lines
+        straight from the position history, in which case nothing is meshed.
+    time_to_first_frame: float or None
+        Seconds from the creation of the Visualizer to the first frame being drawn, or
+        None until it has been drawn.
 
     """
 
-    def __init__(self, visualization_dict: dict, canvas_size=(800, 608)) -> None:
+    def __init__(
+        self,
+        visualization_dict: dict,
+        canvas_size=(800, 608),
+        measure_fps=False,
+        backend=None,
+        lod=True,
+        adaptive_tolerance=None,
+        culling=True,
+        domain_percentile=None,
+        background_meshing=True,
+        cached_frames=None,
+        quantize=False,
+        render_mode="tube",
+        memory_budget=None,
+    ) -> None:
+
+        self._start_time = time.perf_counter()
+        self.time_to_first_frame = None
 
         self.visualization_dict = visualization_dict
         self.canvas_size = canvas_size
+        self.measure_fps = measure_fps
+        self.backend = backend
+        self.lod = lod
+        self.lod_tube_points = LOD_TUBE_POINTS if lod else (TUBE_POINTS,)
+        self.adaptive_tolerance = adaptive_tolerance
+        self.domain_percentile = domain_percentile
+        self.background_meshing = background_meshing
+        self.cached_frames = cached_frames
+        self.quantize = quantize
+        self.render_mode = render_mode
         self.camera_type = None
-        self.save_video = False
+        self.is_playing = False
+        self.current_index = 0
+        self.axes_parameters = []
         self.objects = {}
-        self.meshdata = {}
+        self.colors = {}
+        self.lods = {}
         self.app_timers = {}
+        self.num_frames = len(visualization_dict["time"])
+
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Render mode should be one of {RENDER_MODES}")
+
+        if cached_frames is not None and cached_frames < 1:
+            raise ValueError(
+                f"cached_frames = {cached_frames} is not valid, at least one frame must "
+                "be cached"
+            )
+
+        self.meshdata = FrameCache(max_frames=cached_frames, budget=memory_budget)
+
+        # Index of the frame last uploaded for each object, so objects coming back into
+        # view are only uploaded if they are out of date
+        self._uploaded_index = {}
+        self.culler = FrustumCuller(visualization_dict["objects"]) if culling else None
+
+        # Element hierarchies for picking are only built for the frames inspected
+        self.picker = RodPicker(
+            {
+                object: object_parameters
+                for object, object_parameters in visualization_dict["objects"].items()
+                if object_parameters["type"] == "rod"
+            }
+        )
 
         self._calculate_meshdata()
         self._calculate_domain()
@@ -85,84 +236,168 @@ class Visualizer:
         is added to the self.meshdata dictionary.
 
         Pre-computing meshdata before visualization begins saves a lot of time
-        as opposed to computing during visualization.
+        as opposed to computing during visualization. Spheres and cylinders are
+        instanced from a shared unit mesh, so they have no meshdata.
+
+        Frames are meshed in order, and only the first frame is meshed before the
+        scene is shown if background_meshing is set. The other frames are then meshed
+        in a background thread. If cached_frames is set, only the first frame is meshed
+        and the other frames are meshed when they are displayed. Meshing ahead of time
+        stops once the meshdata fills the memory budget, and the remaining frames are
+        then meshed when they are displayed too. Nothing is meshed in centerline mode.
 
         Raises:
-            NotImplementedError: Error if object type is one which has not
-            yet been implemented
             ValueError: Error if object type is not one of the possible
             types
         """
 
-        number_of_objects = len(self.visualization_dict["objects"])
-
-        print("Pre-calculating meshdata...")
-
-        for num, object in enumerate(self.visualization_dict["objects"]):
+        for object in self.visualization_dict["objects"]:
 
-            self.meshdata[object] = []
             object_parameters = self.visualization_dict["objects"][object]
             object_type = object_parameters["type"]
 
             if object_type == "rod":
 
-                is_closed = object_parameters["closed"]
-                color = object_parameters["color"]
-
-                for i in tqdm(
-                    range(len(object_parameters["position"]) - 100),
-                    desc=f"Object {num+1}/{number_of_objects}",
-                ):
-
-                    # Object position must be transposed from the way that PyElastica
-                    # saves it during callback.
-                    # TODO: Transpose position data during generation of visualization_dict
-                    #  instead of here
-
-                    # Takes object position data up to -1th element so dimension matches radius dimension
-                    # This is due to how PyElastica functions, where position array has one more element
-                    # than the radius array
-                    object_position = object_parameters["position"][i].transpose()[:-1]
-                    object_radius = object_parameters["radius"][i]
-
-                    # Calculates tube meshdata
-                    tube_meshdata = scene.visuals.Tube(
-                        points=object_position,
-                        radius=object_radius,
-                        closed=is_closed,
-                        color=color,
-                    )._meshdata
-
-                    # print(f"Size of meshdata {sys.getsizeof(tube_meshdata)}")
-                    # print(tube_meshdata)
-                    self.meshdata[object].append(tube_meshdata)
-
-            elif object_type == "sphere":
-
-                raise NotImplementedError(
-                    "TODO: Implement other shapes and object visualization"
-                )
+                # Colors (including scalar fields mapped through a colormap) are kept
+                # apart from the geometry
+                self.colors[object] = TubeColor(object_parameters)
+
+                # Centerlines have no cross section
+                if self.render_mode == "tube":
+                    self.lods[object] = TubeLOD(object_parameters, self.lod_tube_points)
+
+            elif object_type in INSTANCED_TYPES:
+
+                # Instances only need a position and transform per frame, which are
+                # cheap enough to calculate when the frame is displayed
+                continue
+
             else:
 
                 raise ValueError("Not valid object type")
 
+        # Frames are meshed in order, and waiting for a frame waits on this condition
+        # until meshed_frames is past it
+        self.meshed_frames = 0
+        self._meshed_condition = threading.Condition()
+
+        if self.render_mode == "centerline":
+            self.meshed_frames = self.num_frames
+            return
+
+        # Other programs may need the memory while the visualization is shown, so the
+        # cache shrinks when the memory available on the host runs low
+        self.meshdata.start_monitoring()
+        self._mesh_frame(0)
+
+        if self.cached_frames is not None:
+            self._mark_meshed(self.num_frames)
+            return
+
+        self._mark_meshed(1)
+
+        self._meshing_thread = threading.Thread(
+            target=self._mesh_remaining_frames, daemon=True
+        )
+
+        if self.background_meshing:
+            self._meshing_thread.start()
+        else:
+            self._mesh_remaining_frames()
+
+    def _mesh_frame(self, index):
+        """Meshes every rod at a frame and caches it
+
+        Returns:
+            bool: Whether the frame is kept in the cache
+        """
+
+        frame = {}
+        for object in self.colors:
+
+            # Calculates tube vertices for every level of detail
+            tube_meshdata = calculate_tube_lod_vertices(
+                self.visualization_dict["objects"][object],
+                index,
+                self.lod_tube_points,
+                self.adaptive_tolerance,
+            )
+            if self.quantize:
+                tube_meshdata = tuple(map(quantize_tube_mesh, tube_meshdata))
+
+            frame[object] = tube_meshdata
+
+        return self.meshdata.put(index, frame)
+
+    def _mark_meshed(self, meshed_frames):
+        """Marks the frames before meshed_frames as available, waking up waiters"""
+
+        with self._meshed_condition:
+            self.meshed_frames = meshed_frames
+            self._meshed_condition.notify_all()
+
+    def _mesh_remaining_frames(self):
+
+        from tqdm import tqdm
+
+        print("Pre-calculating meshdata...")
+
+        for i in tqdm(range(1, self.num_frames), desc="Meshing frames"):
+
+            # Frames further ahead would only evict frames closer to the playhead
+            if not self._mesh_frame(i):
+                print(
+                    f"The meshdata of {len(self.meshdata)} frames fills the memory "
+                    "budget, the other frames are meshed when they are displayed"
+                )
+                break
+
+            self._mark_meshed(i + 1)
+
+        self._mark_meshed(self.num_frames)
+
+    def wait_for_frame(self, index):
+        """Blocks until a frame has been meshed, meshing it now if it is not cached
+
+        Frames are not cached when meshing lazily, or when they have been evicted to
+        stay within the memory budget.
+        """
+
+        if self.render_mode == "centerline":
+            return
+
+        with self._meshed_condition:
+            self._meshed_condition.wait_for(lambda: self.meshed_frames > index)
+
+        if self.meshdata.get(index) is None:
+            self._mesh_frame(index)
+
+    def _on_first_draw(self, event):
+        """Records the time to the first frame, once it has been drawn"""
+
+        self.canvas.events.draw.disconnect(self._on_first_draw)
+        self.time_to_first_frame = time.perf_counter() - self._start_time
+        print(f"Time to first frame: {self.time_to_first_frame:.3f}s")
+
     def _initalize_scene(self) -> None:
         """Initializes the Vispy app and scene
 
         Creates the Vispy app and scene, and creates a main view from
         the canvas.
-
-        Raises:
-            NotImplementedError: Raises error if one of the objects is of
-            a type that is not yet implemented
         """
 
-        self.app = app.application.Application()
+        from vispy import app, scene
+
+        self.app = app.application.Application(backend_name=self.backend)
         self.canvas = scene.SceneCanvas(
-            keys="interactive", size=self.canvas_size, bgcolor="black"
+            keys="interactive", size=self.canvas_size, bgcolor="black", app=self.app
         )
         # Prints FPS to console for measuring performance
-        self.canvas.measure_fps()
+        if self.measure_fps:
+            self.canvas.measure_fps()
+
+        # Space toggles play/pause, "," and "." step through frames while paused
+        self.canvas.events.key_press.connect(self._on_key_press)
 
         # Set up a view box to display the image with interactive pan/zoom
         self.view = self.canvas.central_widget.add_view()
@@ -176,18 +411,32 @@ class Visualizer:
 
             if object_type == "rod":
 
-                initial_meshdata = self.meshdata[object][0]
-                object_instance = scene.visuals.Tube(points=[[0, 0, 0], [1, 1, 1]])
-                object_instance.set_data(meshdata=initial_meshdata)
+                if self.render_mode == "centerline":
+                    object_instance = scene.visuals.Line(width=2)
+                else:
+                    object_instance = scene.visuals.Tube(points=[[0, 0, 0], [1, 1, 1]])
+                self.objects[object] = object_instance
+                self._set_object_data(object, 0)
 
                 self.view.add(object_instance)
-                self.objects[object] = object_instance
 
-            elif object_type == "sphere":
+            elif object_type in INSTANCED_TYPES:
 
-                raise NotImplementedError(
-                    "TODO: Implement other shapes and object visualization"
+                # All spheres or cylinders of the object are drawn in one draw call
+                object_instance = create_instanced_visual(
+                    self.visualization_dict["objects"][object]
                 )
+                self.objects[object] = object_instance
+                self._uploaded_index[object] = 0
+
+                self.view.add(object_instance)
+
+        # Levels of detail and objects in view are updated whenever the camera moves.
+        # Cameras change the scene transform in place, which emits no transform_change
+        # event, so the view is checked before each draw instead
+        self._view_probe = None
+        self.canvas.events.draw.connect(self._on_view_change, position="first")
+        self.canvas.events.draw.connect(self._on_first_draw, position="last")
 
         # Creates the time text and adds it to the scene
         self.time = self.visualization_dict["time"]
@@ -200,6 +449,18 @@ class Visualizer:
             parent=self.canvas.central_widget,
         )
 
+        # Values of the rod element under the mouse, shown while paused
+        self.inspect_text = scene.Text(
+            "",
+            font_size=10,
+            color="w",
+            anchor_x="left",
+            anchor_y="top",
+            pos=(10, 60),
+            parent=self.canvas.central_widget,
+        )
+        self.canvas.events.mouse_move.connect(self._on_mouse_move)
+
     def add_axis(
         self, axis_direction, domain=None, color="white", font_size=10, axis_width=2
     ):
@@ -222,6 +483,20 @@ class Visualizer:
         if min_val == max_val:
             return
 
+        from vispy import scene
+
+        # Axes are recorded so they can be recreated with the same domain in the
+        # worker processes used by export_video_parallel
+        self.axes_parameters.append(
+            {
+                "axis_direction": axis_direction,
+                "domain": domain,
+                "color": color,
+                "font_size": font_size,
+                "axis_width": axis_width,
+            }
+        )
+
         if axis_direction == "x":
 
             axis = scene.Axis(
@@ -271,6 +546,8 @@ class Visualizer:
 
     def turntable_camera(self, focal_plane="xz", **kwargs):
 
+        from vispy import scene
+
         self.camera_type = "turntable"
         self.view.camera = scene.TurntableCamera(elevation=0, azimuth=0)
         self.view.camera.set_range(
@@ -298,6 +575,8 @@ class Visualizer:
 
     def arcball_camera(self, **kwargs):
 
+        from vispy import scene
+
         self.camera_type = "arcball"
         self.view.camera = scene.ArcballCamera()
         self.view.camera.set_range(
@@ -309,9 +588,15 @@ class Visualizer:
 
     def fly_camera(self, autoroll=True, **kwargs):
 
+        from vispy import scene
+
         self.camera_type = "fly"
         self.view.camera = scene.FlyCamera()
         self.view.camera.auto_roll = autoroll
+
+        # The fly camera runs its own timer once interacted with, this stops it again once
+        # the camera has come to rest so no timer is running while the camera is idle
+        self.view.camera._timer.connect(self._stop_idle_fly_camera_timer)
         self.view.camera.set_range(
             x=(self.min_domain[0], self.max_domain[0]),
             z=(self.min_domain[2], self.max_domain[2]),
@@ -331,12 +616,8 @@ class Visualizer:
         # camera_vector = np.array([0, object_y, 0])
         # self.view.camera.rotation1 = Quaternion(w=1, x=-1, y=0, z=0)
 
-    def _initialize_timers(self, timers=None):
-        """Method to intialize timers to be used in app
-
-        Args:
-            timers (list str): List of timers to be initialized. Defaults to None.
-        """
+    def _initialize_timers(self):
+        """Method to intialize timers to be used in app"""
 
         # for timer in self.timers:
 
@@ -347,16 +628,16 @@ class Visualizer:
         # TODO: Potentially look at seperate iterator indexes as more app timers are added or varying incrementation
         # eg. for increased playback speed iterator will need to be incremented more
 
-        if timers is None:
-            timers = []
-
         self.iterator_index = 0
+        self.is_playing = True
 
         # Maximum number of updates allowed
         # TODO: Think about a better way to define/set this as it is quite
         # rudimentary now and purely used to prevent indexErrors
 
-        self.max_updates = len(list(self.meshdata.values())[0]) - 1
+        self.max_updates = self.num_frames - 1
+
+        from vispy import app
 
         # TODO: Allow modification of the interval value
         self.app_timers["update_objects"] = app.Timer(
@@ -366,15 +647,6 @@ class Visualizer:
             app=self.app,
         )
 
-        if "save_video" in timers:
-
-            self.app_timers["save_video"] = app.Timer(
-                interval="auto",
-                connect=self._save_video_timer,
-                start=True,
-                app=self.app,
-            )
-
     def _update_objects_timer(self, event):
         """The app timer to update the objects between frames, and is the main timer for the app
 
@@ -382,6 +654,10 @@ class Visualizer:
             event : Parameter required for Vispy app timers
         """
 
+        # Playback holds on the current frame until the next frame has been meshed
+        if self.iterator_index + 1 >= self.meshed_frames:
+            return
+
         self.iterator_index += 1 * 1
 
         # Stop the timer update to prevent list indexing beyond
@@ -394,60 +670,644 @@ class Visualizer:
             for timers in self.app_timers:
                 self.app_timers[timers].stop()
 
-            if self.save_video == True:
-                self.video_writer.close()
-
             self.canvas.close()
             return
 
-        for object in self.objects:
+        self._set_frame(self.iterator_index)
 
-            object_parameters = self.visualization_dict["objects"][object]
-            object_type = object_parameters["type"]
+        if self.iterator_index % 20 == 0:
+            print(self.view.camera.get_state())
 
-            if object_type == "rod":
+    def _set_frame(self, index):
+        """Updates the objects in the scene and the time text to the given frame
 
-                # Updates the object in the scene with the next meshdata
-                new_meshdata = self.meshdata[object][self.iterator_index]
-                self.objects[object].set_data(meshdata=new_meshdata)
+        Waits for the frame to be meshed if it is not yet.
+
+        Args:
+            index (int): Index of the frame to be displayed
+        """
+
+        self.wait_for_frame(index)
+
+        if self.lod:
+            for object in update_lod_levels(
+                self.lods, self.view.scene.transform, index
+            ):
+                self._uploaded_index.pop(object, None)
+
+        if self.culler is not None:
+            self.culler.update(self.view.scene.transform, self.view.size, index)
+
+        for object in self.objects:
+            self._update_object(object, index)
 
         # time_list = self.visualization_dict["time"]
-        self.time_text.text = f"Time: {self.time[self.iterator_index]:.4f}"
+        self.time_text.text = f"Time: {self.time[index]:.4f}"
+        self.current_index = index
 
-        if self.iterator_index % 20 == 0:
-            print(self.view.camera.get_state())
+    def _update_object(self, object, index):
+        """Brings an object to a frame if it is inside the view, otherwise hides it
 
-    def _save_video_timer(self, event):
-        """App timer to write simulation frames to video file"""
+        Args:
+            object (str): Name of the object
+            index (int): Index of the frame
+        """
 
-        frame = _screenshot()
-        self.video_writer.append_data(frame)
+        visible = self.culler is None or self.culler.visible[object]
+        self.objects[object].visible = visible
 
-    def _calculate_domain(self):
+        if not visible or self._uploaded_index.get(object) == index:
+            return
 
-        num_objects = len(self.visualization_dict["objects"])
-        all_objects_max_domain = np.zeros(shape=(num_objects, 3))
-        all_objects_min_domain = np.zeros(shape=(num_objects, 3))
-        all_objects_avg_coords = np.zeros(shape=(num_objects, 3))
+        object_parameters = self.visualization_dict["objects"][object]
 
-        for num, object in enumerate(self.visualization_dict["objects"]):
+        if object_parameters["type"] == "rod":
 
-            object_parameters = self.visualization_dict["objects"][object]
-            object_position = object_parameters["position"]
+            # Updates the object in the scene with the next meshdata
+            self._set_object_data(object, index)
+
+        elif object_parameters["type"] in INSTANCED_TYPES:
+
+            update_instanced_visual(self.objects[object], object_parameters, index)
+            self._uploaded_index[object] = index
+
+    def _set_object_data(self, object, index):
+        """Sets the cached vertices of an object at a frame, with its shared faces and colors
+
+        The vertices and faces are those of the current level of detail of the object.
+        In centerline mode, the line of the object is set instead.
+        """
+
+        if self.render_mode == "centerline":
+            self._set_centerline_data(object, index)
+            return
+
+        self._uploaded_index[object] = index
+
+        lod = self.lods[object]
+        tube_mesh = self.meshdata[index][object][lod.level]
+        if self.quantize:
+            tube_mesh = dequantize_tube_mesh(tube_mesh)
+        closed = self.visualization_dict["objects"][object]["closed"]
+
+        self.objects[object].set_data(
+            vertices=tube_mesh.vertices,
+            faces=tube_mesh_faces(tube_mesh, lod.current_tube_points, closed),
+            **self.colors[object].mesh_colors(
+                index, lod.current_tube_points, tube_mesh.ring_nodes
+            ),
+        )
+
+    def _set_centerline_data(self, object, index):
+        """Sets the line of an object at a frame from its position history"""
+
+        self._uploaded_index[object] = index
+        object_parameters = self.visualization_dict["objects"][object]
+
+        # The same points as the rings of the tube, so colors are given the same way
+        points = np.asarray(object_parameters["position"][index]).T[:-1]
+        mesh_colors = self.colors[object].mesh_colors(index, tube_points=1)
+        color = mesh_colors["vertex_colors"]
+        if color is None:
+            color = mesh_colors["color"].rgba
+
+        if object_parameters["closed"]:
+            points = np.vstack((points, points[:1]))
+            if np.ndim(color) == 2:
+                color = np.vstack((color, color[:1]))
+
+        self.objects[object].set_data(pos=points.astype(np.float32), color=color)
+
+    def _view_moved(self):
+        """Whether the transform from the scene to the view changed since the last call"""
+
+        probe = np.append(
+            np.ravel(self.view.scene.transform.map(VIEW_PROBE_POINTS)), self.view.size
+        )
+        if self._view_probe is not None and np.array_equal(probe, self._view_probe):
+            return False
+
+        self._view_probe = probe
+        return True
+
+    def _on_view_change(self, event):
+        """Updates the rods whose size on screen has changed and the objects in view"""
+
+        if not self._view_moved():
+            return
+
+        if self.lod:
+            changed = update_lod_levels(
+                self.lods, self.view.scene.transform, self.current_index
+            )
+            for object in changed:
+                if self.objects[object].visible:
+                    self._set_object_data(object, self.current_index)
+                else:
+                    # Uploaded again with the new level once back in view
+                    self._uploaded_index.pop(object, None)
+
+        if self.culler is not None:
+            changed = self.culler.update(
+                self.view.scene.transform, self.view.size, self.current_index
+            )
+            for object in changed:
+                self._update_object(object, self.current_index)
+
+    def _recolor(self, objects, update):
+        """Applies update to the TubeColor of each object and redraws the current frame
+
+        Only the colors of the displayed frame are set, the cached meshdata is untouched.
+        """
+
+        if objects is None:
+            objects = list(self.colors)
 
-            object_max_domain = object_position.max(axis=0).max(axis=1)
-            object_min_domain = object_position.min(axis=0).min(axis=1)
-            object_avg_coords = np.mean(object_position, axis=(0, 2))
+        for object in objects:
+            update(self.colors[object])
+            self._set_object_data(object, self.current_index)
 
-            all_objects_max_domain[num] = object_max_domain
-            all_objects_min_domain[num] = object_min_domain
-            all_objects_avg_coords[num] = object_avg_coords
+    def set_color(self, color, objects=None):
+        """Colors objects uniformly
 
-        self.average_position = np.mean(all_objects_avg_coords, axis=0).round(
-            decimals=1
+        Args:
+            color (str or tuple): Color of the objects
+            objects (list, optional): Names of the objects to be recolored. Defaults to
+            None, which recolors every object.
+        """
+
+        self._recolor(objects, lambda tube_color: tube_color.set_color(color))
+
+    def set_colormap(self, colormap=None, clim=None, objects=None):
+        """Colors objects by their scalar field, optionally changing the colormap and limits
+
+        Args:
+            colormap (str, optional): Name of a Vispy colormap. Defaults to None, which
+            keeps the current colormap.
+            clim ((float, float), optional): Scalar values mapped to the ends of the
+            colormap. Defaults to None, which keeps the current limits.
+            objects (list, optional): Names of the objects to be recolored. Defaults to
+            None, which recolors every object.
+
+        Raises:
+            ValueError: Error if one of the objects has no scalar field
+        """
+
+        self._recolor(
+            objects, lambda tube_color: tube_color.set_colormap(colormap, clim)
+        )
+
+    def set_opacity(self, opacity, objects=None):
+        """Sets the opacity of objects from 0 to 1
+
+        Args:
+            opacity (float): Opacity of the objects
+            objects (list, optional): Names of the objects to be changed. Defaults to
+            None, which changes every object.
+        """
+
+        self._recolor(objects, lambda tube_color: tube_color.set_opacity(opacity))
+
+    def pause(self):
+        """Pauses the visualization
+
+        All app timers are stopped, so while paused the canvas is only redrawn
+        when the camera or scene is changed.
+        """
+
+        for timer in self.app_timers.values():
+            timer.stop()
+
+        self.is_playing = False
+
+    def play(self):
+        """Resumes the visualization from the current frame"""
+
+        for timer in self.app_timers.values():
+            timer.start()
+
+        self.is_playing = True
+
+    def _on_key_press(self, event):
+        """Key press handler for controlling playback
+
+        Args:
+            event : Vispy key press event
+        """
+
+        if not self.app_timers:
+            return
+
+        if event.key == "Space":
+            if self.is_playing:
+                self.pause()
+            else:
+                self.play()
+
+        elif not self.is_playing and event.text in (",", "."):
+            step = 1 if event.text == "." else -1
+            index = min(max(self.iterator_index + step, 0), self.max_updates - 1)
+            index = min(index, self.meshed_frames - 1)
+
+            # Only redraw if stepping actually changes the frame
+            if index != self.iterator_index:
+                self.iterator_index = index
+                self._set_frame(index)
+
+    def pick(self, canvas_position):
+        """Picks the rod element under a point of the canvas at the current frame
+
+        Args:
+            canvas_position ((float, float)): Position on the canvas in pixels
+
+        Returns:
+            dict or None: Name of the rod ("object"), index of the element ("element"),
+            distance from the camera ("distance") and the values of the element
+            ("values"), or None if there is no rod under the point
+        """
+
+        return self.picker.pick(self.view, canvas_position, self.current_index)
+
+    def _on_mouse_move(self, event):
+        """Displays the values of the rod element under the mouse while paused
+
+        Args:
+            event : Vispy mouse move event
+        """
+
+        if self.is_playing or event.is_dragging:
+            return
+
+        pick = self.pick(event.pos)
+        text = describe_pick(pick) if pick is not None else ""
+
+        if text != self.inspect_text.text:
+            self.inspect_text.text = text
+
+    def _stop_idle_fly_camera_timer(self, event):
+        """Stops the fly camera timer once the camera is no longer moving
+
+        Connected after the camera's own timer handler, the camera restarts the
+        timer itself on the next key or mouse event.
+
+        Args:
+            event : Parameter required for Vispy app timers
+        """
+
+        camera = self.view.camera
+        if not (
+            camera._speed.any()
+            or camera._acc.any()
+            or camera._update_from_mouse
+            or camera._event_value is not None
+        ):
+            camera._timer.stop()
+
+    def export_video(
+        self,
+        video_fname,
+        size=None,
+        fps=60,
+        quality=10,
+        start=0,
+        stop=None,
+        queue_size=8,
+    ):
+        """Writes the visualization to a video file, one video frame per simulation frame
+
+        Frames are stepped through deterministically and each one is rendered to an
+        offscreen framebuffer, so no app timers are used and the canvas does not need
+        to be shown. With a software OpenGL backend (eg. backend="osmesa") this works
+        on headless machines.
+
+        Export is pipelined: rendering and pixel readback run on this thread and push
+        frames into a bounded queue, while a worker thread encodes them through a single
+        persistent ffmpeg pipe. Total export time is then close to the slower of the
+        two stages rather than their sum.
+
+        Args:
+            video_fname (str): The file path to save the video to.
+            size ((int, int), optional): Resolution (width, height) of the video. If None,
+            the canvas size is used. Defaults to None.
+            fps (int, optional): Frame rate of the video. Defaults to 60.
+            quality (int, optional): Video quality from 0 to 10 passed to ffmpeg.
+            Defaults to 10.
+            start (int, optional): Index of the first frame to export. Defaults to 0.
+            stop (int, optional): Index one past the last frame to export. If None,
+            frames are exported to the end of the simulation. Defaults to None.
+            queue_size (int, optional): Maximum number of rendered frames waiting to be
+            encoded. Bounds the memory used when encoding is slower than rendering.
+            Defaults to 8.
+
+        Returns:
+            dict: Time in seconds spent in each stage ("render", "encode") and in
+            total ("total"), and the number of frames written ("frames").
+        """
+
+        from tqdm import tqdm
+
+        if self.camera_type is None:
+            print("No camera has been initialised. Defaulting to turntable camera...")
+            self.turntable_camera()
+
+        num_frames = self.num_frames
+        stop = num_frames if stop is None else min(stop, num_frames)
+
+        if size is None:
+            size = tuple(self.canvas.size)
+
+        timings = {"render": 0.0, "encode": 0.0, "total": 0.0, "frames": 0}
+        errors = []
+        frame_queue = queue.Queue(maxsize=queue_size)
+        encoder = threading.Thread(
+            target=self._encode_frames,
+            args=(frame_queue, video_fname, fps, quality, timings, errors),
+            daemon=True,
+        )
+
+        export_start = time.perf_counter()
+        encoder.start()
+
+        try:
+            for i in tqdm(range(start, stop), desc="Exporting video"):
+
+                # Stop rendering early if the encoder has failed
+                if errors:
+                    break
+
+                render_start = time.perf_counter()
+                self._set_frame(i)
+
+                # Rendering to an offscreen framebuffer draws the scene for the frame
+                # just set, independent of the window and any app timers
+                frame = self.canvas.render(size=size)
+                timings["render"] += time.perf_counter() - render_start
+
+                # Blocks while the queue is full, so at most queue_size frames are
+                # held in memory waiting for the encoder
+                frame_queue.put(frame)
+
+        finally:
+            # Signals the encoder that there are no more frames
+            frame_queue.put(None)
+            encoder.join()
+
+        timings["total"] = time.perf_counter() - export_start
+
+        if errors:
+            raise errors[0]
+
+        print(
+            f"Exported {timings['frames']} frames in {timings['total']:.2f}s "
+            f"(render {timings['render']:.2f}s, encode {timings['encode']:.2f}s)"
+        )
+
+        return timings
+
+    def export_video_parallel(
+        self,
+        video_fname,
+        num_workers=None,
+        num_chunks=None,
+        size=None,
+        fps=60,
+        quality=10,
+        max_retries=2,
+    ):
+        """Writes the visualization to a video file using several rendering processes
+
+        The frames are split into contiguous chunks and each chunk is exported with
+        export_video in a separate process, with its own OpenGL context, using the
+        current camera state and axes. The video segments are then joined by ffmpeg
+        without re-encoding. A chunk whose process fails is retried on its own.
+
+        As worker processes are spawned, scripts calling this must be guarded by
+        if __name__ == "__main__". For headless export, create the Visualizer with
+        a backend such as "osmesa" or "egl", which is also used by the workers.
+
+        Args:
+            video_fname (str): The file path to save the video to.
+            num_workers (int, optional): Number of rendering processes. If None, the
+            number of CPUs is used. Defaults to None.
+            num_chunks (int, optional): Number of chunks the frames are split into.
+            If None, one chunk per worker is used. Defaults to None.
+            size ((int, int), optional): Resolution (width, height) of the video. If None,
+            the canvas size is used. Defaults to None.
+            fps (int, optional): Frame rate of the video. Defaults to 60.
+            quality (int, optional): Video quality from 0 to 10 passed to ffmpeg.
+            Defaults to 10.
+            max_retries (int, optional): Number of times a failed chunk is retried
+            before the export is aborted. Defaults to 2.
+
+        Raises:
+            RuntimeError: Error if a chunk still fails after max_retries retries
+        """
+
+        import multiprocessing as mp
+        from multiprocessing.connection import wait
+        from imageio_ffmpeg import get_ffmpeg_exe
+
+        if self.camera_type is None:
+            print("No camera has been initialised. Defaulting to turntable camera...")
+            self.turntable_camera()
+
+        if num_workers is None:
+            num_workers = os.cpu_count()
+
+        if num_chunks is None:
+            num_chunks = num_workers
+
+        if size is None:
+            size = tuple(self.canvas.size)
+
+        num_frames = self.num_frames
+        bounds = np.linspace(0, num_frames, min(num_chunks, num_frames) + 1).astype(int)
+        chunks = list(zip(bounds[:-1], bounds[1:]))
+
+        scene_parameters = {
+            "canvas_size": self.canvas_size,
+            "backend": self.backend,
+            "camera_type": self.camera_type,
+            "camera_state": self.view.camera.get_state(),
+            "axes_parameters": self.axes_parameters,
+            "lod": self.lod,
+            "adaptive_tolerance": self.adaptive_tolerance,
+            "culling": self.culler is not None,
+            "domain_percentile": self.domain_percentile,
+            "cached_frames": self.cached_frames,
+            "quantize": self.quantize,
+            "render_mode": self.render_mode,
+            # The budget is shared by the workers running at once
+            "memory_budget": self.meshdata.budget
+            / max(min(num_workers, len(chunks)), 1),
+            # Resolved colormap limits are passed on, so every chunk maps the scalar
+            # fields over the whole simulation rather than over its own frames
+            "color_states": {
+                object: color.get_state() for object, color in self.colors.items()
+            },
+        }
+        export_parameters = {"size": size, "fps": fps, "quality": quality}
+
+        # Spawned rather than forked processes, so each worker creates a fresh
+        # OpenGL context instead of inheriting the parent's
+        context = mp.get_context("spawn")
+        segment_dir = tempfile.mkdtemp(
+            dir=os.path.dirname(os.path.abspath(video_fname))
+        )
+        segment_fnames = [
+            os.path.join(segment_dir, f"segment_{num:04d}.mp4")
+            for num in range(len(chunks))
+        ]
+
+        pending = deque(range(len(chunks)))
+        attempts = [0] * len(chunks)
+        running = {}
+
+        try:
+            while pending or running:
+
+                # Keeps num_workers chunks rendering at a time
+                while pending and len(running) < num_workers:
+                    num = pending.popleft()
+                    start, stop = chunks[num]
+                    attempts[num] += 1
+
+                    process = context.Process(
+                        target=_export_video_chunk,
+                        args=(
+                            _slice_visualization_dict(
+                                self.visualization_dict, start, stop
+                            ),
+                            scene_parameters,
+                            segment_fnames[num],
+                            export_parameters,
+                        ),
+                    )
+                    process.start()
+                    running[process.sentinel] = (num, process)
+
+                # Blocks until at least one of the running chunks has finished
+                for sentinel in wait(list(running)):
+                    num, process = running.pop(sentinel)
+                    process.join()
+
+                    if process.exitcode == 0:
+                        print(f"Chunk {num + 1}/{len(chunks)} finished")
+
+                    elif attempts[num] <= max_retries:
+                        print(f"Chunk {num + 1}/{len(chunks)} failed, retrying...")
+                        pending.append(num)
+
+                    else:
+                        raise RuntimeError(
+                            f"Exporting frames {chunks[num][0]} to {chunks[num][1]} "
+                            f"failed after {attempts[num]} attempts"
+                        )
+
+            # Joins the segments with the concat demuxer, copying the encoded streams
+            list_fname = os.path.join(segment_dir, "segments.txt")
+            with open(list_fname, "w") as f:
+                for segment_fname in segment_fnames:
+                    f.write(f"file '{segment_fname}'\n")
+
+            subprocess.run(
+                [
+                    get_ffmpeg_exe(),
+                    "-y",
+                    "-loglevel",
+                    "error",
+                    "-f",
+                    "concat",
+                    "-safe",
+                    "0",
+                    "-i",
+                    list_fname,
+                    "-c",
+                    "copy",
+                    video_fname,
+                ],
+                check=True,
+            )
+
+        finally:
+            for _, process in running.values():
+                process.terminate()
+
+            shutil.rmtree(segment_dir, ignore_errors=True)
+
+    @staticmethod
+    def _encode_frames(frame_queue, video_fname, fps, quality, timings, errors):
+        """Encodes frames taken from the queue through a persistent ffmpeg pipe
+
+        Runs in the encoder thread until None is taken from the queue. If encoding
+        fails, the error is stored and remaining frames are drained so the render
+        thread is never blocked on a full queue.
+
+        Args:
+            frame_queue (queue.Queue): Queue of RGBA frames as (height, width, 4) arrays
+            video_fname (str): The file path to save the video to.
+            fps (int): Frame rate of the video.
+            quality (int): Video quality from 0 to 10 passed to ffmpeg.
+            timings (dict): Stage timings, "encode" and "frames" are updated here.
+            errors (list): Any exception raised while encoding is appended here.
+        """
+
+        from imageio_ffmpeg import write_frames
+
+        writer = None
+
+        while True:
+            frame = frame_queue.get()
+            if frame is None:
+                break
+
+            if errors:
+                continue
+
+            encode_start = time.perf_counter()
+
+            try:
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    writer = write_frames(
+                        video_fname,
+                        (width, height),
+                        pix_fmt_in="rgba",
+                        fps=fps,
+                        quality=quality,
+                    )
+                    writer.send(None)
+
+                # Rendered frames are vertically flipped views of the framebuffer, which
+                # ffmpeg does not accept, so they are copied into contiguous arrays
+                writer.send(np.ascontiguousarray(frame))
+                timings["frames"] += 1
+
+            except Exception as error:
+                errors.append(error)
+
+            timings["encode"] += time.perf_counter() - encode_start
+
+        if writer is not None:
+            encode_start = time.perf_counter()
+            writer.close()
+            timings["encode"] += time.perf_counter() - encode_start
+
+    def _calculate_domain(self):
+        """Calculates the region traversed by the objects, used to frame the camera and axes
+
+        Per-frame bounds recorded with the objects are used when available, otherwise
+        the positions are streamed in chunks, see scene_bounds.SceneBounds.
+        """
+
+        self.scene_bounds = SceneBounds.from_objects(self.visualization_dict["objects"])
+        min_domain, max_domain, average_position = self.scene_bounds.domain(
+            self.domain_percentile
         )
-        self.max_domain = all_objects_max_domain.max(axis=0).round(decimals=1)
-        self.min_domain = all_objects_min_domain.min(axis=0).round(decimals=1)
+
+        self.average_position = average_position.round(decimals=1)
+        self.max_domain = max_domain.round(decimals=1)
+        self.min_domain = min_domain.round(decimals=1)
 
     def run(self, video_fname=None):
         """Runs the visualization
@@ -457,8 +1317,9 @@ class Visualizer:
 
         Args:
             video_fname (str, optional): The file path to save the video
-            output of the simulation. If None, then no video is saved.
-            Defaults to None.
+            output of the simulation. If given, the video is exported frame by
+            frame with export_video before the canvas is shown. If None, then no
+            video is saved. Defaults to None.
         """
 
         # self._calculate_meshdata()
@@ -470,20 +1331,76 @@ class Visualizer:
             self.turntable_camera()
 
         if video_fname is not None:
+            self.export_video(video_fname)
+            self._set_frame(0)
 
-            from imageio import get_writer
-
-            self.save_video = True
-            self.video_writer = get_writer(video_fname, fps=60, quality=10)
-            self._initialize_timers(timers=["save_video"])
-
-        else:
-            self._initialize_timers()
+        self._initialize_timers()
 
         self.canvas.show()
         self.app.run()
 
 
+def _slice_visualization_dict(visualization_dict, start, stop):
+    """Returns a copy of the visualization dict containing only frames start to stop
+
+    Any per-frame data, ie. arrays whose first dimension is the number of frames,
+    is sliced while the other visualization parameters are kept as they are.
+    """
+
+    num_frames = len(visualization_dict["time"])
+
+    def _slice(value):
+        if isinstance(value, np.ndarray) and value.ndim and len(value) == num_frames:
+            return value[start:stop]
+        return value
+
+    return {
+        "objects": {
+            object: {
+                parameter: _slice(value)
+                for parameter, value in object_parameters.items()
+            }
+            for object, object_parameters in visualization_dict["objects"].items()
+        },
+        "time": visualization_dict["time"][start:stop],
+    }
+
+
+def _export_video_chunk(
+    visualization_dict, scene_parameters, segment_fname, export_parameters
+):
+    """Exports a chunk of frames to a video segment, run in a worker process
+
+    Recreates the scene with the camera state and axes of the parent Visualizer
+    before exporting the frames of the sliced visualization dict.
+    """
+
+    visualizer = Visualizer(
+        visualization_dict,
+        canvas_size=scene_parameters["canvas_size"],
+        lod=scene_parameters["lod"],
+        adaptive_tolerance=scene_parameters["adaptive_tolerance"],
+        culling=scene_parameters["culling"],
+        domain_percentile=scene_parameters["domain_percentile"],
+        cached_frames=scene_parameters["cached_frames"],
+        quantize=scene_parameters["quantize"],
+        render_mode=scene_parameters["render_mode"],
+        memory_budget=scene_parameters["memory_budget"],
+        backend=scene_parameters["backend"],
+    )
+
+    for axis_parameters in scene_parameters["axes_parameters"]:
+        visualizer.add_axis(**axis_parameters)
+
+    getattr(visualizer, f"{scene_parameters['camera_type']}_camera")()
+    visualizer.view.camera.set_state(scene_parameters["camera_state"])
+
+    for object, color_state in scene_parameters["color_states"].items():
+        visualizer.colors[object].set_state(color_state)
+
+    visualizer.export_video(segment_fname, **export_parameters)
+
+
 if __name__ == "__main__":
 
     with open("data/twisted_rods/rod1_position.npy", "rb") as f:
@@ -0,0 +1,53 @@
+"""
+PyElastica callback recording the data needed by the Visualizer.
+
+This is kept apart from utils so PyElastica (and Numba) are only imported when a
+simulation is recorded, not when saved data is only viewed. It is still available as
+utils.VisualizerDictCallBack.
+"""
+import numpy as np
+from elastica import CallBackBaseClass
+
+from scene_bounds import position_frame_bounds
+
+
+class VisualizerDictCallBack(CallBackBaseClass):
+    """
+    Call back function to output simulation data into postprocessing dict
+    Post-processing dict attached to the callback should be of the form:
+
+    postprocessing_dict = {"object_1": defaultdict(list),
+                           "object_2": defaultdict(list),
+                           ...
+                           }
+
+    to work as seamlessly as possible with rest of the util functions and the
+    Visualizer class
+    """
+
+    def __init__(self, step_skip: int, callback_params: dict):
+        CallBackBaseClass.__init__(self)
+        self.every = step_skip
+        self.callback_params = callback_params
+
+    def make_callback(self, system, time, current_step: int):
+
+        if current_step % self.every == 0:
+
+            self.callback_params["time"].append(time)
+            self.callback_params["position"].append(system.position_collection.copy())
+            self.callback_params["radius"].append(np.copy(system.radius))
+
+            # Bounds are maintained as the simulation runs, so the Visualizer can frame
+            # the scene without reading every position
+            bounds, centers = position_frame_bounds(system.position_collection)
+            self.callback_params["bounds"].append(bounds[0])
+            self.callback_params["centers"].append(centers[0])
+
+            # Rigid bodies such as cylinders also have a length and an axis
+            if hasattr(system, "length"):
+                self.callback_params["length"].append(np.copy(system.length))
+                self.callback_params["direction"].append(
+                    system.director_collection[2].copy()
+                )
+            return